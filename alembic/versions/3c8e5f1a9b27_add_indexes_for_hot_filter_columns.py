@@ -0,0 +1,67 @@
+"""Add indexes for hot filter columns
+
+Revision ID: 3c8e5f1a9b27
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e5f1a9b27'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, partial index condition)
+INDEXES = [
+    ("ix_rentals_active_end_date", "rentals", ["is_active", "end_date"], "is_active"),
+    ("ix_rentals_car_id_start_date", "rentals", ["car_id", "start_date"], None),
+    ("ix_rentals_renter_id", "rentals", ["renter_id"], None),
+    ("ix_payments_rental_id", "payments", ["rental_id"], None),
+    ("ix_payments_payment_date", "payments", ["payment_date"], None),
+    ("ix_expenses_car_id_expense_date", "expenses", ["car_id", "expense_date"], None),
+    ("ix_expenses_expense_date", "expenses", ["expense_date"], None),
+    ("ix_cars_status", "cars", ["status"], None),
+    ("ix_renters_phone", "renters", ["phone"], None),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    is_postgres = bind.dialect.name == "postgresql"
+
+    for name, table, columns, where in INDEXES:
+        # Fresh databases get their tables (and these indexes) from create_all
+        if table not in tables or name in _existing_indexes(inspector, table):
+            continue
+
+        kwargs = {}
+        if where:
+            kwargs["postgresql_where"] = sa.text(where)
+            kwargs["sqlite_where"] = sa.text(f"{where} = 1")
+
+        if is_postgres:
+            # Build without locking writes on large tables
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+        else:
+            op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    for name, table, columns, where in reversed(INDEXES):
+        if table in tables and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,61 @@
+"""Add daily_car_financials rollup
+
+Revision ID: 7a1d4c2e9f30
+Revises: 3c8e5f1a9b27
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a1d4c2e9f30'
+down_revision = '3c8e5f1a9b27'
+branch_labels = None
+depends_on = None
+
+
+# Income and expenses per car and day; date() works on SQLite and PostgreSQL
+BACKFILL = sa.text("""
+    INSERT INTO daily_car_financials (car_id, day, income, expenses)
+    SELECT car_id, day, SUM(income), SUM(expenses)
+    FROM (
+        SELECT rentals.car_id AS car_id, date(payments.payment_date) AS day,
+               COALESCE(payments.amount, 0) AS income, 0 AS expenses
+        FROM payments JOIN rentals ON rentals.id = payments.rental_id
+        UNION ALL
+        SELECT expenses.car_id, date(expenses.expense_date),
+               0, COALESCE(expenses.amount, 0)
+        FROM expenses
+    ) AS ledger
+    GROUP BY car_id, day
+""")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    
+    # Fresh databases get the table from create_all
+    if "daily_car_financials" in tables or "cars" not in tables:
+        return
+    
+    op.create_table(
+        "daily_car_financials",
+        sa.Column("car_id", sa.Integer(), sa.ForeignKey("cars.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("income", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("expenses", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_daily_car_financials_day", "daily_car_financials", ["day"])
+    
+    # Backfill from the existing ledgers in SQL, independent of the current models
+    if {"rentals", "payments", "expenses"} <= tables:
+        op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    if "daily_car_financials" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_index("ix_daily_car_financials_day", table_name="daily_car_financials")
+        op.drop_table("daily_car_financials")
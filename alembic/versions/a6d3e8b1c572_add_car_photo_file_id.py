@@ -0,0 +1,48 @@
+"""Add Telegram file ids of car photos
+
+Revision ID: a6d3e8b1c572
+Revises: f3a9c6d2b810
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3e8b1c572'
+down_revision = 'f3a9c6d2b810'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    ("photo_file_id", sa.String(255)),
+    ("photo_file_unique_id", sa.String(64)),
+]
+
+
+def _columns(inspector):
+    return {column["name"] for column in inspector.get_columns("cars")}
+
+
+def upgrade() -> None:
+    # Fresh databases get the columns from create_all
+    inspector = sa.inspect(op.get_bind())
+    if "cars" not in inspector.get_table_names():
+        return
+    existing = _columns(inspector)
+    for name, type_ in COLUMNS:
+        if name not in existing:
+            op.add_column("cars", sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "cars" not in inspector.get_table_names():
+        return
+    existing = _columns(inspector)
+    with op.batch_alter_table("cars") as batch:
+        for name, _ in COLUMNS:
+            if name in existing:
+                batch.drop_column(name)
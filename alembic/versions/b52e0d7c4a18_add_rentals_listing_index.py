@@ -0,0 +1,45 @@
+"""Add rentals listing index
+
+Revision ID: b52e0d7c4a18
+Revises: 7a1d4c2e9f30
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e0d7c4a18'
+down_revision = '7a1d4c2e9f30'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = "ix_rentals_created_at_id"
+
+
+def _index_names(inspector):
+    return {index["name"] for index in inspector.get_indexes("rentals")}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    
+    # Fresh databases get the table (and this index) from create_all
+    if "rentals" not in inspector.get_table_names() or INDEX_NAME in _index_names(inspector):
+        return
+    
+    if bind.dialect.name == "postgresql":
+        # Build without locking writes on large tables
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX_NAME, "rentals", ["created_at", "id"], postgresql_concurrently=True)
+    else:
+        op.create_index(INDEX_NAME, "rentals", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "rentals" in inspector.get_table_names() and INDEX_NAME in _index_names(inspector):
+        op.drop_index(INDEX_NAME, table_name="rentals")
@@ -0,0 +1,63 @@
+"""Add rental overlap exclusion constraint
+
+Revision ID: d4f7a2c91e05
+Revises: b52e0d7c4a18
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7a2c91e05'
+down_revision = 'b52e0d7c4a18'
+branch_labels = None
+depends_on = None
+
+
+CONSTRAINT_NAME = "ex_rentals_car_no_overlap"
+
+# Pairs of active rentals of the same car that share at least one day
+OVERLAPS = sa.text(
+    "SELECT a.id, b.id, a.car_id FROM rentals a "
+    "JOIN rentals b ON a.car_id = b.car_id AND a.id < b.id "
+    "WHERE a.is_active AND b.is_active "
+    "AND a.start_date <= b.end_date AND b.start_date <= a.end_date"
+)
+
+
+def _constraint_exists(bind):
+    return bind.execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": CONSTRAINT_NAME}
+    ).first() is not None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    
+    # SQLite has no exclusion constraints: create_rental checks overlaps there.
+    # Fresh databases get the constraint from create_all.
+    if bind.dialect.name != "postgresql" or "rentals" not in inspector.get_table_names():
+        return
+    if _constraint_exists(bind):
+        return
+    
+    overlaps = bind.execute(OVERLAPS).fetchall()
+    if overlaps:
+        pairs = ", ".join(f"#{a} and #{b} (car {car_id})" for a, b, car_id in overlaps)
+        raise RuntimeError(f"Overlapping active rentals: {pairs}. End or fix them, then rerun the migration")
+    
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        f"ALTER TABLE rentals ADD CONSTRAINT {CONSTRAINT_NAME} "
+        "EXCLUDE USING gist (car_id WITH =, daterange(start_date, end_date, '[]') WITH &&) "
+        "WHERE (is_active)"
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and _constraint_exists(bind):
+        op.execute(f"ALTER TABLE rentals DROP CONSTRAINT {CONSTRAINT_NAME}")
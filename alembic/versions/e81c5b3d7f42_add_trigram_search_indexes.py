@@ -0,0 +1,67 @@
+"""Add trigram search indexes
+
+Revision ID: e81c5b3d7f42
+Revises: d4f7a2c91e05
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81c5b3d7f42'
+down_revision = 'd4f7a2c91e05'
+branch_labels = None
+depends_on = None
+
+
+# (table, column) -> index name
+INDEXES = {
+    ("cars", "license_plate"): "ix_cars_license_plate_trgm",
+    ("cars", "vin"): "ix_cars_vin_trgm",
+    ("cars", "brand"): "ix_cars_brand_trgm",
+    ("cars", "model"): "ix_cars_model_trgm",
+    ("renters", "name"): "ix_renters_name_trgm",
+    ("renters", "phone"): "ix_renters_phone_trgm",
+}
+
+
+def _index_names(inspector, table):
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    
+    # SQLite searches with plain LIKE. Fresh databases get the indexes from create_all.
+    if bind.dialect.name != "postgresql":
+        return
+    
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    
+    # Build without locking writes on large tables
+    with op.get_context().autocommit_block():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for (table, column), name in INDEXES.items():
+            if table not in tables or name in _index_names(inspector, table):
+                continue
+            op.create_index(
+                name, table, [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    for (table, _), name in INDEXES.items():
+        if table in tables and name in _index_names(inspector, table):
+            op.drop_index(name, table_name=table)
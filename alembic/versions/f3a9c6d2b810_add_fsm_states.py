@@ -0,0 +1,37 @@
+"""Add fsm_states for persistent bot dialogs
+
+Revision ID: f3a9c6d2b810
+Revises: e81c5b3d7f42
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c6d2b810'
+down_revision = 'e81c5b3d7f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fresh databases get the table from create_all
+    if "fsm_states" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    
+    op.create_table(
+        "fsm_states",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("state", sa.String(255)),
+        sa.Column("data", sa.Text()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_fsm_states_updated_at", "fsm_states", ["updated_at"])
+
+
+def downgrade() -> None:
+    if "fsm_states" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_index("ix_fsm_states_updated_at", table_name="fsm_states")
+        op.drop_table("fsm_states")
@@ -1,13 +1,17 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.orm import Session
 
-from database.database import SessionLocal
 from database import crud
 from database.models import ExpenseType
 from bot.states.states import AddExpenseStates
-from bot.keyboards.inline import expenses_menu_keyboard, cars_keyboard, expense_type_keyboard, back_to_menu_keyboard
-from bot.utils.helpers import format_expense_info, format_currency
+from bot.keyboards.inline import (
+    expenses_menu_keyboard, cars_keyboard, expense_type_keyboard, back_to_menu_keyboard,
+    KEYBOARD_PAGE_SIZE, split_page
+)
+from bot.utils.helpers import format_expense_info, format_currency, escape_markdown, render_pages, send_pages
+from bot.utils.db import AsyncDB
 
 router = Router()
 
@@ -22,29 +26,24 @@ async def expenses_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "add_expense")
-async def start_add_expense(callback: CallbackQuery, state: FSMContext):
-    db = SessionLocal()
-    try:
-        cars = crud.get_cars(db)
-        
-        if not cars:
-            await callback.message.edit_text(
-                "❌ В гараже нет машин.\n"
-                "Сначала добавьте машину в гараж.",
-                reply_markup=expenses_menu_keyboard()
-            )
-            return
-        
+async def start_add_expense(callback: CallbackQuery, state: FSMContext, db: AsyncDB):
+    cars, has_next = split_page(await db.run(crud.get_cars, limit=KEYBOARD_PAGE_SIZE + 1))
+    
+    if not cars:
         await callback.message.edit_text(
-            "💸 *Добавление расхода*\n\n"
-            "Выберите машину:",
-            reply_markup=cars_keyboard(cars),
-            parse_mode="Markdown"
+            "❌ В гараже нет машин.\n"
+            "Сначала добавьте машину в гараж.",
+            reply_markup=expenses_menu_keyboard()
         )
-        await state.set_state(AddExpenseStates.waiting_for_car_selection)
-        
-    finally:
-        db.close()
+        return
+    
+    await callback.message.edit_text(
+        "💸 *Добавление расхода*\n\n"
+        "Выберите машину:",
+        reply_markup=cars_keyboard(cars, has_next=has_next),
+        parse_mode="Markdown"
+    )
+    await state.set_state(AddExpenseStates.waiting_for_car_selection)
 
 
 @router.callback_query(AddExpenseStates.waiting_for_car_selection, F.data.startswith("car_"))
@@ -104,28 +103,32 @@ async def process_expense_amount(message: Message, state: FSMContext):
 
 
 @router.message(AddExpenseStates.waiting_for_description, F.text == "/skip")
-async def skip_expense_description(message: Message, state: FSMContext):
-    await save_expense(message, state)
+async def skip_expense_description(message: Message, state: FSMContext, db: AsyncDB):
+    await save_expense(message, state, db)
 
 
 @router.message(AddExpenseStates.waiting_for_description)
-async def process_expense_description(message: Message, state: FSMContext):
+async def process_expense_description(message: Message, state: FSMContext, db: AsyncDB):
     await state.update_data(description=message.text.strip())
-    await save_expense(message, state)
+    await save_expense(message, state, db)
 
 
-async def save_expense(message: Message, state: FSMContext):
+def _create_expense(db: Session, data: dict):
+    expense = crud.create_expense(
+        db=db,
+        car_id=data['car_id'],
+        expense_type=data['expense_type'],
+        amount=data['amount'],
+        description=data.get('description')
+    )
+    return crud.get_expense_by_id(db, expense.id, profile="expense_car")
+
+
+async def save_expense(message: Message, state: FSMContext, db: AsyncDB):
     data = await state.get_data()
     
-    db = SessionLocal()
     try:
-        expense = crud.create_expense(
-            db=db,
-            car_id=data['car_id'],
-            expense_type=data['expense_type'],
-            amount=data['amount'],
-            description=data.get('description')
-        )
+        expense = await db.run(_create_expense, data)
         
         await message.answer(
             f"✅ *Расход добавлен!*\n\n"
@@ -133,72 +136,74 @@ async def save_expense(message: Message, state: FSMContext):
             reply_markup=back_to_menu_keyboard(),
             parse_mode="Markdown"
         )
-        
+    
     except Exception as e:
         await message.answer(
             f"❌ Ошибка при сохранении расхода: {str(e)}",
             reply_markup=back_to_menu_keyboard()
         )
     finally:
-        db.close()
         await state.clear()
 
 
-@router.callback_query(F.data == "expense_history")
-async def show_expense_history(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        cars = crud.get_cars(db)
-        
-        if not cars:
-            await callback.message.edit_text(
-                "❌ В гараже нет машин.",
-                reply_markup=expenses_menu_keyboard()
-            )
-            return
-        
-        # Calculate total expenses by car
-        cars_with_expenses = []
-        total_expenses = 0
-        
-        for car in cars:
-            car_expenses = crud.get_car_expenses(db, car.id)
-            car_total = sum(expense.amount for expense in car_expenses)
-            total_expenses += car_total
-            
-            if car_expenses:  # Only include cars with expenses
-                cars_with_expenses.append({
-                    'car': car,
-                    'total': car_total,
-                    'count': len(car_expenses)
-                })
-        
-        if not cars_with_expenses:
-            await callback.message.edit_text(
-                "📊 Расходов пока нет.",
-                reply_markup=expenses_menu_keyboard()
-            )
-            return
-        
-        # Sort by total expenses descending
-        cars_with_expenses.sort(key=lambda x: x['total'], reverse=True)
-        
-        history_text = f"💸 *История расходов*\n\n"
-        history_text += f"📊 Общие расходы: {format_currency(total_expenses)}\n\n"
-        
-        for item in cars_with_expenses:
-            car = item['car']
-            history_text += (
-                f"🚗 {car.brand} {car.model} ({car.license_plate})\n"
-                f"💰 Расходы: {format_currency(item['total'])}\n"
-                f"📋 Записей: {item['count']}\n\n"
-            )
+def _expenses_by_car(db: Session):
+    cars = crud.get_cars(db)
+    
+    # Calculate total expenses by car
+    cars_with_expenses = []
+    total_expenses = 0
+    
+    for car in cars:
+        car_expenses = crud.get_car_expenses(db, car.id)
+        car_total = sum(expense.amount for expense in car_expenses)
+        total_expenses += car_total
         
+        if car_expenses:  # Only include cars with expenses
+            cars_with_expenses.append({
+                'car': car,
+                'total': car_total,
+                'count': len(car_expenses)
+            })
+    
+    return cars, cars_with_expenses, total_expenses
+
+
+@router.callback_query(F.data == "expense_history")
+async def show_expense_history(callback: CallbackQuery, db: AsyncDB):
+    cars, cars_with_expenses, total_expenses = await db.run(_expenses_by_car)
+    
+    if not cars:
         await callback.message.edit_text(
-            history_text,
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
+            "❌ В гараже нет машин.",
+            reply_markup=expenses_menu_keyboard()
         )
-        
-    finally:
-        db.close()
+        return
+    
+    if not cars_with_expenses:
+        await callback.message.edit_text(
+            "📊 Расходов пока нет.",
+            reply_markup=expenses_menu_keyboard()
+        )
+        return
+    
+    # Sort by total expenses descending
+    cars_with_expenses.sort(key=lambda x: x['total'], reverse=True)
+    
+    header = (
+        "💸 *История расходов*\n\n"
+        f"📊 Общие расходы: {format_currency(total_expenses)}\n\n"
+    )
+    
+    def entry(item) -> str:
+        car = item['car']
+        return (
+            f"🚗 {escape_markdown(f'{car.brand} {car.model} ({car.license_plate})')}\n"
+            f"💰 Расходы: {format_currency(item['total'])}\n"
+            f"📋 Записей: {item['count']}\n\n"
+        )
+    
+    await send_pages(
+        callback.message,
+        render_pages(header, (entry(item) for item in cars_with_expenses)),
+        reply_markup=back_to_menu_keyboard()
+    )
@@ -1,13 +1,21 @@
+import os
+
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
-from sqlalchemy.orm import Session
 
-from database.database import SessionLocal
+import config
 from database import crud
 from bot.states.states import AddCarStates
-from bot.keyboards.inline import garage_menu_keyboard, cars_keyboard, back_to_menu_keyboard
-from bot.utils.helpers import format_car_info, validate_vin, format_currency, save_photo
+from bot.keyboards.inline import (
+    garage_menu_keyboard, cars_keyboard, back_to_menu_keyboard,
+    KEYBOARD_PAGE_SIZE, split_page, page_offset
+)
+from database.validators import validate_vin
+from bot.utils.helpers import format_car_info, format_currency
+from bot.utils.photos import ingest_photo, PhotoTooLargeError, InvalidPhotoError
+from bot.utils.db import AsyncDB
 
 router = Router()
 
@@ -52,7 +60,7 @@ async def process_model(message: Message, state: FSMContext):
 
 
 @router.message(AddCarStates.waiting_for_vin)
-async def process_vin(message: Message, state: FSMContext):
+async def process_vin(message: Message, state: FSMContext, db: AsyncDB):
     vin = message.text.strip().upper()
     
     if not validate_vin(vin):
@@ -63,17 +71,13 @@ async def process_vin(message: Message, state: FSMContext):
         return
     
     # Check if VIN already exists
-    db = SessionLocal()
-    try:
-        existing_car = db.query(crud.Car).filter(crud.Car.vin == vin).first()
-        if existing_car:
-            await message.answer(
-                "❌ Машина с таким VIN уже существует в системе.\n"
-                "Введите другой VIN:"
-            )
-            return
-    finally:
-        db.close()
+    existing_car = await db.run(crud.get_car_by_vin, vin)
+    if existing_car:
+        await message.answer(
+            "❌ Машина с таким VIN уже существует в системе.\n"
+            "Введите другой VIN:"
+        )
+        return
     
     await state.update_data(vin=vin)
     await message.answer(
@@ -84,21 +88,17 @@ async def process_vin(message: Message, state: FSMContext):
 
 
 @router.message(AddCarStates.waiting_for_license_plate)
-async def process_license_plate(message: Message, state: FSMContext):
+async def process_license_plate(message: Message, state: FSMContext, db: AsyncDB):
     license_plate = message.text.strip().upper()
     
     # Check if license plate already exists
-    db = SessionLocal()
-    try:
-        existing_car = db.query(crud.Car).filter(crud.Car.license_plate == license_plate).first()
-        if existing_car:
-            await message.answer(
-                "❌ Машина с таким номером уже существует в системе.\n"
-                "Введите другой номер:"
-            )
-            return
-    finally:
-        db.close()
+    existing_car = await db.run(crud.get_car_by_license_plate, license_plate)
+    if existing_car:
+        await message.answer(
+            "❌ Машина с таким номером уже существует в системе.\n"
+            "Введите другой номер:"
+        )
+        return
     
     await state.update_data(license_plate=license_plate)
     await message.answer(
@@ -129,26 +129,38 @@ async def process_daily_rate(message: Message, state: FSMContext):
 
 
 @router.message(AddCarStates.waiting_for_photo, F.photo)
-async def process_photo(message: Message, state: FSMContext):
+async def process_photo(message: Message, state: FSMContext, db: AsyncDB):
     # Get the largest photo
     photo = message.photo[-1]
     
-    # Download photo
-    bot = message.bot
-    file = await bot.get_file(photo.file_id)
-    photo_data = await bot.download_file(file.file_path)
-    
-    # Save photo
-    filename = f"car_{photo.file_id}.jpg"
-    photo_path = save_photo(photo_data.read(), filename)
+    # Stream it to disk and make the thumbnail and web-size copies
+    try:
+        photo_path = await ingest_photo(message.bot, photo)
+    except PhotoTooLargeError:
+        await message.answer(
+            f"❌ Фото больше {config.MAX_FILE_SIZE // (1024 * 1024)} МБ. "
+            "Отправьте другое фото или нажмите /skip для пропуска."
+        )
+        return
+    except InvalidPhotoError:
+        await message.answer(
+            "❌ Не удалось прочитать фото. "
+            "Отправьте другое фото или нажмите /skip для пропуска."
+        )
+        return
     
-    await state.update_data(photo_path=photo_path)
-    await save_car(message, state)
+    # Viewing the car re-sends the photo by file_id instead of uploading the file
+    await state.update_data(
+        photo_path=photo_path,
+        photo_file_id=photo.file_id,
+        photo_file_unique_id=photo.file_unique_id
+    )
+    await save_car(message, state, db)
 
 
 @router.message(AddCarStates.waiting_for_photo, F.text == "/skip")
-async def skip_photo(message: Message, state: FSMContext):
-    await save_car(message, state)
+async def skip_photo(message: Message, state: FSMContext, db: AsyncDB):
+    await save_car(message, state, db)
 
 
 @router.message(AddCarStates.waiting_for_photo)
@@ -158,19 +170,20 @@ async def invalid_photo(message: Message):
     )
 
 
-async def save_car(message: Message, state: FSMContext):
+async def save_car(message: Message, state: FSMContext, db: AsyncDB):
     data = await state.get_data()
     
-    db = SessionLocal()
     try:
-        car = crud.create_car(
-            db=db,
+        car = await db.run(
+            crud.create_car,
             brand=data['brand'],
             model=data['model'],
             vin=data['vin'],
             license_plate=data['license_plate'],
             daily_rate=data['daily_rate'],
-            photo_path=data.get('photo_path')
+            photo_path=data.get('photo_path'),
+            photo_file_id=data.get('photo_file_id'),
+            photo_file_unique_id=data.get('photo_file_unique_id')
         )
         
         await message.answer(
@@ -185,78 +198,116 @@ async def save_car(message: Message, state: FSMContext):
             reply_markup=back_to_menu_keyboard()
         )
     finally:
-        db.close()
         await state.clear()
 
 
 @router.callback_query(F.data == "list_cars")
-async def list_cars(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        cars = crud.get_cars(db)
-        
-        if not cars:
-            await callback.message.edit_text(
-                "🚗 В гараже пока нет машин.\n"
-                "Добавьте первую машину!",
-                reply_markup=garage_menu_keyboard()
-            )
-            return
-        
+async def list_cars(callback: CallbackQuery, db: AsyncDB):
+    cars, has_next = split_page(await db.run(crud.get_cars, limit=KEYBOARD_PAGE_SIZE + 1))
+    
+    if not cars:
         await callback.message.edit_text(
-            f"🚗 *В гараже {len(cars)} машин(ы)*\n\n"
-            "Выберите машину для подробной информации:",
-            reply_markup=cars_keyboard(cars),
-            parse_mode="Markdown"
+            "🚗 В гараже пока нет машин.\n"
+            "Добавьте первую машину!",
+            reply_markup=garage_menu_keyboard()
         )
-    finally:
-        db.close()
+        return
+    
+    cars_count = await db.run(crud.count_cars)
+    await callback.message.edit_text(
+        f"🚗 *В гараже {cars_count} машин(ы)*\n\n"
+        "Выберите машину для подробной информации:",
+        reply_markup=cars_keyboard(cars, has_next=has_next),
+        parse_mode="Markdown"
+    )
+
+
+@router.callback_query(F.data.startswith("cars_page_"))
+async def page_cars(callback: CallbackQuery, db: AsyncDB):
+    # Pages of the garage list and of car selection when adding an expense
+    offset = page_offset(callback.data)
+    cars, has_next = split_page(await db.run(crud.get_cars, skip=offset, limit=KEYBOARD_PAGE_SIZE + 1))
+    await callback.message.edit_reply_markup(reply_markup=cars_keyboard(cars, offset, has_next))
+
+
+# Parts of the errors Telegram gives for a file_id it no longer accepts
+_STALE_FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file_id")
+
+
+def _is_stale_file_id(error: TelegramBadRequest) -> bool:
+    message = error.message.lower()
+    return any(part in message for part in _STALE_FILE_ID_ERRORS)
+
+
+def _photo_on_disk(car) -> bool:
+    return bool(car.photo_path) and os.path.exists(car.photo_path)
+
+
+async def answer_car_photo(message: Message, car, db: AsyncDB, caption: str, reply_markup) -> bool:
+    """Send the car photo by its Telegram file_id; upload it from disk only if the id is missing or stale"""
+    if car.photo_file_id:
+        try:
+            await message.answer_photo(
+                photo=car.photo_file_id,
+                caption=caption,
+                reply_markup=reply_markup,
+                parse_mode="Markdown"
+            )
+            return True
+        except TelegramBadRequest as e:
+            # Telegram no longer knows this file_id (e.g. the bot token changed)
+            if not _is_stale_file_id(e):
+                raise
+    
+    if not _photo_on_disk(car):
+        return False
+    
+    sent = await message.answer_photo(
+        photo=FSInputFile(car.photo_path),
+        caption=caption,
+        reply_markup=reply_markup,
+        parse_mode="Markdown"
+    )
+    photo = sent.photo[-1]
+    await db.run(crud.set_car_photo_file_id, car.id, photo.file_id, photo.file_unique_id)
+    return True
 
 
 @router.callback_query(F.data.startswith("car_"))
-async def show_car_details(callback: CallbackQuery):
+async def show_car_details(callback: CallbackQuery, db: AsyncDB):
     car_id = int(callback.data.split("_")[1])
     
-    db = SessionLocal()
-    try:
-        car = crud.get_car_by_id(db, car_id)
-        if not car:
-            await callback.answer("❌ Машина не найдена")
-            return
-        
-        # Get car statistics
-        total_expenses = sum(expense.amount for expense in car.expenses)
-        total_income = sum(
-            payment.amount 
-            for rental in car.rentals 
-            for payment in rental.payments
-        )
-        net_profit = total_income - total_expenses
-        
-        details = (
-            f"{format_car_info(car)}\n\n"
-            f"📊 *Финансовая статистика:*\n"
-            f"💰 Общий доход: {format_currency(total_income)}\n"
-            f"💸 Общие расходы: {format_currency(total_expenses)}\n"
-            f"📈 Чистая прибыль: {format_currency(net_profit)}\n"
-            f"📋 Количество аренд: {len(car.rentals)}"
-        )
-        
-        if car.photo_path and os.path.exists(car.photo_path):
-            with open(car.photo_path, 'rb') as photo:
-                await callback.message.delete()
-                await callback.message.answer_photo(
-                    photo=photo,
-                    caption=details,
-                    reply_markup=back_to_menu_keyboard(),
-                    parse_mode="Markdown"
-                )
-        else:
-            await callback.message.edit_text(
+    car = await db.run(crud.get_car_by_id, car_id)
+    if not car:
+        await callback.answer("❌ Машина не найдена")
+        return
+    
+    # Get car statistics
+    car_totals = (await db.run(crud.get_car_totals, [car.id]))[car.id]
+    total_expenses = car_totals["total_expenses"]
+    total_income = car_totals["total_income"]
+    net_profit = total_income - total_expenses
+    
+    details = (
+        f"{format_car_info(car)}\n\n"
+        f"📊 *Финансовая статистика:*\n"
+        f"💰 Общий доход: {format_currency(total_income)}\n"
+        f"💸 Общие расходы: {format_currency(total_expenses)}\n"
+        f"📈 Чистая прибыль: {format_currency(net_profit)}\n"
+        f"📋 Количество аренд: {car_totals['rental_count']}"
+    )
+    
+    if car.photo_file_id or _photo_on_disk(car):
+        await callback.message.delete()
+        if not await answer_car_photo(callback.message, car, db, details, back_to_menu_keyboard()):
+            await callback.message.answer(
                 details,
                 reply_markup=back_to_menu_keyboard(),
                 parse_mode="Markdown"
             )
-            
-    finally:
-        db.close()
+    else:
+        await callback.message.edit_text(
+            details,
+            reply_markup=back_to_menu_keyboard(),
+            parse_mode="Markdown"
+        )
@@ -1,12 +1,16 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.orm import Session
 
-from database.database import SessionLocal
 from database import crud
 from bot.states.states import AddPaymentStates, AddFineStates
-from bot.keyboards.inline import income_menu_keyboard, rentals_keyboard, back_to_menu_keyboard
+from bot.keyboards.inline import (
+    income_menu_keyboard, rentals_keyboard, back_to_menu_keyboard,
+    KEYBOARD_PAGE_SIZE, split_page
+)
 from bot.utils.helpers import format_currency, format_datetime
+from bot.utils.db import AsyncDB
 
 router = Router()
 
@@ -21,59 +25,51 @@ async def income_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "add_payment")
-async def start_add_payment(callback: CallbackQuery, state: FSMContext):
-    db = SessionLocal()
-    try:
-        active_rentals = crud.get_active_rentals(db)
-        
-        if not active_rentals:
-            await callback.message.edit_text(
-                "❌ Нет активных договоров аренды.\n"
-                "Сначала создайте договор аренды.",
-                reply_markup=income_menu_keyboard()
-            )
-            return
-        
+async def start_add_payment(callback: CallbackQuery, state: FSMContext, db: AsyncDB):
+    active_rentals, has_next = split_page(
+        await db.run(crud.get_active_rentals, profile="rental_parties", limit=KEYBOARD_PAGE_SIZE + 1)
+    )
+    
+    if not active_rentals:
         await callback.message.edit_text(
-            "💰 *Добавление платежа*\n\n"
-            "Выберите договор аренды:",
-            reply_markup=rentals_keyboard(active_rentals),
-            parse_mode="Markdown"
+            "❌ Нет активных договоров аренды.\n"
+            "Сначала создайте договор аренды.",
+            reply_markup=income_menu_keyboard()
         )
-        await state.set_state(AddPaymentStates.waiting_for_rental_selection)
-        
-    finally:
-        db.close()
+        return
+    
+    await callback.message.edit_text(
+        "💰 *Добавление платежа*\n\n"
+        "Выберите договор аренды:",
+        reply_markup=rentals_keyboard(active_rentals, has_next=has_next),
+        parse_mode="Markdown"
+    )
+    await state.set_state(AddPaymentStates.waiting_for_rental_selection)
 
 
 @router.callback_query(AddPaymentStates.waiting_for_rental_selection, F.data.startswith("rental_"))
-async def select_rental_for_payment(callback: CallbackQuery, state: FSMContext):
+async def select_rental_for_payment(callback: CallbackQuery, state: FSMContext, db: AsyncDB):
     rental_id = int(callback.data.split("_")[1])
     
-    db = SessionLocal()
-    try:
-        rental = crud.get_rental_by_id(db, rental_id)
-        if not rental:
-            await callback.answer("❌ Договор не найден")
-            return
-        
-        remaining_amount = rental.total_amount - rental.paid_amount
-        
-        await state.update_data(rental_id=rental_id)
-        await callback.message.edit_text(
-            f"💰 *Платёж по договору №{rental_id}*\n\n"
-            f"🚗 {rental.car.brand} {rental.car.model}\n"
-            f"👤 {rental.renter.name}\n\n"
-            f"💵 Общая сумма: {format_currency(rental.total_amount)}\n"
-            f"✅ Оплачено: {format_currency(rental.paid_amount)}\n"
-            f"❗ К доплате: {format_currency(remaining_amount)}\n\n"
-            f"Введите сумму платежа:",
-            parse_mode="Markdown"
-        )
-        await state.set_state(AddPaymentStates.waiting_for_amount)
-        
-    finally:
-        db.close()
+    rental = await db.run(crud.get_rental_by_id, rental_id, profile="rental_parties")
+    if not rental:
+        await callback.answer("❌ Договор не найден")
+        return
+    
+    remaining_amount = rental.total_amount - rental.paid_amount
+    
+    await state.update_data(rental_id=rental_id)
+    await callback.message.edit_text(
+        f"💰 *Платёж по договору №{rental_id}*\n\n"
+        f"🚗 {rental.car.brand} {rental.car.model}\n"
+        f"👤 {rental.renter.name}\n\n"
+        f"💵 Общая сумма: {format_currency(rental.total_amount)}\n"
+        f"✅ Оплачено: {format_currency(rental.paid_amount)}\n"
+        f"❗ К доплате: {format_currency(remaining_amount)}\n\n"
+        f"Введите сумму платежа:",
+        parse_mode="Markdown"
+    )
+    await state.set_state(AddPaymentStates.waiting_for_amount)
 
 
 @router.message(AddPaymentStates.waiting_for_amount)
@@ -97,30 +93,34 @@ async def process_payment_amount(message: Message, state: FSMContext):
 
 
 @router.message(AddPaymentStates.waiting_for_notes, F.text == "/skip")
-async def skip_payment_notes(message: Message, state: FSMContext):
-    await save_payment(message, state)
+async def skip_payment_notes(message: Message, state: FSMContext, db: AsyncDB):
+    await save_payment(message, state, db)
 
 
 @router.message(AddPaymentStates.waiting_for_notes)
-async def process_payment_notes(message: Message, state: FSMContext):
+async def process_payment_notes(message: Message, state: FSMContext, db: AsyncDB):
     await state.update_data(notes=message.text.strip())
-    await save_payment(message, state)
+    await save_payment(message, state, db)
+
 
+def _create_payment(db: Session, data: dict):
+    payment = crud.create_payment(
+        db=db,
+        rental_id=data['rental_id'],
+        amount=data['amount'],
+        notes=data.get('notes')
+    )
+    
+    # Get updated rental info
+    rental = crud.get_rental_by_id(db, data['rental_id'])
+    return payment, rental
 
-async def save_payment(message: Message, state: FSMContext):
+
+async def save_payment(message: Message, state: FSMContext, db: AsyncDB):
     data = await state.get_data()
     
-    db = SessionLocal()
     try:
-        payment = crud.create_payment(
-            db=db,
-            rental_id=data['rental_id'],
-            amount=data['amount'],
-            notes=data.get('notes')
-        )
-        
-        # Get updated rental info
-        rental = crud.get_rental_by_id(db, data['rental_id'])
+        payment, rental = await db.run(_create_payment, data)
         remaining_amount = rental.total_amount - rental.paid_amount
         
         await message.answer(
@@ -134,92 +134,79 @@ async def save_payment(message: Message, state: FSMContext):
             reply_markup=back_to_menu_keyboard(),
             parse_mode="Markdown"
         )
-        
+    
     except Exception as e:
         await message.answer(
             f"❌ Ошибка при сохранении платежа: {str(e)}",
             reply_markup=back_to_menu_keyboard()
         )
     finally:
-        db.close()
         await state.clear()
 
 
+def _payment_history(db: Session):
+    # Get all payments from active and completed rentals
+    all_payments = []
+    total_income = 0
+    
+    for rental in crud.get_rentals(db, profile="rental_parties"):
+        payments = crud.get_rental_payments(db, rental.id)
+        for payment in payments:
+            all_payments.append({
+                'payment': payment,
+                'rental': rental
+            })
+            total_income += payment.amount
+    
+    return all_payments, total_income
+
+
 @router.callback_query(F.data == "payment_history")
-async def show_payment_history(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        # Get all payments from all rentals
-        all_payments = []
-        total_income = 0
-        
-        active_rentals = crud.get_active_rentals(db)
-        for rental in active_rentals:
-            payments = crud.get_rental_payments(db, rental.id)
-            for payment in payments:
-                all_payments.append({
-                    'payment': payment,
-                    'rental': rental
-                })
-                total_income += payment.amount
-        
-        # Also get payments from completed rentals
-        db_session = db
-        completed_rentals = db_session.query(crud.Rental).filter(crud.Rental.is_active == False).all()
-        for rental in completed_rentals:
-            payments = crud.get_rental_payments(db, rental.id)
-            for payment in payments:
-                all_payments.append({
-                    'payment': payment,
-                    'rental': rental
-                })
-                total_income += payment.amount
-        
-        if not all_payments:
-            await callback.message.edit_text(
-                "💰 История платежей пуста.",
-                reply_markup=income_menu_keyboard()
-            )
-            return
-        
-        # Sort by payment date descending
-        all_payments.sort(key=lambda x: x['payment'].payment_date, reverse=True)
-        
-        # Show last 10 payments
-        recent_payments = all_payments[:10]
-        
-        history_text = f"💰 *История платежей*\n\n"
-        history_text += f"📊 Общий доход: {format_currency(total_income)}\n"
-        history_text += f"📋 Всего платежей: {len(all_payments)}\n\n"
-        history_text += f"*Последние платежи:*\n\n"
-        
-        for item in recent_payments:
-            payment = item['payment']
-            rental = item['rental']
-            
-            history_text += (
-                f"💰 {format_currency(payment.amount)}\n"
-                f"🚗 {rental.car.brand} {rental.car.model}\n"
-                f"👤 {rental.renter.name}\n"
-                f"📅 {format_datetime(payment.payment_date)}\n"
-            )
-            
-            if payment.notes:
-                history_text += f"📝 {payment.notes}\n"
-            
-            history_text += "\n"
-        
-        if len(all_payments) > 10:
-            history_text += f"... и ещё {len(all_payments) - 10} платежей"
-        
+async def show_payment_history(callback: CallbackQuery, db: AsyncDB):
+    all_payments, total_income = await db.run(_payment_history)
+    
+    if not all_payments:
         await callback.message.edit_text(
-            history_text,
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
+            "💰 История платежей пуста.",
+            reply_markup=income_menu_keyboard()
         )
+        return
+    
+    # Sort by payment date descending
+    all_payments.sort(key=lambda x: x['payment'].payment_date, reverse=True)
+    
+    # Show last 10 payments
+    recent_payments = all_payments[:10]
+    
+    history_text = f"💰 *История платежей*\n\n"
+    history_text += f"📊 Общий доход: {format_currency(total_income)}\n"
+    history_text += f"📋 Всего платежей: {len(all_payments)}\n\n"
+    history_text += f"*Последние платежи:*\n\n"
+    
+    for item in recent_payments:
+        payment = item['payment']
+        rental = item['rental']
         
-    finally:
-        db.close()
+        history_text += (
+            f"💰 {format_currency(payment.amount)}\n"
+            f"🚗 {rental.car.brand} {rental.car.model}\n"
+            f"👤 {rental.renter.name}\n"
+            f"📅 {format_datetime(payment.payment_date)}\n"
+        )
+        
+        if payment.notes:
+            history_text += f"📝 {payment.notes}\n"
+        
+        history_text += "\n"
+    
+    if len(all_payments) > 10:
+        history_text += f"... и ещё {len(all_payments) - 10} платежей"
+    
+    await callback.message.edit_text(
+        history_text,
+        reply_markup=back_to_menu_keyboard(),
+        parse_mode="Markdown"
+    )
 
 
 @router.callback_query(F.data == "fines")
@@ -2,20 +2,22 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.orm import Session
-from datetime import datetime, date
+from datetime import date
 
-from database.database import SessionLocal
 from database import crud
-from database.models import RentalType, RentalStatus
-from bot.states.states import CreateRentalStates, AddRenterStates, AddPaymentStates, AddFineStates
+from database.models import RentalType
+from database.validators import validate_phone
+from bot.states.states import CreateRentalStates, AddRenterStates
 from bot.keyboards.inline import (
     rental_menu_keyboard, cars_keyboard, renters_keyboard, 
-    rental_type_keyboard, rentals_keyboard, back_to_menu_keyboard
+    rental_type_keyboard, rentals_keyboard, back_to_menu_keyboard,
+    KEYBOARD_PAGE_SIZE, split_page, page_offset
 )
 from bot.utils.helpers import (
-    format_rental_info, parse_date, format_currency, 
-    calculate_rental_days, validate_phone
+    format_rental_info, parse_date, format_currency,
+    escape_markdown, render_pages, send_pages
 )
+from bot.utils.db import AsyncDB
 
 router = Router()
 
@@ -30,50 +32,106 @@ async def rental_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "create_rental")
-async def start_create_rental(callback: CallbackQuery, state: FSMContext):
-    db = SessionLocal()
-    try:
-        available_cars = crud.get_available_cars(db)
-        
-        if not available_cars:
-            await callback.message.edit_text(
-                "❌ Нет доступных машин для аренды.\n"
-                "Все машины сданы в аренду или на обслуживании.",
-                reply_markup=rental_menu_keyboard()
-            )
-            return
-        
+async def start_create_rental(callback: CallbackQuery, state: FSMContext, db: AsyncDB):
+    available_cars, has_next = split_page(
+        await db.run(crud.get_available_cars, limit=KEYBOARD_PAGE_SIZE + 1)
+    )
+    
+    if not available_cars:
         await callback.message.edit_text(
-            "🚗 *Создание договора аренды*\n\n"
-            "Выберите машину:",
-            reply_markup=cars_keyboard(available_cars),
-            parse_mode="Markdown"
+            "❌ Нет доступных машин для аренды.\n"
+            "Все машины сданы в аренду или на обслуживании.",
+            reply_markup=rental_menu_keyboard()
         )
-        await state.set_state(CreateRentalStates.waiting_for_car_selection)
-        
-    finally:
-        db.close()
+        return
+    
+    await callback.message.edit_text(
+        "🚗 *Создание договора аренды*\n\n"
+        "Выберите машину или отправьте начало госномера для поиска:",
+        reply_markup=cars_keyboard(available_cars, has_next=has_next, page_prefix="available_cars"),
+        parse_mode="Markdown"
+    )
+    await state.set_state(CreateRentalStates.waiting_for_car_selection)
+
+
+@router.callback_query(CreateRentalStates.waiting_for_car_selection, F.data.startswith("available_cars_page_"))
+async def page_available_cars(callback: CallbackQuery, db: AsyncDB):
+    offset = page_offset(callback.data)
+    available_cars, has_next = split_page(
+        await db.run(crud.get_available_cars, skip=offset, limit=KEYBOARD_PAGE_SIZE + 1)
+    )
+    await callback.message.edit_reply_markup(
+        reply_markup=cars_keyboard(available_cars, offset, has_next, page_prefix="available_cars")
+    )
+
+
+@router.message(CreateRentalStates.waiting_for_car_selection)
+async def search_available_cars(message: Message, db: AsyncDB):
+    plate_prefix = (message.text or "").strip()
+    available_cars, has_more = split_page(
+        await db.run(crud.get_available_cars, limit=KEYBOARD_PAGE_SIZE + 1, plate_prefix=plate_prefix)
+    )
+    
+    if not available_cars:
+        await message.answer("❌ Свободных машин с таким госномером нет. Попробуйте ещё раз:")
+        return
+    
+    await message.answer(
+        _search_results_text(len(available_cars), has_more),
+        reply_markup=cars_keyboard(available_cars)
+    )
 
 
 @router.callback_query(CreateRentalStates.waiting_for_car_selection, F.data.startswith("car_"))
-async def select_car_for_rental(callback: CallbackQuery, state: FSMContext):
+async def select_car_for_rental(callback: CallbackQuery, state: FSMContext, db: AsyncDB):
     car_id = int(callback.data.split("_")[1])
     await state.update_data(car_id=car_id)
     
-    db = SessionLocal()
-    try:
-        renters = crud.get_renters(db)
-        
-        await callback.message.edit_text(
-            "👤 *Выберите арендатора*\n\n"
-            "Выберите из существующих или добавьте нового:",
-            reply_markup=renters_keyboard(renters),
-            parse_mode="Markdown"
+    renters, has_next = split_page(await db.run(crud.get_renters, limit=KEYBOARD_PAGE_SIZE + 1))
+    
+    await callback.message.edit_text(
+        "👤 *Выберите арендатора*\n\n"
+        "Выберите из существующих, добавьте нового "
+        "или отправьте начало телефона или ФИО для поиска:",
+        reply_markup=renters_keyboard(renters, has_next=has_next),
+        parse_mode="Markdown"
+    )
+    await state.set_state(CreateRentalStates.waiting_for_renter_selection)
+
+
+@router.callback_query(CreateRentalStates.waiting_for_renter_selection, F.data.startswith("renters_page_"))
+async def page_renters(callback: CallbackQuery, db: AsyncDB):
+    offset = page_offset(callback.data)
+    renters, has_next = split_page(
+        await db.run(crud.get_renters, skip=offset, limit=KEYBOARD_PAGE_SIZE + 1)
+    )
+    await callback.message.edit_reply_markup(reply_markup=renters_keyboard(renters, offset, has_next))
+
+
+@router.message(CreateRentalStates.waiting_for_renter_selection)
+async def search_renters(message: Message, db: AsyncDB):
+    search = (message.text or "").strip()
+    renters, has_more = split_page(
+        await db.run(crud.get_renters, limit=KEYBOARD_PAGE_SIZE + 1, search=search)
+    )
+    
+    if not renters:
+        await message.answer(
+            "❌ Арендаторы не найдены. Попробуйте ещё раз или добавьте нового:",
+            reply_markup=renters_keyboard([])
         )
-        await state.set_state(CreateRentalStates.waiting_for_renter_selection)
-        
-    finally:
-        db.close()
+        return
+    
+    await message.answer(
+        _search_results_text(len(renters), has_more),
+        reply_markup=renters_keyboard(renters)
+    )
+
+
+def _search_results_text(found: int, has_more: bool) -> str:
+    if has_more:
+        return f"🔍 Показаны первые {found}. Уточните запрос или выберите:"
+    return "🔍 Результаты поиска, выберите:"
 
 
 @router.callback_query(F.data == "add_renter")
@@ -153,23 +211,22 @@ async def process_renter_passport(message: Message, state: FSMContext):
 
 
 @router.message(AddRenterStates.waiting_for_notes, F.text == "/skip")
-async def skip_renter_notes(message: Message, state: FSMContext):
-    await save_renter_and_continue(message, state)
+async def skip_renter_notes(message: Message, state: FSMContext, db: AsyncDB):
+    await save_renter_and_continue(message, state, db)
 
 
 @router.message(AddRenterStates.waiting_for_notes)
-async def process_renter_notes(message: Message, state: FSMContext):
+async def process_renter_notes(message: Message, state: FSMContext, db: AsyncDB):
     await state.update_data(renter_notes=message.text.strip())
-    await save_renter_and_continue(message, state)
+    await save_renter_and_continue(message, state, db)
 
 
-async def save_renter_and_continue(message: Message, state: FSMContext):
+async def save_renter_and_continue(message: Message, state: FSMContext, db: AsyncDB):
     data = await state.get_data()
     
-    db = SessionLocal()
     try:
-        renter = crud.create_renter(
-            db=db,
+        renter = await db.run(
+            crud.create_renter,
             name=data['renter_name'],
             phone=data['renter_phone'],
             email=data.get('renter_email'),
@@ -185,15 +242,13 @@ async def save_renter_and_continue(message: Message, state: FSMContext):
             parse_mode="Markdown"
         )
         await state.set_state(CreateRentalStates.waiting_for_rental_type)
-        
+    
     except Exception as e:
         await message.answer(
             f"❌ Ошибка при сохранении арендатора: {str(e)}",
             reply_markup=back_to_menu_keyboard()
         )
         await state.clear()
-    finally:
-        db.close()
 
 
 @router.callback_query(CreateRentalStates.waiting_for_renter_selection, F.data.startswith("renter_"))
@@ -295,35 +350,39 @@ async def process_deposit(message: Message, state: FSMContext):
 
 
 @router.message(CreateRentalStates.waiting_for_notes, F.text == "/skip")
-async def skip_rental_notes(message: Message, state: FSMContext):
-    await create_rental_contract(message, state)
+async def skip_rental_notes(message: Message, state: FSMContext, db: AsyncDB):
+    await create_rental_contract(message, state, db)
 
 
 @router.message(CreateRentalStates.waiting_for_notes)
-async def process_rental_notes(message: Message, state: FSMContext):
+async def process_rental_notes(message: Message, state: FSMContext, db: AsyncDB):
     await state.update_data(contract_notes=message.text.strip())
-    await create_rental_contract(message, state)
+    await create_rental_contract(message, state, db)
 
 
-async def create_rental_contract(message: Message, state: FSMContext):
+def _create_rental(db: Session, data: dict):
+    # Get car info for daily rate
+    car = crud.get_car_by_id(db, data['car_id'])
+    
+    rental = crud.create_rental(
+        db=db,
+        car_id=data['car_id'],
+        renter_id=data['renter_id'],
+        rental_type=data['rental_type'],
+        start_date=data['start_date'],
+        end_date=data['end_date'],
+        daily_rate=car.daily_rate,
+        deposit=data['deposit'],
+        contract_notes=data.get('contract_notes')
+    )
+    return crud.get_rental_by_id(db, rental.id, profile="rental_parties")
+
+
+async def create_rental_contract(message: Message, state: FSMContext, db: AsyncDB):
     data = await state.get_data()
     
-    db = SessionLocal()
     try:
-        # Get car info for daily rate
-        car = crud.get_car_by_id(db, data['car_id'])
-        
-        rental = crud.create_rental(
-            db=db,
-            car_id=data['car_id'],
-            renter_id=data['renter_id'],
-            rental_type=data['rental_type'],
-            start_date=data['start_date'],
-            end_date=data['end_date'],
-            daily_rate=car.daily_rate,
-            deposit=data['deposit'],
-            contract_notes=data.get('contract_notes')
-        )
+        rental = await db.run(_create_rental, data)
         
         await message.answer(
             f"✅ *Договор аренды создан!*\n\n"
@@ -331,128 +390,118 @@ async def create_rental_contract(message: Message, state: FSMContext):
             reply_markup=back_to_menu_keyboard(),
             parse_mode="Markdown"
         )
-        
+    
+    except crud.BookingConflictError:
+        await message.answer(
+            "❌ Машина уже забронирована на эти даты. Выберите другие даты или другую машину.",
+            reply_markup=back_to_menu_keyboard()
+        )
     except Exception as e:
         await message.answer(
             f"❌ Ошибка при создании договора: {str(e)}",
             reply_markup=back_to_menu_keyboard()
         )
     finally:
-        db.close()
         await state.clear()
 
 
 @router.callback_query(F.data == "active_rentals")
-async def show_active_rentals(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        # Check for overdue rentals first
-        crud.check_overdue_rentals(db)
-        
-        active_rentals = crud.get_active_rentals(db)
-        
-        if not active_rentals:
-            await callback.message.edit_text(
-                "📋 Нет активных договоров аренды.",
-                reply_markup=rental_menu_keyboard()
-            )
-            return
-        
+async def show_active_rentals(callback: CallbackQuery, db: AsyncDB):
+    active_rentals, has_next = split_page(
+        await db.run(crud.get_active_rentals, profile="rental_parties", limit=KEYBOARD_PAGE_SIZE + 1)
+    )
+    
+    if not active_rentals:
         await callback.message.edit_text(
-            f"📋 *Активные аренды ({len(active_rentals)})*\n\n"
-            "Выберите договор для подробной информации:",
-            reply_markup=rentals_keyboard(active_rentals),
-            parse_mode="Markdown"
+            "📋 Нет активных договоров аренды.",
+            reply_markup=rental_menu_keyboard()
         )
-        
-    finally:
-        db.close()
+        return
+    
+    rentals_count = await db.run(crud.count_active_rentals)
+    await callback.message.edit_text(
+        f"📋 *Активные аренды ({rentals_count})*\n\n"
+        "Выберите договор для подробной информации:",
+        reply_markup=rentals_keyboard(active_rentals, has_next=has_next),
+        parse_mode="Markdown"
+    )
+
+
+@router.callback_query(F.data.startswith("rentals_page_"))
+async def page_active_rentals(callback: CallbackQuery, db: AsyncDB):
+    # Pages of the active rentals list and of rental selection when adding a payment
+    offset = page_offset(callback.data)
+    active_rentals, has_next = split_page(
+        await db.run(crud.get_active_rentals, profile="rental_parties", skip=offset, limit=KEYBOARD_PAGE_SIZE + 1)
+    )
+    await callback.message.edit_reply_markup(reply_markup=rentals_keyboard(active_rentals, offset, has_next))
 
 
 @router.callback_query(F.data.startswith("rental_"))
-async def show_rental_details(callback: CallbackQuery):
+async def show_rental_details(callback: CallbackQuery, db: AsyncDB):
     rental_id = int(callback.data.split("_")[1])
     
-    db = SessionLocal()
-    try:
-        rental = crud.get_rental_by_id(db, rental_id)
-        if not rental:
-            await callback.answer("❌ Договор не найден")
-            return
-        
-        await callback.message.edit_text(
-            format_rental_info(rental),
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
-        )
-        
-    finally:
-        db.close()
+    rental = await db.run(crud.get_rental_by_id, rental_id, profile="rental_parties")
+    if not rental:
+        await callback.answer("❌ Договор не найден")
+        return
+    
+    await callback.message.edit_text(
+        format_rental_info(rental),
+        reply_markup=back_to_menu_keyboard(),
+        parse_mode="Markdown"
+    )
 
 
 @router.callback_query(F.data == "overdue_rentals")
-async def show_overdue_rentals(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        # Update overdue status
-        overdue_rentals = crud.check_overdue_rentals(db)
-        
-        if not overdue_rentals:
-            await callback.message.edit_text(
-                "✅ Нет просроченных договоров.",
-                reply_markup=rental_menu_keyboard()
-            )
-            return
-        
-        rentals_text = "⚠️ *Просроченные договоры:*\n\n"
-        for rental in overdue_rentals:
-            rentals_text += (
-                f"🚗 {rental.car.brand} {rental.car.model}\n"
-                f"👤 {rental.renter.name}\n"
-                f"📞 {rental.renter.phone}\n"
-                f"📅 Просрочка: {rental.overdue_days} дн.\n"
-                f"💰 К доплате: {format_currency(rental.total_amount - rental.paid_amount)}\n\n"
-            )
-        
+async def show_overdue_rentals(callback: CallbackQuery, db: AsyncDB):
+    overdue_rentals = await db.run(crud.get_overdue_rentals, profile="rental_parties")
+    
+    if not overdue_rentals:
         await callback.message.edit_text(
-            rentals_text,
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
+            "✅ Нет просроченных договоров.",
+            reply_markup=rental_menu_keyboard()
         )
-        
-    finally:
-        db.close()
+        return
+    
+    entries = (
+        f"🚗 {escape_markdown(f'{rental.car.brand} {rental.car.model}')}\n"
+        f"👤 {escape_markdown(rental.renter.name)}\n"
+        f"📞 {escape_markdown(rental.renter.phone)}\n"
+        f"📅 Просрочка: {rental.current_overdue_days} дн.\n"
+        f"💰 К доплате: {format_currency(rental.total_amount - rental.paid_amount)}\n\n"
+        for rental in overdue_rentals
+    )
+    
+    await send_pages(
+        callback.message,
+        render_pages("⚠️ *Просроченные договоры:*\n\n", entries),
+        reply_markup=back_to_menu_keyboard()
+    )
 
 
 @router.callback_query(F.data == "renters")
-async def show_renters(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        renters = crud.get_renters(db)
-        
-        if not renters:
-            await callback.message.edit_text(
-                "👥 Список арендаторов пуст.",
-                reply_markup=rental_menu_keyboard()
-            )
-            return
-        
-        renters_text = f"👥 *Арендаторы ({len(renters)})*\n\n"
-        for renter in renters:
-            active_rentals = [r for r in renter.rentals if r.is_active]
-            status = f"({len(active_rentals)} активных)" if active_rentals else "(нет активных)"
-            
-            renters_text += (
-                f"👤 {renter.name}\n"
-                f"📞 {renter.phone}\n"
-                f"📊 {status}\n\n"
-            )
-        
+async def show_renters(callback: CallbackQuery, db: AsyncDB):
+    renters = await db.run(crud.get_renters, profile="renter_rentals")
+    
+    if not renters:
         await callback.message.edit_text(
-            renters_text,
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
+            "👥 Список арендаторов пуст.",
+            reply_markup=rental_menu_keyboard()
         )
-        
-    finally:
-        db.close()
+        return
+    
+    def entry(renter) -> str:
+        active_rentals = [r for r in renter.rentals if r.is_active]
+        status = f"({len(active_rentals)} активных)" if active_rentals else "(нет активных)"
+        return (
+            f"👤 {escape_markdown(renter.name)}\n"
+            f"📞 {escape_markdown(renter.phone)}\n"
+            f"📊 {status}\n\n"
+        )
+    
+    await send_pages(
+        callback.message,
+        render_pages(f"👥 *Арендаторы ({len(renters)})*\n\n", (entry(renter) for renter in renters)),
+        reply_markup=back_to_menu_keyboard()
+    )
@@ -1,11 +1,12 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 
-from database.database import SessionLocal
 from database import crud
+from database.report_cache import report_cache
 from bot.keyboards.inline import reports_menu_keyboard, back_to_menu_keyboard
-from bot.utils.helpers import format_currency
+from bot.utils.helpers import format_currency, escape_markdown, render_pages, send_pages
+from bot.utils.db import AsyncDB
 
 router = Router()
 
@@ -20,170 +21,214 @@ async def reports_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "car_profitability")
-async def show_car_profitability(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        cars = crud.get_cars(db)
-        
-        if not cars:
-            await callback.message.edit_text(
-                "❌ В гараже нет машин.",
-                reply_markup=reports_menu_keyboard()
-            )
-            return
-        
-        report_text = "📊 *Доходность машин*\n\n"
-        
-        car_profits = []
-        total_income = 0
-        total_expenses = 0
-        
-        for car in cars:
-            profitability = crud.get_car_profitability(db, car.id)
-            if profitability:
-                car_profits.append(profitability)
-                total_income += profitability['total_income']
-                total_expenses += profitability['total_expenses']
-        
-        if not car_profits:
-            await callback.message.edit_text(
-                "📊 Нет данных для расчёта доходности.\n"
-                "Добавьте доходы и расходы.",
-                reply_markup=reports_menu_keyboard()
-            )
-            return
-        
-        # Sort by net profit descending
-        car_profits.sort(key=lambda x: x['net_profit'], reverse=True)
-        
-        total_profit = total_income - total_expenses
-        
-        report_text += f"📈 *Общая статистика:*\n"
-        report_text += f"💰 Общий доход: {format_currency(total_income)}\n"
-        report_text += f"💸 Общие расходы: {format_currency(total_expenses)}\n"
-        report_text += f"📊 Чистая прибыль: {format_currency(total_profit)}\n\n"
-        
-        report_text += f"*По машинам:*\n\n"
-        
-        for i, profit_data in enumerate(car_profits, 1):
-            profit_emoji = "📈" if profit_data['net_profit'] > 0 else "📉"
-            roi_text = f"ROI: {profit_data['roi']:.1f}%" if profit_data['roi'] != 0 else "ROI: н/д"
-            
-            report_text += (
-                f"{profit_emoji} *{i}. {profit_data['car_info']}*\n"
-                f"💰 Доход: {format_currency(profit_data['total_income'])}\n"
-                f"💸 Расходы: {format_currency(profit_data['total_expenses'])}\n"
-                f"📊 Прибыль: {format_currency(profit_data['net_profit'])}\n"
-                f"📈 {roi_text}\n\n"
-            )
-        
+async def show_car_profitability(callback: CallbackQuery, db: AsyncDB):
+    car_profits = await report_cache.get_or_compute(
+        ("bot:car_profitability",),
+        lambda: db.run(crud.get_fleet_profitability)
+    )
+    
+    if not car_profits:
         await callback.message.edit_text(
-            report_text,
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
+            "❌ В гараже нет машин.",
+            reply_markup=reports_menu_keyboard()
         )
-        
-    finally:
-        db.close()
+        return
+    
+    total_income = sum(p['total_income'] for p in car_profits)
+    total_expenses = sum(p['total_expenses'] for p in car_profits)
+    
+    total_profit = total_income - total_expenses
+    
+    header = (
+        "📊 *Доходность машин*\n\n"
+        "📈 *Общая статистика:*\n"
+        f"💰 Общий доход: {format_currency(total_income)}\n"
+        f"💸 Общие расходы: {format_currency(total_expenses)}\n"
+        f"📊 Чистая прибыль: {format_currency(total_profit)}\n\n"
+        "*По машинам:*\n\n"
+    )
+    
+    def entry(i: int, profit_data) -> str:
+        profit_emoji = "📈" if profit_data['net_profit'] > 0 else "📉"
+        roi_text = f"ROI: {profit_data['roi']:.1f}%" if profit_data['roi'] != 0 else "ROI: н/д"
+        return (
+            f"{profit_emoji} *{i}.* {escape_markdown(profit_data['car_info'])}\n"
+            f"💰 Доход: {format_currency(profit_data['total_income'])}\n"
+            f"💸 Расходы: {format_currency(profit_data['total_expenses'])}\n"
+            f"📊 Прибыль: {format_currency(profit_data['net_profit'])}\n"
+            f"📈 {roi_text}\n\n"
+        )
+    
+    await send_pages(
+        callback.message,
+        render_pages(header, (entry(i, profit_data) for i, profit_data in enumerate(car_profits, 1))),
+        reply_markup=back_to_menu_keyboard()
+    )
 
 
 @router.callback_query(F.data == "financial_report")
-async def show_financial_report(callback: CallbackQuery):
-    db = SessionLocal()
-    try:
-        current_date = datetime.now()
-        
-        # Current month
-        current_month_income = crud.get_monthly_income(db, current_date.year, current_date.month)
-        current_month_expenses = crud.get_monthly_expenses(db, current_date.year, current_date.month)
-        
-        # Previous month
-        prev_month_date = current_date.replace(day=1) - timedelta(days=1)
-        prev_month_income = crud.get_monthly_income(db, prev_month_date.year, prev_month_date.month)
-        prev_month_expenses = crud.get_monthly_expenses(db, prev_month_date.year, prev_month_date.month)
-        
-        # Current year totals
-        year_income = 0
-        year_expenses = 0
-        for month in range(1, current_date.month + 1):
-            year_income += crud.get_monthly_income(db, current_date.year, month)
-            year_expenses += crud.get_monthly_expenses(db, current_date.year, month)
-        
-        # Active rentals statistics
-        active_rentals = crud.get_active_rentals(db)
-        overdue_rentals = [r for r in active_rentals if r.is_overdue]
-        
-        # Cars statistics
-        cars = crud.get_cars(db)
-        available_cars = crud.get_available_cars(db)
-        rented_cars = len(cars) - len(available_cars)
-        
-        current_month_profit = current_month_income - current_month_expenses
-        prev_month_profit = prev_month_income - prev_month_expenses
-        year_profit = year_income - year_expenses
-        
-        months = [
-            "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
-            "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
-        ]
-        
-        current_month_name = months[current_date.month - 1]
-        prev_month_name = months[prev_month_date.month - 1]
-        
-        report_text = f"📈 *Финансовый отчёт*\n\n"
-        
-        # Current month
-        profit_emoji = "📈" if current_month_profit > 0 else "📉"
-        report_text += f"📅 *{current_month_name} {current_date.year}:*\n"
-        report_text += f"💰 Доходы: {format_currency(current_month_income)}\n"
-        report_text += f"💸 Расходы: {format_currency(current_month_expenses)}\n"
-        report_text += f"{profit_emoji} Прибыль: {format_currency(current_month_profit)}\n\n"
-        
-        # Previous month comparison
-        if prev_month_income > 0 or prev_month_expenses > 0:
-            prev_profit_emoji = "📈" if prev_month_profit > 0 else "📉"
-            
-            income_change = current_month_income - prev_month_income
-            expense_change = current_month_expenses - prev_month_expenses
-            profit_change = current_month_profit - prev_month_profit
-            
-            income_trend = "📈" if income_change > 0 else "📉" if income_change < 0 else "➡️"
-            expense_trend = "📈" if expense_change > 0 else "📉" if expense_change < 0 else "➡️"
-            profit_trend = "📈" if profit_change > 0 else "📉" if profit_change < 0 else "➡️"
-            
-            report_text += f"📅 *{prev_month_name} (сравнение):*\n"
-            report_text += f"💰 Доходы: {format_currency(prev_month_income)} {income_trend}\n"
-            report_text += f"💸 Расходы: {format_currency(prev_month_expenses)} {expense_trend}\n"
-            report_text += f"{prev_profit_emoji} Прибыль: {format_currency(prev_month_profit)} {profit_trend}\n\n"
-        
-        # Year totals
-        year_profit_emoji = "📈" if year_profit > 0 else "📉"
-        report_text += f"📅 *Год {current_date.year} (всего):*\n"
-        report_text += f"💰 Доходы: {format_currency(year_income)}\n"
-        report_text += f"💸 Расходы: {format_currency(year_expenses)}\n"
-        report_text += f"{year_profit_emoji} Прибыль: {format_currency(year_profit)}\n\n"
-        
-        # Fleet statistics
-        report_text += f"🚗 *Статистика автопарка:*\n"
-        report_text += f"📋 Всего машин: {len(cars)}\n"
-        report_text += f"✅ Доступно: {len(available_cars)}\n"
-        report_text += f"🔴 Сдано в аренду: {rented_cars}\n"
-        report_text += f"📝 Активных договоров: {len(active_rentals)}\n"
-        
-        if overdue_rentals:
-            report_text += f"⚠️ Просрочек: {len(overdue_rentals)}\n"
-        
-        # Average daily income
-        days_in_month = current_date.day
-        if days_in_month > 0 and current_month_income > 0:
-            avg_daily_income = current_month_income / days_in_month
-            report_text += f"\n📊 Средний дневной доход: {format_currency(avg_daily_income)}"
-        
-        await callback.message.edit_text(
-            report_text,
-            reply_markup=back_to_menu_keyboard(),
-            parse_mode="Markdown"
-        )
-        
-    finally:
-        db.close()
+async def show_financial_report(callback: CallbackQuery, db: AsyncDB):
+    current_date = datetime.now()
+    report_text = await report_cache.get_or_compute(
+        ("bot:financial_report", current_date.date()),
+        lambda: _build_financial_report(db, current_date)
+    )
+    
+    await callback.message.edit_text(
+        report_text,
+        reply_markup=back_to_menu_keyboard(),
+        parse_mode="Markdown"
+    )
+
+
+async def _build_financial_report(db: AsyncDB, current_date: datetime) -> str:
+    today = current_date.date()
+    prev_month_date = crud.shift_month(today, -1)
+    
+    # Previous month, current month and the current year in one series
+    series = await db.run(crud.get_monthly_series, min(prev_month_date, date(today.year, 1, 1)), today)
+    by_month = {(item['year'], item['month']): item for item in series}
+    
+    # Current month
+    current_month_income = by_month[(today.year, today.month)]['income']
+    current_month_expenses = by_month[(today.year, today.month)]['expenses']
+    
+    # Previous month
+    prev_month_income = by_month[(prev_month_date.year, prev_month_date.month)]['income']
+    prev_month_expenses = by_month[(prev_month_date.year, prev_month_date.month)]['expenses']
+    
+    # Current year totals
+    year_income = sum(item['income'] for item in series if item['year'] == today.year)
+    year_expenses = sum(item['expenses'] for item in series if item['year'] == today.year)
+    
+    # Active rentals statistics
+    active_rentals = await db.run(crud.get_active_rentals)
+    overdue_rentals = [r for r in active_rentals if r.is_currently_overdue]
+    
+    # Cars statistics
+    # Counted, not listed: get_cars stops at its default page of 100
+    cars_count = await db.run(crud.count_cars)
+    available_cars = await db.run(crud.get_available_cars)
+    rented_cars = cars_count - len(available_cars)
+    
+    current_month_profit = current_month_income - current_month_expenses
+    prev_month_profit = prev_month_income - prev_month_expenses
+    year_profit = year_income - year_expenses
+    
+    months = [
+        "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+        "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
+    ]
+    
+    current_month_name = months[current_date.month - 1]
+    prev_month_name = months[prev_month_date.month - 1]
+    
+    report_text = f"📈 *Финансовый отчёт*\n\n"
+    
+    # Current month
+    profit_emoji = "📈" if current_month_profit > 0 else "📉"
+    report_text += f"📅 *{current_month_name} {current_date.year}:*\n"
+    report_text += f"💰 Доходы: {format_currency(current_month_income)}\n"
+    report_text += f"💸 Расходы: {format_currency(current_month_expenses)}\n"
+    report_text += f"{profit_emoji} Прибыль: {format_currency(current_month_profit)}\n\n"
+    
+    # Previous month comparison
+    if prev_month_income > 0 or prev_month_expenses > 0:
+        prev_profit_emoji = "📈" if prev_month_profit > 0 else "📉"
+        
+        income_change = current_month_income - prev_month_income
+        expense_change = current_month_expenses - prev_month_expenses
+        profit_change = current_month_profit - prev_month_profit
+        
+        income_trend = "📈" if income_change > 0 else "📉" if income_change < 0 else "➡️"
+        expense_trend = "📈" if expense_change > 0 else "📉" if expense_change < 0 else "➡️"
+        profit_trend = "📈" if profit_change > 0 else "📉" if profit_change < 0 else "➡️"
+        
+        report_text += f"📅 *{prev_month_name} (сравнение):*\n"
+        report_text += f"💰 Доходы: {format_currency(prev_month_income)} {income_trend}\n"
+        report_text += f"💸 Расходы: {format_currency(prev_month_expenses)} {expense_trend}\n"
+        report_text += f"{prev_profit_emoji} Прибыль: {format_currency(prev_month_profit)} {profit_trend}\n\n"
+    
+    # Year totals
+    year_profit_emoji = "📈" if year_profit > 0 else "📉"
+    report_text += f"📅 *Год {current_date.year} (всего):*\n"
+    report_text += f"💰 Доходы: {format_currency(year_income)}\n"
+    report_text += f"💸 Расходы: {format_currency(year_expenses)}\n"
+    report_text += f"{year_profit_emoji} Прибыль: {format_currency(year_profit)}\n\n"
+    
+    # Fleet statistics
+    report_text += f"🚗 *Статистика автопарка:*\n"
+    report_text += f"📋 Всего машин: {cars_count}\n"
+    report_text += f"✅ Доступно: {len(available_cars)}\n"
+    report_text += f"🔴 Сдано в аренду: {rented_cars}\n"
+    report_text += f"📝 Активных договоров: {len(active_rentals)}\n"
+    
+    if overdue_rentals:
+        report_text += f"⚠️ Просрочек: {len(overdue_rentals)}\n"
+    
+    # Average daily income
+    days_in_month = current_date.day
+    if days_in_month > 0 and current_month_income > 0:
+        avg_daily_income = current_month_income / days_in_month
+        report_text += f"\n📊 Средний дневной доход: {format_currency(avg_daily_income)}"
+    
+    return report_text
+
+
+# Cars listed by name in the utilization report, busiest first
+UTILIZATION_TOP_CARS = 15
+
+
+@router.callback_query(F.data == "fleet_utilization")
+async def show_fleet_utilization(callback: CallbackQuery, db: AsyncDB):
+    today = date.today()
+    report_text = await report_cache.get_or_compute(
+        ("bot:fleet_utilization", today),
+        lambda: _build_utilization_report(db, today)
+    )
+    
+    await callback.message.edit_text(
+        report_text,
+        reply_markup=back_to_menu_keyboard(),
+        parse_mode="Markdown"
+    )
+
+
+async def _build_utilization_report(db: AsyncDB, today: date) -> str:
+    # Last 30 days per car, and the last three months for the fleet
+    recent = await db.run(crud.get_utilization, today - timedelta(days=29), today)
+    monthly = await db.run(crud.get_utilization, crud.shift_month(today, -2), today, "month")
+    
+    if not recent['cars']:
+        return "❌ В гараже нет машин."
+    
+    months = [
+        "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+        "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
+    ]
+    
+    report_text = "🚦 *Загрузка автопарка*\n\n"
+    
+    fleet = recent['fleet']
+    report_text += f"📅 *Последние 30 дней:*\n"
+    report_text += f"📊 Загрузка: {fleet['utilization']:.1f}%\n"
+    report_text += f"🚗 Дней в аренде: {fleet['rented_days']} из {fleet['calendar_days']}\n\n"
+    
+    report_text += f"*По месяцам:*\n"
+    for item in monthly['buckets']:
+        month_start = date.fromisoformat(item['start_date'])
+        report_text += f"📅 {months[month_start.month - 1]} {month_start.year}: {item['utilization']:.1f}%\n"
+    
+    cars = sorted(recent['cars'], key=lambda car: car['utilization'], reverse=True)
+    idle_cars = [car for car in cars if car['rented_days'] == 0]
+    
+    report_text += f"\n*По машинам (30 дней):*\n"
+    for car in cars[:UTILIZATION_TOP_CARS]:
+        report_text += f"🚗 {escape_markdown(car['car_info'])}: {car['utilization']:.1f}% ({car['rented_days']} дн.)\n"
+    if len(cars) > UTILIZATION_TOP_CARS:
+        report_text += f"… и ещё {len(cars) - UTILIZATION_TOP_CARS} машин\n"
+    
+    if idle_cars:
+        report_text += f"\n⚠️ Без аренды за 30 дней: {len(idle_cars)} машин"
+    
+    return report_text
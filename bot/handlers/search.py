@@ -0,0 +1,86 @@
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from sqlalchemy.orm import Session
+
+import config
+from database import crud
+from bot.utils.helpers import format_rental_info, format_currency, get_status_text, escape_markdown
+from bot.utils.db import AsyncDB
+
+router = Router()
+
+
+# Titles and descriptions are plain text; only message_text is parsed as Markdown,
+# so user data goes there escaped (format_rental_info escapes its own)
+def _car_result(car) -> InlineQueryResultArticle:
+    details = [
+        f"🚗 {escape_markdown(f'{car.brand} {car.model}')}",
+        f"📋 Номер: {escape_markdown(car.license_plate)}",
+        f"🆔 VIN: {escape_markdown(car.vin)}",
+        f"💰 Тариф: {format_currency(car.daily_rate)}/день",
+        f"📊 Статус: {get_status_text(car.status.value)}"
+    ]
+    
+    return InlineQueryResultArticle(
+        id=f"car:{car.id}",
+        title=f"🚗 {car.brand} {car.model} ({car.license_plate})",
+        description=f"VIN {car.vin} · {get_status_text(car.status.value)} · {format_currency(car.daily_rate)}/день",
+        input_message_content=InputTextMessageContent(
+            message_text="\n".join(details),
+            parse_mode="Markdown"
+        )
+    )
+
+
+def _renter_result(renter) -> InlineQueryResultArticle:
+    details = [f"👤 {escape_markdown(renter.name)}", f"📞 {escape_markdown(renter.phone)}"]
+    if renter.email:
+        details.append(f"📧 {escape_markdown(renter.email)}")
+    if renter.notes:
+        details.append(f"📝 {escape_markdown(renter.notes)}")
+    
+    return InlineQueryResultArticle(
+        id=f"renter:{renter.id}",
+        title=f"👤 {renter.name}",
+        description=renter.phone,
+        input_message_content=InputTextMessageContent(
+            message_text="\n".join(details),
+            parse_mode="Markdown"
+        )
+    )
+
+
+def _rental_result(rental) -> InlineQueryResultArticle:
+    overdue = " · ⚠️ просрочка" if rental.is_currently_overdue else ""
+    return InlineQueryResultArticle(
+        id=f"rental:{rental.id}",
+        title=f"📋 №{rental.id}: {rental.car.brand} {rental.car.model} ({rental.car.license_plate})",
+        description=f"{rental.renter.name} · до {rental.end_date.strftime('%d.%m.%Y')}{overdue}",
+        input_message_content=InputTextMessageContent(
+            message_text=format_rental_info(rental),
+            parse_mode="Markdown"
+        )
+    )
+
+
+def _search(db: Session, text: str) -> list:
+    limit = config.INLINE_RESULTS_PER_KIND
+    rentals = crud.search_active_rentals(db, text, limit=limit, profile="rental_parties")
+    
+    # An empty query lists the active rentals that end soonest
+    if not text:
+        return [_rental_result(rental) for rental in rentals]
+    
+    return (
+        [_rental_result(rental) for rental in rentals]
+        + [_car_result(car) for car in crud.search_cars(db, text, limit=limit)]
+        + [_renter_result(renter) for renter in crud.search_renters(db, text, limit=limit)]
+    )
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery, db: AsyncDB):
+    results = await db.run(_search, inline_query.query.strip())
+    
+    # is_personal: Telegram caches the answer per user, not for everyone typing the same text
+    await inline_query.answer(results, cache_time=config.INLINE_CACHE_TIME, is_personal=True)
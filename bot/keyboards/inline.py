@@ -1,6 +1,29 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from database.models import Car, Rental, ExpenseType, RentalType
-from typing import List
+from typing import List, Tuple
+
+# Rows per page in list keyboards: Telegram rejects oversized keyboards
+KEYBOARD_PAGE_SIZE = 10
+
+
+def split_page(items: list) -> Tuple[list, bool]:
+    """Split a list fetched with limit=KEYBOARD_PAGE_SIZE + 1 into (page, has_next)"""
+    return items[:KEYBOARD_PAGE_SIZE], len(items) > KEYBOARD_PAGE_SIZE
+
+
+def _page_row(page_prefix: str, offset: int, has_next: bool) -> List[InlineKeyboardButton]:
+    # The offset of the page to open travels in callback_data: "<prefix>_page_<offset>"
+    row = []
+    if offset > 0:
+        previous_offset = max(offset - KEYBOARD_PAGE_SIZE, 0)
+        row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"{page_prefix}_page_{previous_offset}"))
+    if has_next:
+        row.append(InlineKeyboardButton(text="Далее ➡️", callback_data=f"{page_prefix}_page_{offset + KEYBOARD_PAGE_SIZE}"))
+    return row
+
+
+def page_offset(callback_data: str) -> int:
+    return int(callback_data.rsplit("_", 1)[1])
 
 
 def main_menu_keyboard():
@@ -58,17 +81,21 @@ def reports_menu_keyboard():
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📊 Доходность машин", callback_data="car_profitability")],
         [InlineKeyboardButton(text="📈 Финансовый отчёт", callback_data="financial_report")],
+        [InlineKeyboardButton(text="🚦 Загрузка автопарка", callback_data="fleet_utilization")],
         [InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")],
     ])
     return keyboard
 
 
-def cars_keyboard(cars: List[Car]):
+def cars_keyboard(cars: List[Car], offset: int = 0, has_next: bool = False, page_prefix: str = "cars"):
     keyboard = []
     for car in cars:
         text = f"{car.brand} {car.model} ({car.license_plate})"
         keyboard.append([InlineKeyboardButton(text=text, callback_data=f"car_{car.id}")])
     
+    page_row = _page_row(page_prefix, offset, has_next)
+    if page_row:
+        keyboard.append(page_row)
     keyboard.append([InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -94,22 +121,29 @@ def rental_type_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def rentals_keyboard(rentals: List[Rental]):
+def rentals_keyboard(rentals: List[Rental], offset: int = 0, has_next: bool = False):
+    # Rentals must come with the "rental_parties" profile: car and renter are read per row
     keyboard = []
     for rental in rentals:
         text = f"{rental.car.brand} {rental.car.model} - {rental.renter.name}"
         keyboard.append([InlineKeyboardButton(text=text, callback_data=f"rental_{rental.id}")])
     
+    page_row = _page_row("rentals", offset, has_next)
+    if page_row:
+        keyboard.append(page_row)
     keyboard.append([InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def renters_keyboard(renters):
+def renters_keyboard(renters, offset: int = 0, has_next: bool = False):
     keyboard = []
     for renter in renters:
         text = f"{renter.name} ({renter.phone})"
         keyboard.append([InlineKeyboardButton(text=text, callback_data=f"renter_{renter.id}")])
     
+    page_row = _page_row("renters", offset, has_next)
+    if page_row:
+        keyboard.append(page_row)
     keyboard.append([InlineKeyboardButton(text="➕ Добавить нового", callback_data="add_renter")])
     keyboard.append([InlineKeyboardButton(text="❌ Отмена", callback_data="main_menu")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
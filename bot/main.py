@@ -1,15 +1,24 @@
 import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
 from aiogram import Bot, Dispatcher
 from aiogram.types import Message
 from aiogram.filters import CommandStart
-from aiogram.fsm.storage.memory import MemoryStorage
 
 import config
 from database.database import engine
 from database.models import Base
+from database import crud
 from bot.keyboards.inline import main_menu_keyboard, back_to_menu_keyboard
-from bot.handlers import garage, rental, expenses, income, reports
+from bot.handlers import garage, rental, expenses, income, reports, search
+from bot.middlewares.database import DatabaseMiddleware
+from bot.middlewares.send_queue import SendQueueMiddleware
+from bot.utils.db import open_db
+from bot.utils.fsm_storage import create_fsm_storage
+from bot.utils.send_queue import send_queue
+from bot.webhook import WebhookUpdates, run_webhook_server, set_webhook
 
 # Configure logging
 logging.basicConfig(
@@ -62,25 +71,46 @@ async def setup_database():
         raise
 
 
-async def main():
-    """Main function to run the bot"""
-    # Check if bot token is provided
-    if not config.BOT_TOKEN:
-        logger.error("BOT_TOKEN not provided in environment variables")
-        return
-    
-    if not config.ADMIN_ID:
-        logger.error("ADMIN_ID not provided in environment variables")
-        return
-    
-    # Setup database
-    await setup_database()
-    
-    # Initialize bot and dispatcher
+async def overdue_sweeper():
+    """Sweep overdue rentals and started bookings on startup and then every OVERDUE_SWEEP_INTERVAL seconds"""
+    while True:
+        db = open_db()
+        try:
+            updated = await db.run(crud.sweep_overdue_rentals)
+            logger.info(f"Overdue sweep marked {updated} rentals as overdue")
+            started = await db.run(crud.start_booked_rentals)
+            logger.info(f"Overdue sweep marked {started} booked cars as rented")
+        except Exception as e:
+            logger.error(f"Overdue sweep failed: {e}")
+        finally:
+            await db.close()
+        await asyncio.sleep(config.OVERDUE_SWEEP_INTERVAL)
+
+
+async def send_queue_reporter():
+    """Log send queue depth and latency every SEND_QUEUE_STATS_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(config.SEND_QUEUE_STATS_INTERVAL)
+        logger.info(f"Send queue: {send_queue.stats()}")
+
+
+def create_bot() -> Bot:
     bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
+    
+    # Rate-limit and retry everything the bot sends to chats
+    bot.session.middleware(SendQueueMiddleware(send_queue, config.SEND_MAX_RETRIES))
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """Dispatcher with all handlers, routers and middlewares registered"""
+    # Dialog state outlives restarts (FSM_STORAGE)
+    storage = create_fsm_storage()
     dp = Dispatcher(storage=storage)
     
+    # One database session per update, closed after the handler finishes
+    dp.update.outer_middleware(DatabaseMiddleware())
+    
     # Register handlers
     dp.message.register(start_command, CommandStart())
     
@@ -93,6 +123,7 @@ async def main():
     dp.include_router(expenses.router)
     dp.include_router(income.router)
     dp.include_router(reports.router)
+    dp.include_router(search.router)
     
     # Add middleware to check admin access
     @dp.message.middleware()
@@ -109,15 +140,91 @@ async def main():
             return
         return await handler(event, data)
     
-    # Start polling
-    logger.info("Starting bot...")
+    @dp.inline_query.middleware()
+    async def check_admin_inline_middleware(handler, event, data):
+        if event.from_user.id != config.ADMIN_ID:
+            await event.answer([], cache_time=config.INLINE_CACHE_TIME, is_personal=True)
+            return
+        return await handler(event, data)
+    
+    return dp
+
+
+def start_background_tasks() -> List[asyncio.Task]:
+    # Keep overdue flags fresh in the background instead of on every read
+    tasks = [asyncio.create_task(overdue_sweeper())]
+    if config.SEND_QUEUE_STATS_INTERVAL > 0:
+        tasks.append(asyncio.create_task(send_queue_reporter()))
+    return tasks
+
+
+def bot_in_web_app() -> bool:
+    """The bot is served by the FastAPI app (web/main.py) rather than its own process"""
+    return config.BOT_MODE == "webhook" and config.WEBHOOK_SERVER == "fastapi"
+
+
+@asynccontextmanager
+async def embedded_bot() -> AsyncIterator[WebhookUpdates]:
+    """Run the bot inside the web app's event loop; its webhook route feeds the yielded updates"""
+    await setup_database()
+    bot = create_bot()
+    dp = create_dispatcher()
+    updates = WebhookUpdates(bot, dp, config.BOT_MAX_CONCURRENT_UPDATES)
+    tasks = start_background_tasks()
+    try:
+        await set_webhook(bot, dp)
+        yield updates
+    finally:
+        for task in tasks:
+            task.cancel()
+        await updates.drain()
+        await dp.storage.close()
+        await bot.session.close()
+
+
+async def main():
+    """Main function to run the bot"""
+    # Check if bot token is provided
+    if not config.BOT_TOKEN:
+        logger.error("BOT_TOKEN not provided in environment variables")
+        return
+    
+    if not config.ADMIN_ID:
+        logger.error("ADMIN_ID not provided in environment variables")
+        return
+    
+    if config.BOT_MODE == "webhook" and not config.WEBHOOK_URL:
+        logger.error("WEBHOOK_URL not provided in environment variables")
+        return
+    
+    if bot_in_web_app():
+        logger.error("WEBHOOK_SERVER=fastapi: the bot runs inside the web app, start it instead")
+        return
+    
+    # Setup database
+    await setup_database()
+    
+    # Initialize bot and dispatcher
+    bot = create_bot()
+    dp = create_dispatcher()
+    tasks = start_background_tasks()
+    
     try:
-        await dp.start_polling(bot)
+        if config.BOT_MODE == "webhook":
+            logger.info("Starting bot webhook server...")
+            await run_webhook_server(bot, dp)
+        else:
+            # getUpdates is refused while a webhook from an earlier run is set
+            await bot.delete_webhook()
+            logger.info("Starting bot...")
+            await dp.start_polling(bot)
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
         logger.error(f"Bot error: {e}")
     finally:
+        for task in tasks:
+            task.cancel()
         await bot.session.close()
 
 
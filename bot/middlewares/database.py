@@ -0,0 +1,23 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.utils.db import open_db
+
+
+class DatabaseMiddleware(BaseMiddleware):
+    """Injects a per-update AsyncDB as `db` and always closes it afterwards"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        db = open_db()
+        data["db"] = db
+        try:
+            return await handler(event, data)
+        finally:
+            await db.close()
@@ -0,0 +1,42 @@
+import logging
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from bot.utils.send_queue import SendQueue
+
+logger = logging.getLogger(__name__)
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+    """Routes every request addressed to a chat through the send queue and retries 429s"""
+    
+    def __init__(self, queue: SendQueue, max_retries: int):
+        self.queue = queue
+        self.max_retries = max_retries
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        # getUpdates, answerCallbackQuery, answerInlineQuery... are not chat messages
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        
+        attempt = 0
+        while True:
+            await self.queue.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                # Only 429s are retried: Telegram rejected those, so a retry cannot send twice
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Telegram rate limit for chat {chat_id}, retrying in {e.retry_after}s")
+                self.queue.retry_after(chat_id, e.retry_after)
@@ -0,0 +1,35 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session, sessionmaker
+
+import config
+from database.database import engine
+
+# Objects stay readable after commit, so handlers never refresh them on the event loop
+BotSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Bounded pool for blocking database work
+_executor = ThreadPoolExecutor(max_workers=config.BOT_DB_WORKERS, thread_name_prefix="bot-db")
+
+
+class AsyncDB:
+    """Database session for one update; all work runs in the bot DB thread pool"""
+    
+    def __init__(self, session: Session):
+        self.session = session
+    
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call func(session, *args, **kwargs) off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, partial(func, self.session, *args, **kwargs))
+    
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_executor, self.session.close)
+
+
+def open_db() -> AsyncDB:
+    return AsyncDB(BotSessionLocal())
@@ -0,0 +1,180 @@
+import asyncio
+import enum
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import config
+from database import crud
+from database.models import RentalStatus, RentalType, ExpenseType
+from bot.utils.db import open_db
+
+logger = logging.getLogger(__name__)
+
+# Persistent FSM storage, so multi-step dialogs survive restarts and can be
+# shared by several bot workers. Changes are buffered in memory and written in
+# one batch every FSM_FLUSH_INTERVAL seconds.
+
+# Expired dialogs are deleted at most this often
+FSM_CLEANUP_INTERVAL = 60 * 60
+
+# Enums handlers keep in dialog data
+_ENUMS = {cls.__name__: cls for cls in (RentalStatus, RentalType, ExpenseType)}
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return {"__enum__": type(value).__name__, "value": value.value}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} cannot be kept in dialog data")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if "__enum__" in obj:
+        return _ENUMS[obj["__enum__"]](obj["value"])
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def dumps(data: Dict[str, Any]) -> str:
+    """Compact JSON that keeps the dates and enums handlers store"""
+    return json.dumps(data, default=_encode, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(text: str) -> Dict[str, Any]:
+    return json.loads(text, object_hook=_decode)
+
+
+class SQLStorage(BaseStorage):
+    """FSM storage in the fsm_states table with buffered, batched writes"""
+    
+    def __init__(self, flush_interval: float, ttl: int):
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        
+        # key -> {"state"?: ..., "data"?: ...}: written since the last flush / being written now
+        self._pending: Dict[str, Dict[str, Optional[str]]] = {}
+        self._flushing: Dict[str, Dict[str, Optional[str]]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+    
+    def _ensure_flusher(self):
+        # Created on first use, inside the running event loop
+        if self._flusher is None or self._flusher.done():
+            self._lock = self._lock or asyncio.Lock()
+            self._flusher = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # A flush already started finishes even if close() cancels this task
+            await asyncio.shield(self._flush())
+            if self.ttl and time.monotonic() - self._last_cleanup >= FSM_CLEANUP_INTERVAL:
+                await self._cleanup()
+    
+    async def _flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            db = open_db()
+            try:
+                await db.run(crud.save_fsm_records, self._flushing)
+            except Exception as e:
+                logger.error(f"FSM flush failed: {e}")
+                # Retry with the next flush; writes made since then win
+                for key, fields in self._flushing.items():
+                    self._pending[key] = {**fields, **self._pending.get(key, {})}
+            finally:
+                self._flushing = {}
+                await db.close()
+    
+    async def _cleanup(self):
+        self._last_cleanup = time.monotonic()
+        db = open_db()
+        try:
+            deleted = await db.run(
+                crud.delete_expired_fsm_records, datetime.utcnow() - timedelta(seconds=self.ttl)
+            )
+            if deleted:
+                logger.info(f"Removed {deleted} expired bot dialogs")
+        except Exception as e:
+            logger.error(f"FSM cleanup failed: {e}")
+        finally:
+            await db.close()
+    
+    def _write(self, key: StorageKey, field: str, value: Optional[str]):
+        self._pending.setdefault(self.key_builder.build(key), {})[field] = value
+        self._ensure_flusher()
+    
+    async def _read(self, key: StorageKey, field: str) -> Optional[str]:
+        name = self.key_builder.build(key)
+        for buffer in (self._pending, self._flushing):
+            if field in buffer.get(name, {}):
+                return buffer[name][field]
+        
+        db = open_db()
+        try:
+            record = await db.run(crud.get_fsm_record, name)
+        finally:
+            await db.close()
+        return getattr(record, field) if record else None
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._write(key, "state", state.state if isinstance(state, State) else state)
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._read(key, "state")
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        self._write(key, "data", dumps(data) if data else None)
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = await self._read(key, "data")
+        return loads(data) if data else {}
+    
+    async def close(self) -> None:
+        """Stop the flusher and write what is still buffered"""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        await self._flush()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """FSM storage selected by FSM_STORAGE"""
+    if config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    
+    if config.FSM_STORAGE == "redis":
+        # Needs the redis package; any server speaking the Redis protocol will do
+        from aiogram.fsm.storage.redis import RedisStorage
+        ttl = config.FSM_STATE_TTL or None
+        return RedisStorage.from_url(
+            config.REDIS_URL,
+            key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+            json_loads=loads,
+            json_dumps=dumps
+        )
+    
+    return SQLStorage(config.FSM_FLUSH_INTERVAL, config.FSM_STATE_TTL)
@@ -1,7 +1,12 @@
-import os
+import re
 from datetime import datetime, date
-from typing import Optional
-import config
+from typing import Iterable, Iterator, List, Optional
+
+# Telegram rejects longer messages; counted in UTF-16 code units, like Telegram does
+MESSAGE_LIMIT = 4096
+
+# Characters with a meaning in parse_mode="Markdown"
+_MARKDOWN_SPECIAL = re.compile(r"([_*`\[])")
 
 
 def format_currency(amount: float) -> str:
@@ -27,30 +32,6 @@ def parse_date(date_str: str) -> Optional[date]:
         return None
 
 
-def save_photo(photo_data: bytes, filename: str) -> str:
-    """Save photo and return path"""
-    if not os.path.exists(config.UPLOAD_DIR):
-        os.makedirs(config.UPLOAD_DIR)
-    
-    filepath = os.path.join(config.UPLOAD_DIR, filename)
-    with open(filepath, 'wb') as f:
-        f.write(photo_data)
-    
-    return filepath
-
-
-def validate_vin(vin: str) -> bool:
-    """Validate VIN number"""
-    return len(vin) == 17 and vin.isalnum()
-
-
-def validate_phone(phone: str) -> bool:
-    """Basic phone validation"""
-    # Remove all non-digit characters
-    digits = ''.join(filter(str.isdigit, phone))
-    return len(digits) >= 9
-
-
 def calculate_rental_days(start_date: date, end_date: date) -> int:
     """Calculate number of rental days"""
     return (end_date - start_date).days + 1
@@ -87,8 +68,8 @@ def get_status_text(status: str) -> str:
 
 def format_rental_info(rental) -> str:
     """Format rental information for display"""
-    car_info = f"{rental.car.brand} {rental.car.model} ({rental.car.license_plate})"
-    renter_info = f"{rental.renter.name} ({rental.renter.phone})"
+    car_info = escape_markdown(f"{rental.car.brand} {rental.car.model} ({rental.car.license_plate})")
+    renter_info = escape_markdown(f"{rental.renter.name} ({rental.renter.phone})")
     
     rental_type = "Краткосрочная" if rental.rental_type.value == "short_term" else "Долгосрочная"
     
@@ -96,8 +77,8 @@ def format_rental_info(rental) -> str:
     remaining_amount = rental.total_amount - rental.paid_amount
     
     status_text = ""
-    if rental.is_overdue:
-        status_text = f"⚠️ *Просрочка: {rental.overdue_days} дн.*\n"
+    if rental.is_currently_overdue:
+        status_text = f"⚠️ *Просрочка: {rental.current_overdue_days} дн.*\n"
     elif not rental.is_active:
         status_text = "✅ *Завершена*\n"
     
@@ -138,3 +119,61 @@ def format_expense_info(expense) -> str:
         f"📝 Описание: {expense.description or 'Не указано'}\n"
         f"📅 Дата: {format_datetime(expense.expense_date)}"
   )
+
+
+def escape_markdown(text) -> str:
+    """Escape user data for parse_mode="Markdown" (outside of *bold* and `code` entities)"""
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", str(text))
+
+
+def _message_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def render_pages(header: str, entries: Iterable[str], footer: str = "",
+                 limit: int = MESSAGE_LIMIT) -> Iterator[str]:
+    """Lazily group report entries into messages that fit Telegram, splitting only between entries"""
+    page: List[str] = [header]
+    size = _message_length(header)
+    
+    for entry in entries:
+        length = _message_length(entry)
+        if length > limit:
+            # A single entry never needs a whole message; cut it rather than lose the report
+            entry = entry[:limit // 2] + "…\n\n"
+            length = _message_length(entry)
+        if size + length > limit:
+            yield "".join(page)
+            page, size = [], 0
+        page.append(entry)
+        size += length
+    
+    if footer:
+        if size + _message_length(footer) > limit:
+            yield "".join(page)
+            page = []
+        page.append(footer)
+    
+    if page:
+        yield "".join(page)
+
+
+async def send_pages(message, pages: Iterable[str], reply_markup=None, parse_mode: Optional[str] = "Markdown"):
+    """Show the first page in place of `message` and the rest as new messages; the keyboard goes last"""
+    pending = None
+    first = True
+    for page in pages:
+        if pending is not None:
+            await _send_page(message, pending, first, None, parse_mode)
+            first = False
+        pending = page
+    
+    if pending is not None:
+        await _send_page(message, pending, first, reply_markup, parse_mode)
+
+
+async def _send_page(message, text: str, edit: bool, reply_markup, parse_mode: Optional[str]):
+    if edit:
+        await message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+    else:
+        await message.answer(text, reply_markup=reply_markup, parse_mode=parse_mode)
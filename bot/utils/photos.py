@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+from aiogram import Bot
+from aiogram.types import PhotoSize
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import config
+from database.photos import upload_name, variant_path
+
+# Car photo ingestion: the original is streamed to UPLOAD_DIR with a size cap,
+# then resized WebP variants without EXIF are made in a process pool, so
+# neither disk writes nor Pillow run on the event loop.
+
+# Variant name -> longest side in pixels
+PHOTO_VARIANTS = {"thumb": 320, "web": 1280}
+WEBP_QUALITY = 80
+
+# Spawned, not forked: the parent runs an event loop and database threads
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class PhotoTooLargeError(Exception):
+    """The photo is bigger than MAX_FILE_SIZE"""
+
+
+class InvalidPhotoError(Exception):
+    """Pillow cannot read the photo"""
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=config.PHOTO_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def make_variants(photo_path: str) -> Dict[str, str]:
+    """Write every PHOTO_VARIANTS size of the photo as WebP; runs in a worker process"""
+    paths = {}
+    with Image.open(photo_path) as image:
+        # Turn the pixels upright first: the EXIF orientation tag is dropped with the rest
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for variant, size in PHOTO_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size))
+            paths[variant] = variant_path(photo_path, variant)
+            resized.save(paths[variant], "WEBP", quality=WEBP_QUALITY)
+    return paths
+
+
+async def download_photo(bot: Bot, photo: PhotoSize) -> Tuple[str, bool]:
+    """Stream a Telegram photo into UPLOAD_DIR, refusing anything over MAX_FILE_SIZE; returns its path and whether it is new"""
+    if photo.file_size and photo.file_size > config.MAX_FILE_SIZE:
+        raise PhotoTooLargeError()
+    
+    file = await bot.get_file(photo.file_id)
+    url = bot.session.api.file_url(bot.token, file.file_path)
+    
+    # Written under a temporary name so a cut-off download never looks like a photo
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    partial = os.path.join(config.UPLOAD_DIR, f"{photo.file_unique_id}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(partial, "wb") as f:
+            async for chunk in bot.session.stream_content(url):
+                size += len(chunk)
+                if size > config.MAX_FILE_SIZE:
+                    raise PhotoTooLargeError()
+                digest.update(chunk)
+                await f.write(chunk)
+        
+        # Named after the content: the same photo is stored once
+        photo_path = os.path.join(config.UPLOAD_DIR, upload_name(digest.hexdigest()))
+        if os.path.exists(photo_path):
+            # Same content is already stored; keep that file untouched
+            os.remove(partial)
+            return photo_path, False
+        os.replace(partial, photo_path)
+        return photo_path, True
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def ingest_photo(bot: Bot, photo: PhotoSize) -> str:
+    """Save a car photo with its variants and return the original's path"""
+    photo_path, is_new = await download_photo(bot, photo)
+    if not all(os.path.exists(variant_path(photo_path, variant)) for variant in PHOTO_VARIANTS):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(_pool(), make_variants, photo_path)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            # Not an image Pillow can read: keep nothing of it (a file stored before stays)
+            for variant in PHOTO_VARIANTS:
+                _remove(variant_path(photo_path, variant))
+            if is_new:
+                _remove(photo_path)
+            raise InvalidPhotoError()
+    return photo_path
@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Union
+
+import config
+
+# Outbound send queue: every bot request addressed to a chat waits for a token
+# from its chat's bucket and then from the global bucket. Global tokens go to
+# interactive replies before background notifications.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_sends():
+    """Send from this block with background priority (reminders, bulk notifications)"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations: each caller learns how long to wait for its token"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self) -> float:
+        """Take a token and return the seconds until it is actually available"""
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def pause(self, seconds: float):
+        """Hand out no tokens for the next `seconds` (Telegram's retry_after)"""
+        self._refill()
+        # The next reservation waits at least `seconds`, after any already handed out
+        self._tokens = min(self._tokens, 1) - seconds * self.rate
+
+
+class SendQueue:
+    """Per-chat and global rate limits for outgoing messages, with priorities and metrics"""
+    
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float, max_chats: int = 10000):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: "OrderedDict[Union[int, str], TokenBucket]" = OrderedDict()
+        
+        # (priority, sequence, future) of requests holding a chat token and waiting for a global one
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        
+        self._pending = {priority: 0 for priority in _PRIORITY_NAMES}
+        self._latencies: deque = deque(maxlen=1000)
+        self.sent = 0
+        self.rate_limited = 0
+    
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            # Idle chats' buckets are full again, so dropping the oldest loses nothing
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        self._chats.move_to_end(chat_id)
+        return bucket
+    
+    def _ensure_dispatcher(self):
+        # Created on first use, inside the running event loop
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+    
+    async def _dispatch(self):
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            
+            delay = self._global.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            
+            # The token goes to the most urgent request waiting at the moment it is ready
+            while self._heap:
+                _, _, future = heapq.heappop(self._heap)
+                if not future.done():
+                    future.set_result(None)
+                    break
+    
+    async def acquire(self, chat_id, priority: Optional[int] = None):
+        """Wait until a message may be sent to chat_id"""
+        priority = _priority.get() if priority is None else priority
+        started = time.monotonic()
+        self._pending[priority] += 1
+        try:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            
+            self._ensure_dispatcher()
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._heap, (priority, next(self._sequence), future))
+            self._wakeup.set()
+            await future
+        finally:
+            self._pending[priority] -= 1
+        
+        self._latencies.append(time.monotonic() - started)
+        self.sent += 1
+    
+    def retry_after(self, chat_id, seconds: float):
+        """Telegram answered 429: hold the chat back for `seconds`"""
+        self.rate_limited += 1
+        self._chat_bucket(chat_id).pause(seconds)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per priority and wait time (seconds) over the last 1000 sends"""
+        latencies = sorted(self._latencies)
+        return {
+            "pending": {name: self._pending[priority] for priority, name in _PRIORITY_NAMES.items()},
+            "sent": self.sent,
+            "rate_limited": self.rate_limited,
+            "latency_avg": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "latency_p95": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else 0.0,
+            "latency_max": round(latencies[-1], 3) if latencies else 0.0,
+        }
+
+
+send_queue = SendQueue(config.SEND_GLOBAL_RATE, config.SEND_CHAT_RATE, config.SEND_CHAT_BURST)
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import logging
+import secrets
+from typing import Any, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Webhook mode: Telegram POSTs updates to WEBHOOK_URL + WEBHOOK_PATH, either to
+# a standalone aiohttp server (bot/main.py) or to the FastAPI app (web/main.py).
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Telegram accepts max_connections from 1 to 100
+MAX_WEBHOOK_CONNECTIONS = 100
+
+
+def webhook_secret() -> str:
+    """Secret Telegram sends with every update; derived from the bot token unless WEBHOOK_SECRET is set"""
+    return config.WEBHOOK_SECRET or hashlib.sha256(config.BOT_TOKEN.encode()).hexdigest()
+
+
+class WebhookUpdates:
+    """Processes webhook updates as background tasks, at most `limit` at a time"""
+    
+    def __init__(self, bot: Bot, dp: Dispatcher, limit: int):
+        self.bot = bot
+        self.dp = dp
+        self._secret = webhook_secret()
+        self._slots = asyncio.Semaphore(limit)
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def verify(self, token: Optional[str]) -> bool:
+        return token is not None and secrets.compare_digest(token, self._secret)
+    
+    async def feed(self, update: Dict[str, Any]):
+        """Start processing an update; waits while `limit` updates are already in progress"""
+        # Holding the response back makes Telegram slow down instead of tasks piling up
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _process(self, update: Dict[str, Any]):
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception:
+            # Already logged by the dispatcher; Telegram has its 200 and will not resend
+            pass
+        finally:
+            self._slots.release()
+    
+    async def drain(self):
+        """Wait for updates still in progress"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def set_webhook(bot: Bot, dp: Dispatcher):
+    url = config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH
+    await bot.set_webhook(
+        url,
+        secret_token=webhook_secret(),
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=min(config.BOT_MAX_CONCURRENT_UPDATES, MAX_WEBHOOK_CONNECTIONS)
+    )
+    logger.info(f"Webhook set to {url}")
+
+
+async def run_webhook_server(bot: Bot, dp: Dispatcher):
+    """Serve the webhook with aiohttp on WEBHOOK_HOST:WEBHOOK_PORT until cancelled"""
+    updates = WebhookUpdates(bot, dp, config.BOT_MAX_CONCURRENT_UPDATES)
+    
+    async def handle(request: web.Request) -> web.Response:
+        if not updates.verify(request.headers.get(SECRET_HEADER)):
+            return web.Response(status=401, text="Unauthorized")
+        await updates.feed(await request.json())
+        return web.json_response({})
+    
+    app = web.Application()
+    app.router.add_post(config.WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT).start()
+        await set_webhook(bot, dp)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await updates.drain()
+        await dp.storage.close()
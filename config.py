@@ -7,15 +7,60 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID", "@default_user")  # Используй строку по умолчанию, если переменная не задана
 
+# Bot mode: "polling" или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_SERVER = os.getenv("WEBHOOK_SERVER", "aiohttp").lower()  # "aiohttp" — отдельный сервер, "fastapi" — внутри web/main.py
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный адрес сервиса, например https://rental-crm.onrender.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Если не задан, выводится из BOT_TOKEN
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")  # Только для aiohttp
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", 8080)))  # Только для aiohttp
+BOT_MAX_CONCURRENT_UPDATES = int(os.getenv("BOT_MAX_CONCURRENT_UPDATES", 16))  # Обновлений, обрабатываемых одновременно
+
+# Bot dialog state (FSM)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sql").lower()  # "sql" — таблица fsm_states, "redis" или "memory" (теряется при перезапуске)
+REDIS_URL = os.getenv("REDIS_URL")  # Для FSM_STORAGE=redis, например redis://localhost:6379/0 (нужен пакет redis)
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", 7 * 24 * 60 * 60))  # seconds, брошенные диалоги удаляются; 0 — хранить всегда
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 0.5))  # seconds, изменения состояния пишутся в базу пачкой
+
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL")
+BOT_DB_WORKERS = int(os.getenv("BOT_DB_WORKERS", 4))  # Потоки для запросов бота вне event loop
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Постоянные соединения на процесс и движок
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))  # Дополнительные соединения при пиковой нагрузке
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds, ожидание свободного соединения
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds, пересоздавать соединения старше
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"  # Проверять соединение перед выдачей
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))  # ms, 0 — без ограничения (только PostgreSQL)
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"  # NullPool, пулом управляет PgBouncer
+# С PgBouncer statement_timeout задаётся через SET LOCAL в каждой транзакции, а не параметром подключения:
+# PgBouncer отклоняет параметры подключения, не перечисленные в ignore_startup_parameters (pgbouncer.ini)
 # Web Interface
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
 
+# Report cache (в каждом процессе свой; записи из другого процесса видны через TTL)
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 60))  # seconds, 0 — кэш выключен
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", 128))  # Максимум отчётов в кэше
+
+# Inline search (@bot <текст>)
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", 30))  # seconds, Telegram кэширует ответ для каждого пользователя
+INLINE_RESULTS_PER_KIND = int(os.getenv("INLINE_RESULTS_PER_KIND", 10))  # Машин, арендаторов и аренд в одном ответе
+
+# Outbound messages (лимиты Telegram: ~30 сообщений/с на бота, ~1/с на чат)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))  # Сообщений в секунду на бота
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))  # Сообщений в секунду в один чат
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", 3))  # Сколько сообщений в чат можно отправить подряд
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 3))  # Повторы после ответа 429 (retry_after)
+SEND_QUEUE_STATS_INTERVAL = int(os.getenv("SEND_QUEUE_STATS_INTERVAL", 300))  # seconds, 0 — не писать в лог
+
+# Background jobs
+OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL", 24 * 60 * 60))  # seconds
+
 # Environment
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
 # File uploads
 UPLOAD_DIR = "uploads"
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", 2))  # Процессы для уменьшения фото (Pillow)
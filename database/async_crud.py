@@ -0,0 +1,52 @@
+from functools import wraps
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import crud
+
+# Async wrappers over database.crud for the web routers: each call runs the sync
+# query on an AsyncSession via run_sync. Results must be fully loaded (loader
+# profiles), because lazy loading is not available on an AsyncSession.
+
+def _async(func: Callable[..., Any]) -> Callable[..., Any]:
+    @wraps(func)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(func, *args, **kwargs)
+    return wrapper
+
+
+# Car CRUD
+create_car = _async(crud.create_car)
+get_cars = _async(crud.get_cars)
+get_car_by_id = _async(crud.get_car_by_id)
+get_car_by_vin = _async(crud.get_car_by_vin)
+get_car_by_license_plate = _async(crud.get_car_by_license_plate)
+get_available_cars = _async(crud.get_available_cars)
+
+# Renter CRUD
+create_renter = _async(crud.create_renter)
+get_renters = _async(crud.get_renters)
+get_renter_by_id = _async(crud.get_renter_by_id)
+get_renter_by_phone = _async(crud.get_renter_by_phone)
+
+# Rental CRUD
+create_rental = _async(crud.create_rental)
+get_active_rentals = _async(crud.get_active_rentals)
+get_rentals = _async(crud.get_rentals)
+get_rental_by_id = _async(crud.get_rental_by_id)
+get_car_rental_history = _async(crud.get_car_rental_history)
+get_conflicting_rentals = _async(crud.get_conflicting_rentals)
+end_rental = _async(crud.end_rental)
+
+# Payment and fine CRUD
+create_payment = _async(crud.create_payment)
+get_rental_payments = _async(crud.get_rental_payments)
+create_fine = _async(crud.create_fine)
+get_rental_fines = _async(crud.get_rental_fines)
+
+# Analytics
+get_car_totals = _async(crud.get_car_totals)
+get_fleet_profitability = _async(crud.get_fleet_profitability)
+get_monthly_series = _async(crud.get_monthly_series)
+get_utilization = _async(crud.get_utilization)
@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import crud
+from database.validators import validate_vin, validate_phone
+
+# Bulk import of cars, renters and historical payments from CSV or JSON.
+# Rows are validated one by one, deduplicated with one lookup per chunk and
+# inserted with executemany; a bad row is reported and the rest still go in.
+
+KINDS = ("cars", "renters", "payments")
+IMPORT_BATCH_SIZE = 1000
+
+
+def load_records(content: str, filename: str, kind: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Parse an import file into records per kind"""
+    # JSON: {"cars": [...], "renters": [...], "payments": [...]} or a list of records.
+    # CSV and JSON lists take the kind from `kind` or the file name (cars.csv).
+    if filename.lower().endswith(".json"):
+        data = json.loads(content)
+        if isinstance(data, dict):
+            unknown = set(data) - set(KINDS)
+            if unknown:
+                raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+            if not all(isinstance(records, list) for records in data.values()):
+                raise ValueError("Every section must be a list of records")
+            return data
+        records = data
+    else:
+        records = list(csv.DictReader(io.StringIO(content.lstrip("\ufeff"))))
+    
+    kind = kind or Path(filename).stem.lower()
+    if kind not in KINDS:
+        raise ValueError(f"Unknown import kind '{kind}'. Use one of: {', '.join(KINDS)}")
+    if not isinstance(records, list):
+        raise ValueError("Expected a list of records")
+    return {kind: records}
+
+
+def _text(record: Dict[str, Any], field: str, required: bool = True) -> Optional[str]:
+    value = record.get(field)
+    value = str(value).strip() if value is not None else ""
+    if not value:
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    return value
+
+
+def _positive_number(record: Dict[str, Any], field: str) -> float:
+    value = _text(record, field)
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a number")
+    # float() also accepts "nan" and "inf"
+    if not math.isfinite(number):
+        raise ValueError(f"{field} must be a number")
+    if number <= 0:
+        raise ValueError(f"{field} must be positive")
+    return number
+
+
+def _car_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    vin = _text(record, "vin").upper()
+    if not validate_vin(vin):
+        raise ValueError("Invalid VIN: must be 17 letters or digits")
+    return {
+        "brand": _text(record, "brand"),
+        "model": _text(record, "model"),
+        "vin": vin,
+        "license_plate": _text(record, "license_plate").upper(),
+        "daily_rate": _positive_number(record, "daily_rate"),
+        "photo_path": _text(record, "photo_path", required=False)
+    }
+
+
+def _renter_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    phone = _text(record, "phone")
+    if not validate_phone(phone):
+        raise ValueError("Invalid phone number")
+    return {
+        "name": _text(record, "name"),
+        "phone": phone,
+        "email": _text(record, "email", required=False),
+        "passport": _text(record, "passport", required=False),
+        "notes": _text(record, "notes", required=False)
+    }
+
+
+def _payment_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    rental_id = _text(record, "rental_id")
+    payment_date = _text(record, "payment_date")
+    try:
+        rental_id = int(rental_id)
+    except ValueError:
+        raise ValueError("rental_id must be an integer")
+    try:
+        payment_date = datetime.fromisoformat(payment_date)
+    except ValueError:
+        raise ValueError("payment_date must be YYYY-MM-DD or YYYY-MM-DD HH:MM")
+    return {
+        "rental_id": rental_id,
+        "amount": _positive_number(record, "amount"),
+        "payment_date": payment_date,
+        "notes": _text(record, "notes", required=False)
+    }
+
+
+def _chunks(items: list) -> List[list]:
+    return [items[i:i + IMPORT_BATCH_SIZE] for i in range(0, len(items), IMPORT_BATCH_SIZE)]
+
+
+def _insert(db: Session, insert_rows: Callable[[Session, List[Dict[str, Any]]], int],
+            chunk: List[Tuple[int, Dict[str, Any]]], errors: List[Dict[str, Any]]) -> int:
+    """Insert a chunk in one statement; on a conflict retry row by row to find the culprits"""
+    try:
+        return insert_rows(db, [row for _, row in chunk])
+    except IntegrityError:
+        db.rollback()
+    
+    created = 0
+    for number, row in chunk:
+        try:
+            created += insert_rows(db, [row])
+        except IntegrityError:
+            db.rollback()
+            errors.append({"row": number, "error": "Conflicts with an existing record"})
+    return created
+
+
+def _import(db: Session, records: List[Dict[str, Any]], parse_row: Callable[[Dict[str, Any]], Dict[str, Any]],
+            find_duplicates: Callable[[Session, List[Dict[str, Any]]], Dict[int, str]],
+            insert_rows: Callable[[Session, List[Dict[str, Any]]], int]) -> Dict[str, Any]:
+    errors: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    
+    # Row numbers are 1-based record positions (CSV: line number minus the header)
+    for number, record in enumerate(records, 1):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Record must be an object")
+            valid.append((number, parse_row(record)))
+        except ValueError as e:
+            errors.append({"row": number, "error": str(e)})
+    
+    created = 0
+    for chunk in _chunks(valid):
+        duplicates = find_duplicates(db, [row for _, row in chunk])
+        for position, error in duplicates.items():
+            errors.append({"row": chunk[position][0], "error": error})
+        chunk = [item for position, item in enumerate(chunk) if position not in duplicates]
+        if chunk:
+            created += _insert(db, insert_rows, chunk, errors)
+    
+    errors.sort(key=lambda error: error["row"])
+    return {"total": len(records), "created": created, "failed": len(errors), "errors": errors}
+
+
+def _car_duplicates(db: Session, rows: List[Dict[str, Any]]) -> Dict[int, str]:
+    taken_vins, taken_plates = crud.get_existing_car_keys(
+        db, [row["vin"] for row in rows], [row["license_plate"] for row in rows]
+    )
+    duplicates = {}
+    for position, row in enumerate(rows):
+        if row["vin"] in taken_vins:
+            duplicates[position] = f"Car with VIN {row['vin']} already exists"
+        elif row["license_plate"] in taken_plates:
+            duplicates[position] = f"Car with license plate {row['license_plate']} already exists"
+        else:
+            # Later rows of this file must not repeat it either
+            taken_vins.add(row["vin"])
+            taken_plates.add(row["license_plate"])
+    return duplicates
+
+
+def _renter_duplicates(db: Session, rows: List[Dict[str, Any]]) -> Dict[int, str]:
+    taken_phones = crud.get_existing_renter_phones(db, [row["phone"] for row in rows])
+    duplicates = {}
+    for position, row in enumerate(rows):
+        if row["phone"] in taken_phones:
+            duplicates[position] = f"Renter with phone {row['phone']} already exists"
+        else:
+            taken_phones.add(row["phone"])
+    return duplicates
+
+
+def _payment_missing_rentals(db: Session, rows: List[Dict[str, Any]]) -> Dict[int, str]:
+    rental_cars = crud.get_rental_car_ids(db, list({row["rental_id"] for row in rows}))
+    return {
+        position: f"Rental {row['rental_id']} not found"
+        for position, row in enumerate(rows)
+        if row["rental_id"] not in rental_cars
+    }
+
+
+def import_cars(db: Session, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return _import(db, records, _car_row, _car_duplicates, crud.bulk_create_cars)
+
+
+def import_renters(db: Session, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return _import(db, records, _renter_row, _renter_duplicates, crud.bulk_create_renters)
+
+
+def import_payments(db: Session, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return _import(db, records, _payment_row, _payment_missing_rentals, crud.bulk_create_payments)
+
+
+IMPORTERS = {
+    "cars": import_cars,
+    "renters": import_renters,
+    "payments": import_payments,
+}
+
+
+def import_records(db: Session, records_by_kind: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Import every kind present, cars and renters before payments; returns a report per kind"""
+    return {kind: IMPORTERS[kind](db, records_by_kind[kind]) for kind in KINDS if kind in records_by_kind}
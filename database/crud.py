@@ -1,20 +1,70 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import (
+    and_, or_, desc, func, cast, case, literal, literal_column, select, insert, bindparam, Integer, Date
+)
+from sqlalchemy.sql import Select
+from sqlalchemy.dialects import postgresql, sqlite
 from datetime import datetime, date, timedelta
-from database.models import Car, Renter, Rental, Payment, Fine, Expense, RentalStatus, RentalType, ExpenseType
+from bisect import bisect_right
+from functools import wraps
+from database.report_cache import report_cache
+from database.models import (
+    Car, Renter, Rental, Payment, Fine, Expense, DailyCarFinancials, FSMRecord,
+    RentalStatus, RentalType, ExpenseType
+)
 from typing import List, Optional, Dict, Any
 
 
+# Loader profiles: eager-loading options per use case, so list views
+# issue a fixed number of statements instead of one per row
+LOADER_PROFILES = {
+    # Rental with its car and renter (list rows, keyboards, contract cards)
+    "rental_parties": (
+        joinedload(Rental.car),
+        joinedload(Rental.renter),
+    ),
+    # Renter with rentals (active rental counters)
+    "renter_rentals": (
+        selectinload(Renter.rentals),
+    ),
+    # Expense with its car (expense cards)
+    "expense_car": (
+        joinedload(Expense.car),
+    ),
+}
+
+
+def _with_profile(query, profile: Optional[str]):
+    if profile is None:
+        return query
+    return query.options(*LOADER_PROFILES[profile])
+
+
+def _invalidates_reports(func):
+    """Clear cached reports once a write to cars, rentals, payments or expenses returns"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        report_cache.invalidate()
+        return result
+    return wrapper
+
+
 # Car CRUD
+@_invalidates_reports
 def create_car(db: Session, brand: str, model: str, vin: str, license_plate: str, 
-               daily_rate: float, photo_path: Optional[str] = None) -> Car:
+               daily_rate: float, photo_path: Optional[str] = None,
+               photo_file_id: Optional[str] = None, photo_file_unique_id: Optional[str] = None) -> Car:
     car = Car(
         brand=brand,
         model=model,
         vin=vin,
         license_plate=license_plate,
         daily_rate=daily_rate,
-        photo_path=photo_path
+        photo_path=photo_path,
+        photo_file_id=photo_file_id,
+        photo_file_unique_id=photo_file_unique_id
     )
     db.add(car)
     db.commit()
@@ -22,18 +72,101 @@ def create_car(db: Session, brand: str, model: str, vin: str, license_plate: str
     return car
 
 
-def get_cars(db: Session, skip: int = 0, limit: int = 100) -> List[Car]:
-    return db.query(Car).offset(skip).limit(limit).all()
+def get_cars(db: Session, skip: int = 0, limit: int = 100, profile: Optional[str] = None,
+             status: Optional[RentalStatus] = None, after_id: Optional[int] = None) -> List[Car]:
+    """Cars ordered by id; pass after_id (last id of the previous page) for keyset paging"""
+    query = _with_profile(db.query(Car), profile)
+    if status is not None:
+        query = query.filter(Car.status == status)
+    if after_id is not None:
+        query = query.filter(Car.id > after_id)
+    return query.order_by(Car.id).offset(skip).limit(limit).all()
+
+
+def count_cars(db: Session) -> int:
+    return db.query(func.count(Car.id)).scalar()
+
+
+def get_car_by_id(db: Session, car_id: int, profile: Optional[str] = None) -> Optional[Car]:
+    return _with_profile(db.query(Car), profile).filter(Car.id == car_id).first()
+
+
+def get_car_by_vin(db: Session, vin: str) -> Optional[Car]:
+    return db.query(Car).filter(Car.vin == vin).first()
+
+
+def get_car_by_license_plate(db: Session, license_plate: str) -> Optional[Car]:
+    return db.query(Car).filter(Car.license_plate == license_plate).first()
+
+
+class BookingConflictError(Exception):
+    """The car already has an active rental overlapping the requested dates"""
+
+
+def _booked_filter(db: Session, start_date: Optional[date], end_date: date):
+    """Active rentals occupying any day of [start_date, end_date]; no start_date means open-ended"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Same expression as the exclusion constraint, so its GiST index serves the lookup.
+        # The range bounds are inlined: a bound '[]' parameter would not match the index.
+        booked = func.daterange(Rental.start_date, Rental.end_date, literal_column("'[]'"))
+        wanted = func.daterange(literal(start_date, Date), literal(end_date, Date), literal_column("'[]'"))
+        overlaps = booked.op("&&")(wanted)
+    else:
+        overlaps = Rental.start_date <= end_date
+        if start_date is not None:
+            overlaps = and_(overlaps, Rental.end_date >= start_date)
+    return and_(Rental.is_active == True, overlaps)
+
+
+def _occupied_from(start_date: date, today: date) -> Optional[date]:
+    # An overdue rental keeps the car until it is returned, whatever its end_date says,
+    # so for periods starting today or earlier every active rental that began counts
+    return None if start_date <= today else start_date
+
+
+def get_available_cars(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       skip: int = 0, limit: Optional[int] = None,
+                       plate_prefix: Optional[str] = None) -> List[Car]:
+    """Cars with no active rental in [start_date, end_date] (today by default) and not in maintenance"""
+    today = date.today()
+    start_date = start_date or today
+    end_date = end_date or start_date
+    
+    booked_car_ids = select(Rental.car_id).where(
+        _booked_filter(db, _occupied_from(start_date, today), end_date)
+    )
+    query = db.query(Car).filter(
+        Car.status != RentalStatus.MAINTENANCE,
+        Car.id.not_in(booked_car_ids)
+    )
+    if plate_prefix:
+        # Plates are stored upper-case, so the prefix match can use the unique index
+        query = query.filter(Car.license_plate.startswith(plate_prefix.upper(), autoescape=True))
+    return query.order_by(Car.id).offset(skip).limit(limit).all()
 
 
-def get_car_by_id(db: Session, car_id: int) -> Optional[Car]:
-    return db.query(Car).filter(Car.id == car_id).first()
+def get_conflicting_rentals(db: Session, car_id: int, start_date: date, end_date: date,
+                            exclude_id: Optional[int] = None) -> List[Rental]:
+    """Active rentals of the car that overlap [start_date, end_date]"""
+    query = db.query(Rental).filter(
+        Rental.car_id == car_id,
+        _booked_filter(db, _occupied_from(start_date, date.today()), end_date)
+    )
+    if exclude_id is not None:
+        query = query.filter(Rental.id != exclude_id)
+    return query.order_by(Rental.start_date).all()
 
 
-def get_available_cars(db: Session) -> List[Car]:
-    return db.query(Car).filter(Car.status == RentalStatus.AVAILABLE).all()
+def set_car_photo_file_id(db: Session, car_id: int, file_id: Optional[str],
+                          file_unique_id: Optional[str]):
+    """Remember the Telegram file_id the car photo was last sent with"""
+    db.query(Car).filter(Car.id == car_id).update(
+        {Car.photo_file_id: file_id, Car.photo_file_unique_id: file_unique_id}
+    )
+    db.commit()
 
 
+@_invalidates_reports
 def update_car_status(db: Session, car_id: int, status: RentalStatus):
     db.query(Car).filter(Car.id == car_id).update({Car.status: status})
     db.commit()
@@ -55,8 +188,24 @@ def create_renter(db: Session, name: str, phone: str, email: Optional[str] = Non
     return renter
 
 
-def get_renters(db: Session) -> List[Renter]:
-    return db.query(Renter).all()
+def get_renters(db: Session, profile: Optional[str] = None, skip: int = 0,
+                limit: Optional[int] = None, search: Optional[str] = None) -> List[Renter]:
+    """Renters by name; search matches the start of the phone number or the name"""
+    query = _with_profile(db.query(Renter), profile)
+    if search:
+        # Digits typed without the plus still find "+995..." numbers
+        phone_prefixes = [search, f"+{search}"] if search.isdigit() else [search]
+        query = query.filter(
+            or_(
+                *[Renter.phone.startswith(prefix, autoescape=True) for prefix in phone_prefixes],
+                Renter.name.istartswith(search, autoescape=True)
+            )
+        )
+    return query.order_by(Renter.name, Renter.id).offset(skip).limit(limit).all()
+
+
+def get_renter_by_id(db: Session, renter_id: int) -> Optional[Renter]:
+    return db.query(Renter).filter(Renter.id == renter_id).first()
 
 
 def get_renter_by_phone(db: Session, phone: str) -> Optional[Renter]:
@@ -64,6 +213,7 @@ def get_renter_by_phone(db: Session, phone: str) -> Optional[Renter]:
 
 
 # Rental CRUD
+@_invalidates_reports
 def create_rental(db: Session, car_id: int, renter_id: int, rental_type: RentalType,
                   start_date: date, end_date: date, daily_rate: float,
                   deposit: float = 0.0, contract_notes: Optional[str] = None) -> Rental:
@@ -83,60 +233,178 @@ def create_rental(db: Session, car_id: int, renter_id: int, rental_type: RentalT
         contract_notes=contract_notes
     )
     db.add(rental)
+    
+    # Postgres rejects overlaps with the exclusion constraint. SQLite has none, so the
+    # check runs after the insert: the pending write holds SQLite's write lock, so no
+    # other booking can slip in between the check and the commit.
+    try:
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if "ex_rentals_car_no_overlap" in str(e.orig):
+            raise BookingConflictError(f"Car {car_id} is already booked for these dates")
+        raise
+    if get_conflicting_rentals(db, car_id, start_date, end_date, exclude_id=rental.id):
+        db.rollback()
+        raise BookingConflictError(f"Car {car_id} is already booked for these dates")
+    
     db.commit()
     db.refresh(rental)
     
-    # Update car status
-    update_car_status(db, car_id, RentalStatus.RENTED)
+    # Future bookings leave the car available until their start date
+    if start_date <= date.today():
+        update_car_status(db, car_id, RentalStatus.RENTED)
     
     return rental
 
 
-def get_active_rentals(db: Session) -> List[Rental]:
-    return db.query(Rental).filter(Rental.is_active == True).all()
+def get_active_rentals(db: Session, profile: Optional[str] = None, skip: int = 0,
+                       limit: Optional[int] = None) -> List[Rental]:
+    return _with_profile(db.query(Rental), profile).filter(
+        Rental.is_active == True
+    ).order_by(Rental.id).offset(skip).limit(limit).all()
+
+
+def count_active_rentals(db: Session) -> int:
+    return db.query(func.count(Rental.id)).filter(Rental.is_active == True).scalar()
+
+
+def get_rentals(db: Session, profile: Optional[str] = None, car_id: Optional[int] = None,
+                renter_id: Optional[int] = None, status: Optional[str] = None,
+                date_from: Optional[date] = None, date_to: Optional[date] = None,
+                before: Optional[tuple] = None, limit: Optional[int] = None) -> List[Rental]:
+    """Rentals newest first; status is "active", "ended" or "overdue", all filters run in SQL"""
+    query = _with_profile(db.query(Rental), profile)
+    
+    if car_id is not None:
+        query = query.filter(Rental.car_id == car_id)
+    if renter_id is not None:
+        query = query.filter(Rental.renter_id == renter_id)
+    
+    if status == "active":
+        query = query.filter(Rental.is_active == True)
+    elif status == "ended":
+        query = query.filter(Rental.is_active == False)
+    elif status == "overdue":
+        query = query.filter(_overdue_filter(date.today()))
+    elif status is not None:
+        raise ValueError(f"Unknown rental status: {status}")
+    
+    # Rentals overlapping [date_from, date_to]
+    if date_from is not None:
+        query = query.filter(Rental.end_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Rental.start_date <= date_to)
+    
+    # Keyset paging: (created_at, id) of the previous page's last row
+    if before is not None:
+        created_at, rental_id = before
+        query = query.filter(
+            or_(
+                Rental.created_at < created_at,
+                and_(Rental.created_at == created_at, Rental.id < rental_id)
+            )
+        )
+    
+    query = query.order_by(desc(Rental.created_at), desc(Rental.id))
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
-def get_rental_by_id(db: Session, rental_id: int) -> Optional[Rental]:
-    return db.query(Rental).filter(Rental.id == rental_id).first()
+def get_rental_by_id(db: Session, rental_id: int, profile: Optional[str] = None) -> Optional[Rental]:
+    return _with_profile(db.query(Rental), profile).filter(Rental.id == rental_id).first()
 
 
-def get_car_rental_history(db: Session, car_id: int) -> List[Rental]:
-    return db.query(Rental).filter(Rental.car_id == car_id).order_by(desc(Rental.created_at)).all()
+def get_car_rental_history(db: Session, car_id: int, profile: Optional[str] = None) -> List[Rental]:
+    return _with_profile(db.query(Rental), profile).filter(
+        Rental.car_id == car_id
+    ).order_by(desc(Rental.created_at)).all()
 
 
-def check_overdue_rentals(db: Session):
-    """Check and update overdue rentals"""
-    today = date.today()
-    overdue_rentals = db.query(Rental).filter(
+def _overdue_filter(today: date):
+    return and_(
+        Rental.is_active == True,
+        Rental.end_date < today
+    )
+
+
+def get_overdue_rentals(db: Session, profile: Optional[str] = None) -> List[Rental]:
+    """Active rentals past their end date, derived from end_date at read time"""
+    return _with_profile(db.query(Rental), profile).filter(
+        _overdue_filter(date.today())
+    ).order_by(Rental.end_date).all()
+
+
+def sweep_overdue_rentals(db: Session, today: Optional[date] = None) -> int:
+    """Persist overdue flags and days for all active rentals in set-based updates"""
+    today = today or date.today()
+    
+    if db.get_bind().dialect.name == "postgresql":
+        days_overdue = cast(literal(today, Date) - Rental.end_date, Integer)
+    else:
+        days_overdue = cast(func.julianday(literal(today, Date)) - func.julianday(Rental.end_date), Integer)
+    
+    updated = db.query(Rental).filter(_overdue_filter(today)).update(
+        {Rental.is_overdue: True, Rental.overdue_days: days_overdue},
+        synchronize_session=False
+    )
+    
+    # Rentals extended past today are no longer overdue
+    db.query(Rental).filter(
         and_(
             Rental.is_active == True,
-            Rental.end_date < today
+            Rental.is_overdue == True,
+            Rental.end_date >= today
         )
-    ).all()
-    
-    for rental in overdue_rentals:
-        overdue_days = (today - rental.end_date).days
-        rental.is_overdue = True
-        rental.overdue_days = overdue_days
+    ).update({Rental.is_overdue: False, Rental.overdue_days: 0}, synchronize_session=False)
     
     db.commit()
-    return overdue_rentals
+    return updated
 
 
+@_invalidates_reports
+def start_booked_rentals(db: Session, today: Optional[date] = None) -> int:
+    """Mark cars as rented once a booking made in advance reaches its start date"""
+    today = today or date.today()
+    started = select(Rental.car_id).where(Rental.is_active == True, Rental.start_date <= today)
+    updated = db.query(Car).filter(
+        Car.status == RentalStatus.AVAILABLE,
+        Car.id.in_(started)
+    ).update({Car.status: RentalStatus.RENTED}, synchronize_session=False)
+    db.commit()
+    return updated
+
+
+@_invalidates_reports
 def end_rental(db: Session, rental_id: int):
     """End rental and free up the car"""
     rental = get_rental_by_id(db, rental_id)
     if rental:
+        # Freeze the overdue state at the moment the rental ends
+        rental.overdue_days = rental.current_overdue_days
+        rental.is_overdue = rental.overdue_days > 0
         rental.is_active = False
-        update_car_status(db, rental.car_id, RentalStatus.AVAILABLE)
+        
+        # Another rental of the car may already have started (e.g. back-to-back bookings)
+        still_rented = db.query(Rental.id).filter(
+            Rental.car_id == rental.car_id,
+            Rental.id != rental.id,
+            Rental.is_active == True,
+            Rental.start_date <= date.today()
+        ).first()
+        if still_rented is None:
+            update_car_status(db, rental.car_id, RentalStatus.AVAILABLE)
         db.commit()
 
 
 # Payment CRUD
+@_invalidates_reports
 def create_payment(db: Session, rental_id: int, amount: float, notes: Optional[str] = None) -> Payment:
     payment = Payment(
         rental_id=rental_id,
         amount=amount,
+        payment_date=datetime.utcnow(),
         notes=notes
     )
     db.add(payment)
@@ -145,6 +413,7 @@ def create_payment(db: Session, rental_id: int, amount: float, notes: Optional[s
     rental = get_rental_by_id(db, rental_id)
     if rental:
         rental.paid_amount += amount
+        _add_daily_financials(db, [{"car_id": rental.car_id, "day": payment.payment_date.date(), "income": amount}])
     
     db.commit()
     db.refresh(payment)
@@ -173,20 +442,27 @@ def get_rental_fines(db: Session, rental_id: int) -> List[Fine]:
 
 
 # Expense CRUD
+@_invalidates_reports
 def create_expense(db: Session, car_id: int, expense_type: ExpenseType,
                    amount: float, description: Optional[str] = None) -> Expense:
     expense = Expense(
         car_id=car_id,
         expense_type=expense_type,
         amount=amount,
-        description=description
+        description=description,
+        expense_date=datetime.utcnow()
     )
     db.add(expense)
+    _add_daily_financials(db, [{"car_id": car_id, "day": expense.expense_date.date(), "expenses": amount}])
     db.commit()
     db.refresh(expense)
     return expense
 
 
+def get_expense_by_id(db: Session, expense_id: int, profile: Optional[str] = None) -> Optional[Expense]:
+    return _with_profile(db.query(Expense), profile).filter(Expense.id == expense_id).first()
+
+
 def get_car_expenses(db: Session, car_id: int) -> List[Expense]:
     return db.query(Expense).filter(Expense.car_id == car_id).all()
 
@@ -200,22 +476,222 @@ def get_expenses_by_period(db: Session, start_date: datetime, end_date: datetime
     ).all()
 
 
-# Analytics
-def get_car_profitability(db: Session, car_id: int) -> Dict[str, Any]:
-    """Calculate car profitability"""
-    car = get_car_by_id(db, car_id)
-    if not car:
+# Search: substring matches for inline queries; on Postgres ILIKE '%...%' is served by the trigram indexes
+def _contains(column, text: str):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def search_cars(db: Session, text: str, limit: int = 10) -> List[Car]:
+    """Cars whose plate, VIN, brand or model contains the text"""
+    return db.query(Car).filter(
+        or_(*[_contains(column, text) for column in (Car.license_plate, Car.vin, Car.brand, Car.model)])
+    ).order_by(Car.id).limit(limit).all()
+
+
+def search_renters(db: Session, text: str, limit: int = 10) -> List[Renter]:
+    """Renters whose name or phone contains the text"""
+    return db.query(Renter).filter(
+        or_(_contains(Renter.name, text), _contains(Renter.phone, text))
+    ).order_by(Renter.name, Renter.id).limit(limit).all()
+
+
+def search_active_rentals(db: Session, text: str, limit: int = 10,
+                          profile: Optional[str] = None) -> List[Rental]:
+    """Active rentals by number (#12), car plate, renter name or phone; soonest end first"""
+    matches = [
+        Rental.car_id.in_(select(Car.id).where(_contains(Car.license_plate, text))),
+        Rental.renter_id.in_(
+            select(Renter.id).where(or_(_contains(Renter.name, text), _contains(Renter.phone, text)))
+        )
+    ]
+    rental_id = text.lstrip("#")
+    if rental_id.isdigit() and int(rental_id) < 2 ** 31:
+        matches.append(Rental.id == int(rental_id))
+    
+    return _with_profile(db.query(Rental), profile).filter(
+        Rental.is_active == True,
+        or_(*matches)
+    ).order_by(Rental.end_date, Rental.id).limit(limit).all()
+
+
+# Bulk import: one executemany per call, callers pass pre-validated chunks
+def get_existing_car_keys(db: Session, vins: List[str], license_plates: List[str]) -> tuple:
+    """(set of VINs, set of plates) among the given ones that are already taken"""
+    if not vins and not license_plates:
+        return set(), set()
+    rows = db.query(Car.vin, Car.license_plate).filter(
+        or_(Car.vin.in_(vins), Car.license_plate.in_(license_plates))
+    ).all()
+    return {vin for vin, _ in rows}, {plate for _, plate in rows}
+
+
+def get_existing_renter_phones(db: Session, phones: List[str]) -> set:
+    if not phones:
+        return set()
+    return {phone for phone, in db.query(Renter.phone).filter(Renter.phone.in_(phones))}
+
+
+def get_rental_car_ids(db: Session, rental_ids: List[int]) -> Dict[int, int]:
+    """Map rental id -> car id for the given rentals that exist"""
+    if not rental_ids:
         return {}
+    return dict(db.query(Rental.id, Rental.car_id).filter(Rental.id.in_(rental_ids)).all())
+
+
+@_invalidates_reports
+def bulk_create_cars(db: Session, rows: List[Dict[str, Any]]) -> int:
+    db.execute(insert(Car), rows)
+    db.commit()
+    return len(rows)
+
+
+def bulk_create_renters(db: Session, rows: List[Dict[str, Any]]) -> int:
+    db.execute(insert(Renter), rows)
+    db.commit()
+    return len(rows)
+
+
+@_invalidates_reports
+def bulk_create_payments(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Insert historical payments and apply them to rental balances and the daily rollup"""
+    if not rows:
+        return 0
     
-    # Total income (payments)
-    total_income = db.query(func.sum(Payment.amount)).join(Rental).filter(
-        Rental.car_id == car_id
-    ).scalar() or 0
+    db.execute(insert(Payment), rows)
+    
+    paid_by_rental: Dict[int, float] = {}
+    for row in rows:
+        paid_by_rental[row["rental_id"]] = paid_by_rental.get(row["rental_id"], 0) + row["amount"]
+    
+    rentals = Rental.__table__
+    db.execute(
+        rentals.update().where(rentals.c.id == bindparam("rental_pk")).values(
+            paid_amount=func.coalesce(rentals.c.paid_amount, 0) + bindparam("paid")
+        ),
+        [{"rental_pk": rental_id, "paid": paid} for rental_id, paid in paid_by_rental.items()]
+    )
+    
+    car_ids = get_rental_car_ids(db, list(paid_by_rental))
+    _add_daily_financials(db, [
+        {"car_id": car_ids[row["rental_id"]], "day": row["payment_date"].date(), "income": row["amount"]}
+        for row in rows
+    ])
+    
+    db.commit()
+    return len(rows)
+
+
+# Daily financials rollup
+ROLLUP_BATCH_SIZE = 1000
+
+
+def _add_daily_financials(db: Session, deltas: List[Dict[str, Any]]) -> int:
+    """Add income/expenses deltas to (car_id, day) rollup rows, creating them as needed"""
+    if not deltas:
+        return 0
+    
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = DailyCarFinancials.__table__
     
-    # Total expenses
-    total_expenses = db.query(func.sum(Expense.amount)).filter(
+    # One row per key: Postgres refuses to update the same row twice in one statement
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for delta in deltas:
+        row = merged.setdefault((delta["car_id"], delta["day"]), {
+            "car_id": delta["car_id"],
+            "day": delta["day"],
+            "income": 0.0,
+            "expenses": 0.0
+        })
+        row["income"] += delta.get("income", 0.0)
+        row["expenses"] += delta.get("expenses", 0.0)
+    rows = list(merged.values())
+    
+    for i in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        stmt = dialect.insert(table).values(rows[i:i + ROLLUP_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.car_id, table.c.day],
+            set_={
+                "income": table.c.income + stmt.excluded.income,
+                "expenses": table.c.expenses + stmt.excluded.expenses
+            }
+        )
+        db.execute(stmt)
+    
+    return len(rows)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _car_daily_deltas(db: Session, car_id: int) -> List[Dict[str, Any]]:
+    """Income and expenses of one car per day, straight from its payments and expenses"""
+    deltas: List[Dict[str, Any]] = []
+    
+    payment_day = func.date(Payment.payment_date)
+    for day, amount in db.query(payment_day, func.sum(Payment.amount)).join(
+        Rental, Payment.rental_id == Rental.id
+    ).filter(Rental.car_id == car_id).group_by(payment_day):
+        deltas.append({"car_id": car_id, "day": _as_date(day), "income": amount or 0})
+    
+    expense_day = func.date(Expense.expense_date)
+    for day, amount in db.query(expense_day, func.sum(Expense.amount)).filter(
         Expense.car_id == car_id
-    ).scalar() or 0
+    ).group_by(expense_day):
+        deltas.append({"car_id": car_id, "day": _as_date(day), "expenses": amount or 0})
+    
+    return deltas
+
+
+@_invalidates_reports
+def rebuild_daily_financials(db: Session) -> int:
+    """Recompute the daily rollup from payments and expenses; returns the row count"""
+    # Rows of cars that no longer exist
+    db.query(DailyCarFinancials).filter(
+        DailyCarFinancials.car_id.notin_(select(Car.id))
+    ).delete(synchronize_session=False)
+    
+    # One car per transaction: memory holds a single car's days, and every
+    # car's rows are replaced at once, so reports never see a half-built car
+    rows = 0
+    for car_id in db.scalars(select(Car.id).order_by(Car.id)).all():
+        db.query(DailyCarFinancials).filter(
+            DailyCarFinancials.car_id == car_id
+        ).delete(synchronize_session=False)
+        rows += _add_daily_financials(db, _car_daily_deltas(db, car_id))
+        db.commit()
+    
+    db.commit()
+    return rows
+
+
+# Analytics
+def _profitability_query(db: Session):
+    """Income and expense totals per car from the daily rollup as one grouped statement"""
+    totals = db.query(
+        DailyCarFinancials.car_id.label("car_id"),
+        func.sum(DailyCarFinancials.income).label("total_income"),
+        func.sum(DailyCarFinancials.expenses).label("total_expenses")
+    ).group_by(DailyCarFinancials.car_id).subquery()
+    
+    return db.query(
+        Car.id,
+        Car.brand,
+        Car.model,
+        Car.license_plate,
+        func.coalesce(totals.c.total_income, 0).label("total_income"),
+        func.coalesce(totals.c.total_expenses, 0).label("total_expenses")
+    ).outerjoin(totals, totals.c.car_id == Car.id)
+
+
+def _profitability_row(row) -> Dict[str, Any]:
+    total_income = row.total_income or 0
+    total_expenses = row.total_expenses or 0
     
     # Net profit
     net_profit = total_income - total_expenses
@@ -224,8 +700,9 @@ def get_car_profitability(db: Session, car_id: int) -> Dict[str, Any]:
     roi = (net_profit / total_expenses * 100) if total_expenses > 0 else 0
     
     return {
-        "car_id": car_id,
-        "car_info": f"{car.brand} {car.model} ({car.license_plate})",
+        "car_id": row.id,
+        "car_name": f"{row.brand} {row.model}",
+        "car_info": f"{row.brand} {row.model} ({row.license_plate})",
         "total_income": total_income,
         "total_expenses": total_expenses,
         "net_profit": net_profit,
@@ -233,33 +710,358 @@ def get_car_profitability(db: Session, car_id: int) -> Dict[str, Any]:
     }
 
 
-def get_monthly_income(db: Session, year: int, month: int) -> float:
-    """Get total income for a specific month"""
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
+def get_car_totals(db: Session, car_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Income, expenses and rental count per car from the daily rollup, for cards and lists"""
+    totals = {
+        car_id: {"total_income": 0, "total_expenses": 0, "rental_count": 0}
+        for car_id in car_ids
+    }
+    if not car_ids:
+        return totals
     
-    return db.query(func.sum(Payment.amount)).filter(
+    for car_id, income, expenses in db.query(
+        DailyCarFinancials.car_id,
+        func.sum(DailyCarFinancials.income),
+        func.sum(DailyCarFinancials.expenses)
+    ).filter(DailyCarFinancials.car_id.in_(car_ids)).group_by(DailyCarFinancials.car_id):
+        totals[car_id]["total_income"] = income or 0
+        totals[car_id]["total_expenses"] = expenses or 0
+    
+    for car_id, rental_count in db.query(Rental.car_id, func.count(Rental.id)).filter(
+        Rental.car_id.in_(car_ids)
+    ).group_by(Rental.car_id):
+        totals[car_id]["rental_count"] = rental_count
+    
+    return totals
+
+
+def get_car_profitability(db: Session, car_id: int) -> Dict[str, Any]:
+    """Calculate car profitability"""
+    row = _profitability_query(db).filter(Car.id == car_id).first()
+    if not row:
+        return {}
+    
+    return _profitability_row(row)
+
+
+def get_fleet_profitability(db: Session) -> List[Dict[str, Any]]:
+    """Calculate profitability for every car in a single query, sorted by net profit"""
+    fleet = [_profitability_row(row) for row in _profitability_query(db).order_by(Car.id).all()]
+    fleet.sort(key=lambda x: x['net_profit'], reverse=True)
+    return fleet
+
+
+def shift_month(d: date, months: int) -> date:
+    """Return the first day of the month `months` away from the month of `d`"""
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_bucket(db: Session, column):
+    """Truncate a timestamp column to its month, per dialect"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("month", column)
+    return func.strftime("%Y-%m-01", column)
+
+
+def _month_key(value) -> tuple:
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+    return value.year, value.month
+
+
+def _sum_by_month(db: Session, start: date, end: date) -> Dict[tuple, tuple]:
+    """(income, expenses) per month from the daily rollup for days in [start, end)"""
+    bucket = _month_bucket(db, DailyCarFinancials.day).label("month")
+    rows = db.query(
+        bucket,
+        func.sum(DailyCarFinancials.income),
+        func.sum(DailyCarFinancials.expenses)
+    ).filter(
         and_(
-            Payment.payment_date >= start_date,
-            Payment.payment_date < end_date
+            DailyCarFinancials.day >= start,
+            DailyCarFinancials.day < end
         )
-    ).scalar() or 0
+    ).group_by(bucket).all()
+    return {_month_key(month): (income or 0, expenses or 0) for month, income, expenses in rows if month is not None}
+
+
+def get_monthly_series(db: Session, start: date, end: date) -> List[Dict[str, Any]]:
+    """Get income and expenses for every month from `start` to `end` inclusive, oldest first"""
+    first_month = shift_month(start, 0)
+    after_last_month = shift_month(end, 1)
+    
+    totals = _sum_by_month(db, first_month, after_last_month)
+    
+    series = []
+    month = first_month
+    while month < after_last_month:
+        income, expenses = totals.get((month.year, month.month), (0, 0))
+        series.append({
+            "year": month.year,
+            "month": month.month,
+            "income": income,
+            "expenses": expenses
+        })
+        month = shift_month(month, 1)
+    
+    return series
+
+
+def get_monthly_income(db: Session, year: int, month: int) -> float:
+    """Get total income for a specific month"""
+    return get_monthly_series(db, date(year, month, 1), date(year, month, 1))[0]['income']
 
 
 def get_monthly_expenses(db: Session, year: int, month: int) -> float:
     """Get total expenses for a specific month"""
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
+    return get_monthly_series(db, date(year, month, 1), date(year, month, 1))[0]['expenses']
+
+
+# Utilization: rented days over calendar days, from rental intervals clipped to the window in SQL
+UTILIZATION_BUCKETS = ("week", "month")
+
+
+def utilization_buckets(start: date, end: date, bucket: Optional[str] = None) -> List[tuple]:
+    """Split [start, end] into (first_day, last_day) periods: whole window, ISO weeks or months"""
+    if bucket is None:
+        return [(start, end)]
+    if bucket not in UTILIZATION_BUCKETS:
+        raise ValueError(f"Unknown utilization bucket: {bucket}")
     
-    return db.query(func.sum(Expense.amount)).filter(
-        and_(
-            Expense.expense_date >= start_date,
-            Expense.expense_date < end_date
+    buckets = []
+    first = start
+    while first <= end:
+        if bucket == "week":
+            after = first + timedelta(days=7 - first.weekday())
+        else:
+            after = shift_month(first, 1)
+        last = min(after - timedelta(days=1), end)
+        buckets.append((first, last))
+        first = after
+    return buckets
+
+
+def _greatest(db: Session, *values):
+    return func.greatest(*values) if db.get_bind().dialect.name == "postgresql" else func.max(*values)
+
+
+def _least(db: Session, *values):
+    return func.least(*values) if db.get_bind().dialect.name == "postgresql" else func.min(*values)
+
+
+def _utilization(rented_days: int, calendar_days: int) -> float:
+    return round(rented_days / calendar_days * 100, 1) if calendar_days else 0.0
+
+
+def get_utilization(db: Session, start: date, end: date, bucket: Optional[str] = None,
+                    today: Optional[date] = None) -> Dict[str, Any]:
+    """Rented days / calendar days per car and for the fleet, per bucket and for the whole window"""
+    today = today or date.today()
+    buckets = utilization_buckets(start, end, bucket)
+    
+    # Rental intervals clipped to the window in SQL; an overdue rental keeps the car until it is returned
+    rental_end = case(
+        (and_(Rental.is_active == True, Rental.end_date < today), literal(today, Date)),
+        else_=Rental.end_date
+    )
+    intervals = db.execute(
+        select(
+            Rental.car_id,
+            _greatest(db, Rental.start_date, literal(start, Date)),
+            _least(db, rental_end, literal(end, Date))
+        ).where(
+            Rental.start_date <= end,
+            rental_end >= start
         )
-    ).scalar() or 0
+    ).all()
+    
+    bucket_firsts = [first for first, _ in buckets]
+    bucket_days = [(last - first).days + 1 for first, last in buckets]
+    window_days = sum(bucket_days)
+    
+    cars = db.query(Car.id, Car.brand, Car.model, Car.license_plate).order_by(Car.id).all()
+    rented_by_car = {car.id: [0] * len(buckets) for car in cars}
+    
+    # Spread each interval over the buckets it spans: a few steps per rental, not one per day
+    for car_id, first, last in intervals:
+        if car_id not in rented_by_car:
+            continue
+        first, last = _as_date(first), _as_date(last)
+        rented = rented_by_car[car_id]
+        index = bisect_right(bucket_firsts, first) - 1
+        while index < len(buckets) and bucket_firsts[index] <= last:
+            bucket_last = buckets[index][1]
+            rented[index] += (min(last, bucket_last) - max(first, bucket_firsts[index])).days + 1
+            index += 1
+    
+    # Legacy overlapping rentals must not push a car past 100%
+    for rented in rented_by_car.values():
+        for index, days in enumerate(rented):
+            rented[index] = min(days, bucket_days[index])
+    
+    fleet_by_bucket = [sum(days[index] for days in rented_by_car.values()) for index in range(len(buckets))]
+    fleet_rented = sum(fleet_by_bucket)
+    
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "bucket": bucket,
+        "fleet": {
+            "cars": len(cars),
+            "rented_days": fleet_rented,
+            "calendar_days": window_days * len(cars),
+            "utilization": _utilization(fleet_rented, window_days * len(cars))
+        },
+        "buckets": [
+            {
+                "start_date": first.isoformat(),
+                "end_date": last.isoformat(),
+                "rented_days": fleet_by_bucket[index],
+                "calendar_days": bucket_days[index] * len(cars),
+                "utilization": _utilization(fleet_by_bucket[index], bucket_days[index] * len(cars))
+            }
+            for index, (first, last) in enumerate(buckets)
+        ],
+        "cars": [
+            {
+                "car_id": car.id,
+                "car_info": f"{car.brand} {car.model} ({car.license_plate})",
+                "rented_days": sum(rented_by_car[car.id]),
+                "calendar_days": window_days,
+                "utilization": _utilization(sum(rented_by_car[car.id]), window_days),
+                "buckets": [
+                    _utilization(days, bucket_days[index])
+                    for index, days in enumerate(rented_by_car[car.id])
+                ]
+            }
+            for car in cars
+        ]
+    }
+
+
+# Bot FSM storage
+def get_fsm_record(db: Session, key: str) -> Optional[FSMRecord]:
+    return db.query(FSMRecord).filter(FSMRecord.key == key).first()
+
+
+def save_fsm_records(db: Session, records: Dict[str, Dict[str, Optional[str]]]) -> int:
+    """Upsert buffered FSM writes (key -> {"state"?, "data"?}); fully cleared records are deleted"""
+    if not records:
+        return 0
+    
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = FSMRecord.__table__
+    now = datetime.utcnow()
+    
+    # Each group updates the same columns, so it can share one statement
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    cleared = []
+    for key, fields in records.items():
+        if fields == {"state": None, "data": None}:
+            cleared.append(key)
+            continue
+        groups.setdefault(tuple(sorted(fields)), []).append({
+            "key": key,
+            "state": fields.get("state"),
+            "data": fields.get("data"),
+            "updated_at": now
+        })
+    
+    for columns, rows in groups.items():
+        stmt = dialect.insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={name: stmt.excluded[name] for name in columns + ("updated_at",)}
+        )
+        db.execute(stmt)
+    if cleared:
+        db.query(FSMRecord).filter(FSMRecord.key.in_(cleared)).delete(synchronize_session=False)
+    
+    db.commit()
+    return len(records)
+
+
+def delete_expired_fsm_records(db: Session, before: datetime) -> int:
+    """Drop dialogs abandoned since before"""
+    deleted = db.query(FSMRecord).filter(FSMRecord.updated_at < before).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+# Exports: column-only statements for streaming with yield_per, oldest first
+def _period_filters(column, date_from: Optional[date], date_to: Optional[date]) -> list:
+    filters = []
+    if date_from is not None:
+        filters.append(column >= datetime.combine(date_from, datetime.min.time()))
+    if date_to is not None:
+        filters.append(column < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return filters
+
+
+def rentals_export_select(car_id: Optional[int] = None, date_from: Optional[date] = None,
+                          date_to: Optional[date] = None) -> Select:
+    """Rentals overlapping the period, with car and renter columns"""
+    stmt = select(
+        Rental.id.label("ID"),
+        Car.brand.label("Марка"),
+        Car.model.label("Модель"),
+        Car.license_plate.label("Госномер"),
+        Renter.name.label("Арендатор"),
+        Renter.phone.label("Телефон"),
+        Rental.rental_type.label("Тип аренды"),
+        Rental.start_date.label("Начало"),
+        Rental.end_date.label("Окончание"),
+        Rental.daily_rate.label("Ставка в день"),
+        Rental.total_amount.label("Сумма"),
+        Rental.paid_amount.label("Оплачено"),
+        Rental.deposit.label("Залог"),
+        Rental.is_active.label("Активна"),
+        Rental.overdue_days.label("Дни просрочки"),
+        Rental.created_at.label("Создана")
+    ).join(Car, Car.id == Rental.car_id).join(Renter, Renter.id == Rental.renter_id)
+    
+    if car_id is not None:
+        stmt = stmt.where(Rental.car_id == car_id)
+    if date_from is not None:
+        stmt = stmt.where(Rental.end_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Rental.start_date <= date_to)
+    return stmt.order_by(Rental.id)
+
+
+def payments_export_select(car_id: Optional[int] = None, date_from: Optional[date] = None,
+                           date_to: Optional[date] = None) -> Select:
+    """Payments made in the period, with the rental's car and renter"""
+    stmt = select(
+        Payment.id.label("ID"),
+        Payment.payment_date.label("Дата"),
+        Payment.amount.label("Сумма"),
+        Payment.rental_id.label("Договор"),
+        Car.license_plate.label("Госномер"),
+        Renter.name.label("Арендатор"),
+        Payment.notes.label("Заметки")
+    ).join(Rental, Rental.id == Payment.rental_id).join(Car, Car.id == Rental.car_id).join(
+        Renter, Renter.id == Rental.renter_id
+    ).where(*_period_filters(Payment.payment_date, date_from, date_to))
+    
+    if car_id is not None:
+        stmt = stmt.where(Rental.car_id == car_id)
+    return stmt.order_by(Payment.id)
+
+
+def expenses_export_select(car_id: Optional[int] = None, date_from: Optional[date] = None,
+                           date_to: Optional[date] = None) -> Select:
+    """Expenses made in the period, with the car"""
+    stmt = select(
+        Expense.id.label("ID"),
+        Expense.expense_date.label("Дата"),
+        Car.license_plate.label("Госномер"),
+        Expense.expense_type.label("Тип расхода"),
+        Expense.amount.label("Сумма"),
+        Expense.description.label("Описание")
+    ).join(Car, Car.id == Expense.car_id).where(*_period_filters(Expense.expense_date, date_from, date_to))
+    
+    if car_id is not None:
+        stmt = stmt.where(Expense.car_id == car_id)
+    return stmt.order_by(Expense.id)
@@ -1,12 +1,96 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 import config
 
+
+def get_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL to its async driver (asyncpg / aiosqlite)"""
+    url = make_url(url)
+    drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    backend = url.get_backend_name()
+    if backend in drivers:
+        url = url.set(drivername=drivers[backend])
+    return url.render_as_string(hide_password=False)
+
+
+def get_engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool and connection settings from config for the given DATABASE_URL"""
+    if make_url(url).get_backend_name() != "postgresql":
+        # SQLite (local development) keeps SQLAlchemy's default pooling
+        return {}
+    
+    options = {}
+    if config.DB_PGBOUNCER:
+        # PgBouncer owns the pool; hold no idle connections in the process
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+        )
+    
+    # Behind PgBouncer the timeout is set per transaction (see set_statement_timeout):
+    # PgBouncer refuses startup parameters it does not know
+    startup_timeout = config.DB_STATEMENT_TIMEOUT and not config.DB_PGBOUNCER
+    connect_args = {}
+    if is_async:
+        if startup_timeout:
+            connect_args["server_settings"] = {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT)}
+        if config.DB_PGBOUNCER:
+            # Prepared statements don't survive transaction pooling
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+    elif startup_timeout:
+        connect_args["options"] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    
+    return options
+
+
+def set_statement_timeout(sync_engine):
+    """Behind PgBouncer: apply DB_STATEMENT_TIMEOUT to every transaction with SET LOCAL"""
+    if not (config.DB_PGBOUNCER and config.DB_STATEMENT_TIMEOUT):
+        return
+    if sync_engine.dialect.name != "postgresql":
+        return
+    
+    # A plain SET would stay on whichever server connection PgBouncer picked and
+    # leak to other clients; SET LOCAL ends with the transaction
+    @event.listens_for(sync_engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(config.DB_STATEMENT_TIMEOUT)}")
+
+
 # Создаем движок базы данных
-engine = create_engine(config.DATABASE_URL, echo=False)
+engine = create_engine(config.DATABASE_URL, echo=False, **get_engine_options(config.DATABASE_URL))
+set_statement_timeout(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для веб-интерфейса (Alembic, бот и скрипты используют синхронный)
+async_engine = create_async_engine(
+    get_async_url(config.DATABASE_URL),
+    echo=False,
+    **get_engine_options(config.DATABASE_URL, is_async=True)
+)
+set_statement_timeout(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def reset_engines_after_fork():
+    """Drop pooled connections inherited from the parent process (call in the child)"""
+    # close=False: the parent still owns those sockets and must not see them closed
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
 # Используем Base из models.py
 from .models import Base
 
@@ -29,11 +113,7 @@ def get_sync_db():
         pass  # Caller должен сам закрыть сессию
 
 
-# Для совместимости со старым кодом
 async def get_async_db():
-    """Async-compatible database session for bot"""
-    db = SessionLocal()
-    try:
+    """Dependency to get async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
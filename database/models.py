@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Date, Enum
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Date, Enum, Index, text,
+    DDL, column, event, func, literal_column
+)
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, date
 import enum
 
 Base = declarative_base()
@@ -28,6 +32,17 @@ class ExpenseType(enum.Enum):
 
 class Car(Base):
     __tablename__ = "cars"
+    __table_args__ = (
+        # Trigram indexes for substring search from inline queries (Postgres only)
+        Index("ix_cars_license_plate_trgm", "license_plate", postgresql_using="gin",
+              postgresql_ops={"license_plate": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_cars_vin_trgm", "vin", postgresql_using="gin",
+              postgresql_ops={"vin": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_cars_brand_trgm", "brand", postgresql_using="gin",
+              postgresql_ops={"brand": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_cars_model_trgm", "model", postgresql_using="gin",
+              postgresql_ops={"model": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     brand = Column(String(100), nullable=False)  # Марка
@@ -36,7 +51,9 @@ class Car(Base):
     license_plate = Column(String(20), unique=True, nullable=False)  # Госномер
     daily_rate = Column(Float, nullable=False)  # Стоимость в день
     photo_path = Column(String(500))  # Путь к фото
-    status = Column(Enum(RentalStatus), default=RentalStatus.AVAILABLE)
+    photo_file_id = Column(String(255))  # file_id фото в Telegram, чтобы не загружать файл заново
+    photo_file_unique_id = Column(String(64))  # Постоянный id того же файла в Telegram
+    status = Column(Enum(RentalStatus), default=RentalStatus.AVAILABLE, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -46,10 +63,16 @@ class Car(Base):
 
 class Renter(Base):
     __tablename__ = "renters"
+    __table_args__ = (
+        Index("ix_renters_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_renters_phone_trgm", "phone", postgresql_using="gin",
+              postgresql_ops={"phone": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)  # ФИО
-    phone = Column(String(20), nullable=False)  # Телефон
+    phone = Column(String(20), nullable=False, index=True)  # Телефон
     email = Column(String(100))  # Email
     passport = Column(String(50))  # Паспорт
     notes = Column(Text)  # Заметки
@@ -61,10 +84,30 @@ class Renter(Base):
 
 class Rental(Base):
     __tablename__ = "rentals"
+    __table_args__ = (
+        # Active/overdue lookups only ever touch active rows
+        Index(
+            "ix_rentals_active_end_date", "is_active", "end_date",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active = 1"),
+        ),
+        Index("ix_rentals_car_id_start_date", "car_id", "start_date"),
+        # Newest-first listing and its keyset cursor
+        Index("ix_rentals_created_at_id", "created_at", "id"),
+        # No two active rentals of a car may share a day; its GiST index also
+        # answers fleet-wide "free between D1 and D2" lookups (Postgres only)
+        ExcludeConstraint(
+            (column("car_id"), "="),
+            (func.daterange(column("start_date"), column("end_date"), literal_column("'[]'")), "&&"),
+            name="ex_rentals_car_no_overlap",
+            using="gist",
+            where=text("is_active"),
+        ).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     car_id = Column(Integer, ForeignKey("cars.id"), nullable=False)
-    renter_id = Column(Integer, ForeignKey("renters.id"), nullable=False)
+    renter_id = Column(Integer, ForeignKey("renters.id"), nullable=False, index=True)
     
     rental_type = Column(Enum(RentalType), nullable=False)
     start_date = Column(Date, nullable=False)
@@ -87,15 +130,43 @@ class Rental(Base):
     renter = relationship("Renter", back_populates="rentals")
     payments = relationship("Payment", back_populates="rental")
     fines = relationship("Fine", back_populates="rental")
+    
+    @property
+    def current_overdue_days(self) -> int:
+        """Overdue days derived from end_date; ended rentals keep the swept value"""
+        if not self.is_active:
+            return self.overdue_days or 0
+        return max((date.today() - self.end_date).days, 0)
+    
+    @property
+    def is_currently_overdue(self) -> bool:
+        return self.current_overdue_days > 0
+
+
+# Trigram search indexes need pg_trgm
+for _table in (Car.__table__, Renter.__table__):
+    event.listen(
+        _table,
+        "before_create",
+        DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+    )
+
+
+# The exclusion constraint compares car_id with "=" inside a GiST index
+event.listen(
+    Rental.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql")
+)
 
 
 class Payment(Base):
     __tablename__ = "payments"
     
     id = Column(Integer, primary_key=True, index=True)
-    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False)
+    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False, index=True)
     amount = Column(Float, nullable=False)  # Сумма платежа
-    payment_date = Column(DateTime, default=datetime.utcnow)
+    payment_date = Column(DateTime, default=datetime.utcnow, index=True)
     notes = Column(Text)  # Заметки
     
     # Relationships
@@ -118,13 +189,36 @@ class Fine(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_car_id_expense_date", "car_id", "expense_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     car_id = Column(Integer, ForeignKey("cars.id"), nullable=False)
     expense_type = Column(Enum(ExpenseType), nullable=False)
     amount = Column(Float, nullable=False)  # Сумма расхода
     description = Column(Text)  # Описание
-    expense_date = Column(DateTime, default=datetime.utcnow)
+    expense_date = Column(DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
     car = relationship("Car", back_populates="expenses")
+
+
+class DailyCarFinancials(Base):
+    """Per-car, per-day ledger rollup kept in step with payments and expenses"""
+    __tablename__ = "daily_car_financials"
+    
+    car_id = Column(Integer, ForeignKey("cars.id"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    income = Column(Float, nullable=False, default=0.0)  # Платежи за день
+    expenses = Column(Float, nullable=False, default=0.0)  # Расходы за день
+
+
+class FSMRecord(Base):
+    """Bot dialog state (aiogram FSM) kept across restarts and shared by bot workers"""
+    __tablename__ = "fsm_states"
+    
+    key = Column(String(255), primary_key=True)  # bot:chat:user:destiny
+    state = Column(String(255))  # Текущий шаг диалога
+    data = Column(Text)  # Данные диалога в JSON
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
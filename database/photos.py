@@ -0,0 +1,34 @@
+import os
+import re
+from typing import Optional
+
+# Names, paths and URLs of car photos and their variants. Shared by the bot,
+# which stores them, and the web app, which serves and links to them.
+
+# Uploads are named after their content: the same photo is stored once and a
+# file never changes under its URL, so the web app can cache it for good
+UPLOAD_HASH_LENGTH = 16
+_CONTENT_NAMED = re.compile(rf"^car_[0-9a-f]{{{UPLOAD_HASH_LENGTH}}}\.")
+
+
+def upload_name(digest: str) -> str:
+    """File name of a car photo with this sha256 hex digest"""
+    return f"car_{digest[:UPLOAD_HASH_LENGTH]}.jpg"
+
+
+def is_content_named(path: str) -> bool:
+    """Whether a photo or variant is named after its content (older uploads are named by file_id)"""
+    return bool(_CONTENT_NAMED.match(os.path.basename(path)))
+
+
+def variant_path(photo_path: str, variant: str) -> str:
+    """uploads/car_x.jpg -> uploads/car_x.thumb.webp"""
+    root, _ = os.path.splitext(photo_path)
+    return f"{root}.{variant}.webp"
+
+
+def photo_url(photo_path: Optional[str], variant: str) -> Optional[str]:
+    """URL of a photo variant under the /uploads mount of the web app"""
+    if not photo_path:
+        return None
+    return f"/uploads/{os.path.basename(variant_path(photo_path, variant))}"
@@ -0,0 +1,13 @@
+# Checks on user-entered car and renter data, shared by the bot dialogs and bulk import
+
+
+def validate_vin(vin: str) -> bool:
+    """Validate VIN number"""
+    return len(vin) == 17 and vin.isalnum()
+
+
+def validate_phone(phone: str) -> bool:
+    """Basic phone validation"""
+    # Remove all non-digit characters
+    digits = ''.join(filter(str.isdigit, phone))
+    return len(digits) >= 9
@@ -79,7 +79,7 @@ def run_migrations():
             else:
                 print(f"❌ Failed to create initial migration: {init_result.stderr}")
                 return False
-                
+    
     except FileNotFoundError:
         print("❌ Alembic not found. Make sure it's installed in requirements.txt")
         return False
@@ -93,8 +93,12 @@ def start_web_server():
     print("🌐 Starting web server...")
     try:
         import uvicorn
+        from database.database import reset_engines_after_fork
         from web.main import app
         
+        # When forked from main(), don't reuse the parent's pooled connections
+        reset_engines_after_fork()
+        
         # Получаем порт из переменной окружения (для Render)
         port = int(os.getenv("PORT", 8000))
         
@@ -112,12 +116,107 @@ def start_bot():
     """Start the Telegram bot"""
     print("🤖 Starting Telegram bot...")
     try:
-        from bot.main import main
+        from bot.main import main, bot_in_web_app
+        if bot_in_web_app():
+            print("ℹ️ WEBHOOK_SERVER=fastapi: the bot is served by the web server")
+            return
         asyncio.run(main())
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
 
 
+def run_sweeper():
+    """Run one overdue rentals sweep (for cron jobs or on demand)"""
+    print("🧹 Sweeping overdue rentals...")
+    from database.database import SessionLocal
+    from database import crud
+    
+    db = SessionLocal()
+    try:
+        updated = crud.sweep_overdue_rentals(db)
+        print(f"✅ Marked {updated} rentals as overdue")
+        started = crud.start_booked_rentals(db)
+        print(f"✅ Marked {started} booked cars as rented")
+    finally:
+        db.close()
+
+
+def rebuild_rollups():
+    """Rebuild the daily financials rollup from payments and expenses"""
+    print("🔁 Rebuilding daily financials rollup...")
+    from database.database import SessionLocal
+    from database import crud
+    
+    db = SessionLocal()
+    try:
+        rows = crud.rebuild_daily_financials(db)
+        print(f"✅ Rollup rebuilt: {rows} rows")
+    finally:
+        db.close()
+
+
+def make_thumbnails():
+    """Make missing thumbnail and web-size variants of car photos"""
+    print("🖼️ Making car photo variants...")
+    from database.database import SessionLocal
+    from database.models import Car
+    from database.photos import variant_path
+    from bot.utils.photos import PHOTO_VARIANTS, make_variants
+    from PIL import Image, UnidentifiedImageError
+    
+    db = SessionLocal()
+    try:
+        photo_paths = [path for (path,) in db.query(Car.photo_path).filter(Car.photo_path.isnot(None))]
+    finally:
+        db.close()
+    
+    made = 0
+    for photo_path in photo_paths:
+        if not os.path.exists(photo_path):
+            print(f"   - missing file: {photo_path}")
+            continue
+        if all(os.path.exists(variant_path(photo_path, variant)) for variant in PHOTO_VARIANTS):
+            continue
+        try:
+            make_variants(photo_path)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            print(f"   - unreadable photo {photo_path}: {e}")
+            continue
+        made += 1
+    print(f"✅ Variants made for {made} photos")
+
+
+def run_import(args):
+    """Bulk import cars, renters or payments: start.py import <file> [cars|renters|payments]"""
+    if not args:
+        print("❌ Usage: python start.py import <file.csv|file.json> [cars|renters|payments]")
+        sys.exit(1)
+    
+    from database.database import SessionLocal
+    from database import bulk_import
+    
+    path = Path(args[0])
+    kind = args[1].lower() if len(args) > 1 else None
+    print(f"📥 Importing {path}...")
+    
+    try:
+        records = bulk_import.load_records(path.read_text(encoding="utf-8"), path.name, kind)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read import file: {e}")
+        sys.exit(1)
+    
+    db = SessionLocal()
+    try:
+        reports = bulk_import.import_records(db, records)
+    finally:
+        db.close()
+    
+    for kind, report in reports.items():
+        print(f"✅ {kind}: {report['created']} of {report['total']} imported, {report['failed']} failed")
+        for error in report["errors"]:
+            print(f"   - row {error['row']}: {error['error']}")
+
+
 def check_environment():
     """Check if all required environment variables are set"""
     required_vars = ['BOT_TOKEN', 'ADMIN_ID', 'DATABASE_URL', 'SECRET_KEY', 'ADMIN_PASSWORD']
@@ -222,10 +321,22 @@ def main():
                 start_bot()
             elif service == "migrate":
                 print("✅ Migrations completed")
+            elif service == "sweeper":
+                run_sweeper()
+            elif service == "rebuild-rollups":
+                rebuild_rollups()
+            elif service == "import":
+                run_import(sys.argv[2:])
+            elif service == "thumbnails":
+                make_thumbnails()
             else:
                 print(f"❌ Unknown service: {service}")
-                print("Available services: web, bot, migrate")
+                print("Available services: web, bot, migrate, sweeper, rebuild-rollups, import, thumbnails")
                 sys.exit(1)
+        elif config.BOT_MODE == "webhook" and config.WEBHOOK_SERVER == "fastapi":
+            # The bot runs inside the web app
+            print("🚀 Starting web server with the bot webhook...")
+            start_web_server()
         else:
             # Start both services
             print("🚀 Starting both web server and bot...")
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# The app reads DATABASE_URL on import, so point it at a scratch SQLite file first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+from sqlalchemy import event
+
+from database.database import SessionLocal, engine, async_engine
+from database.models import Base
+from database.report_cache import report_cache
+
+
+@pytest.fixture
+def db():
+    """Session on empty tables"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    report_cache.invalidate()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    """Test client of the web app, logged in as admin"""
+    from fastapi.testclient import TestClient
+    from web.main import app
+    from web.routers.auth import create_access_token
+    
+    with TestClient(app) as test_client:
+        test_client.headers["Authorization"] = "Bearer " + create_access_token({"sub": "admin"})
+        yield test_client
+
+
+@pytest.fixture
+def count_statements():
+    """Context manager collecting the SQL statements both engines run inside it"""
+    @contextmanager
+    def counter():
+        statements = []
+        
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        engines = (engine, async_engine.sync_engine)
+        for target in engines:
+            event.listen(target, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", before_cursor_execute)
+    
+    return counter
@@ -0,0 +1,62 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from web.assets import IMMUTABLE, REVALIDATE, HashedStaticFiles, UploadFiles
+
+
+@pytest.fixture
+def assets(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "style.css").write_text("body { color: black; }")
+    (tmp_path / "secret.txt").write_text("not public")
+    
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    for name in ("car_0123456789abcdef.jpg", "car_0123456789abcdef.thumb.webp", "car_AgACAgIAAxkBAAIB.jpg"):
+        (uploads / name).write_bytes(b"photo")
+    
+    static_files = HashedStaticFiles(directory=str(static))
+    app = Starlette(routes=[
+        Mount("/static", static_files),
+        Mount("/uploads", UploadFiles(directory=str(uploads))),
+    ])
+    return static_files, TestClient(app)
+
+
+def test_fingerprinted_asset_is_immutable(assets):
+    static_files, client = assets
+    url = "/static/" + static_files.url_path("css/style.css")
+    
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE
+    
+    assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_outdated_fingerprint_is_revalidated(assets):
+    _, client = assets
+    response = client.get("/static/css/style.000000000000.css")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == REVALIDATE
+
+
+def test_fingerprinted_name_cannot_leave_the_directory(assets):
+    _, client = assets
+    assert client.get("/static/../secret.000000000000.txt").status_code == 404
+    assert client.get("/static/%2e%2e/secret.000000000000.txt").status_code == 404
+
+
+@pytest.mark.parametrize("name, cache_control", [
+    ("car_0123456789abcdef.jpg", IMMUTABLE),
+    ("car_0123456789abcdef.thumb.webp", IMMUTABLE),
+    ("car_AgACAgIAAxkBAAIB.jpg", REVALIDATE),
+])
+def test_only_content_named_uploads_are_immutable(assets, name, cache_control):
+    _, client = assets
+    response = client.get(f"/uploads/{name}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == cache_control
@@ -0,0 +1,21 @@
+import pytest
+
+from database import bulk_import
+
+
+def car(i, daily_rate):
+    return {
+        "brand": "Ford",
+        "model": "Focus",
+        "vin": f"VIN{i:014d}",
+        "license_plate": f"CC{i:03d}",
+        "daily_rate": daily_rate,
+    }
+
+
+@pytest.mark.parametrize("daily_rate", ["nan", "inf", "-Infinity", float("nan"), float("inf")])
+def test_non_finite_number_is_a_row_error(db, daily_rate):
+    result = bulk_import.import_cars(db, [car(1, "45"), car(2, daily_rate)])
+    
+    assert result["created"] == 1
+    assert result["errors"] == [{"row": 2, "error": "daily_rate must be a number"}]
@@ -0,0 +1,54 @@
+from datetime import date, datetime
+
+import pytest
+
+# Hot filters and the index SQLite should pick for each (EXPLAIN QUERY PLAN)
+HOT_QUERIES = [
+    (
+        "SELECT * FROM rentals WHERE is_active = 1 AND end_date < ?",
+        (date.today(),),
+        "ix_rentals_active_end_date",
+    ),
+    (
+        "SELECT * FROM rentals WHERE car_id = ? AND start_date <= ?",
+        (1, date.today()),
+        "ix_rentals_car_id_start_date",
+    ),
+    (
+        "SELECT * FROM rentals WHERE renter_id = ?",
+        (1,),
+        "ix_rentals_renter_id",
+    ),
+    (
+        "SELECT * FROM payments WHERE rental_id = ?",
+        (1,),
+        "ix_payments_rental_id",
+    ),
+    (
+        "SELECT sum(amount) FROM payments WHERE payment_date >= ? AND payment_date < ?",
+        (datetime(2025, 1, 1), datetime(2025, 2, 1)),
+        "ix_payments_payment_date",
+    ),
+    (
+        "SELECT sum(amount) FROM expenses WHERE car_id = ? AND expense_date >= ?",
+        (1, datetime(2025, 1, 1)),
+        "ix_expenses_car_id_expense_date",
+    ),
+    (
+        "SELECT * FROM cars WHERE status = ?",
+        ("AVAILABLE",),
+        "ix_cars_status",
+    ),
+    (
+        "SELECT * FROM renters WHERE phone = ?",
+        ("+995555000000",),
+        "ix_renters_phone",
+    ),
+]
+
+
+@pytest.mark.parametrize("sql, params, index", HOT_QUERIES)
+def test_hot_filter_uses_index(db, sql, params, index):
+    plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).all()
+    details = " | ".join(row[-1] for row in plan)
+    assert f"INDEX {index}" in details
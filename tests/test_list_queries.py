@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+import pytest
+
+from database import crud
+from database.models import ExpenseType, RentalType
+
+
+def seed(db, first, last):
+    """Cars and renters numbered first..last-1, each with a rental, a payment and an expense"""
+    today = date.today()
+    for i in range(first, last):
+        car = crud.create_car(db, "Toyota", f"Camry {i}", f"VIN{i:014d}", f"AA{i:03d}", 50.0)
+        renter = crud.create_renter(db, f"Renter {i}", f"+9955550{i:05d}")
+        rental = crud.create_rental(
+            db, car.id, renter.id, RentalType.SHORT_TERM,
+            today - timedelta(days=5), today + timedelta(days=5), 50.0
+        )
+        crud.create_payment(db, rental.id, 100.0)
+        crud.create_expense(db, car.id, ExpenseType.FUEL, 30.0)
+
+
+# List views load related rows with a fixed number of queries, however many rows there are
+@pytest.mark.parametrize("url, expected", [
+    ("/api/cars/", 3),
+    ("/api/rental/rentals", 1),
+    ("/api/rental/renters", 2),
+])
+def test_list_statement_count_does_not_grow_with_rows(db, client, count_statements, url, expected):
+    counts = []
+    seeded = 0
+    for total in (3, 12):
+        seed(db, seeded, total)
+        seeded = total
+        with count_statements() as statements:
+            response = client.get(url)
+        assert response.status_code == 200
+        counts.append(len(statements))
+    
+    assert counts == [expected, expected]
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from database import crud
+from database.models import RentalStatus, RentalType
+
+
+def book(db, car, renter, start, end):
+    return crud.create_rental(db, car.id, renter.id, RentalType.SHORT_TERM, start, end, car.daily_rate)
+
+
+def test_end_rental_frees_the_car(db):
+    today = date.today()
+    car = crud.create_car(db, "Honda", "Civic", "VIN00000000000001", "DD001", 60.0)
+    renter = crud.create_renter(db, "Renter", "+995555200001")
+    rental = book(db, car, renter, today - timedelta(days=2), today + timedelta(days=2))
+    
+    crud.end_rental(db, rental.id)
+    
+    assert crud.get_car_by_id(db, car.id).status == RentalStatus.AVAILABLE
+
+
+def test_end_rental_keeps_car_rented_while_another_rental_runs(db):
+    today = date.today()
+    car = crud.create_car(db, "Honda", "Civic", "VIN00000000000001", "DD001", 60.0)
+    renter = crud.create_renter(db, "Renter", "+995555200001")
+    # The next rental has started while the previous one is still open
+    current = book(db, car, renter, today - timedelta(days=1), today + timedelta(days=3))
+    overdue = book(db, car, renter, today - timedelta(days=10), today - timedelta(days=5))
+    
+    crud.end_rental(db, overdue.id)
+    assert crud.get_car_by_id(db, car.id).status == RentalStatus.RENTED
+    
+    crud.end_rental(db, current.id)
+    assert crud.get_car_by_id(db, car.id).status == RentalStatus.AVAILABLE
+
+
+def test_end_rental_ignores_future_bookings(db):
+    today = date.today()
+    car = crud.create_car(db, "Honda", "Civic", "VIN00000000000001", "DD001", 60.0)
+    renter = crud.create_renter(db, "Renter", "+995555200001")
+    rental = book(db, car, renter, today - timedelta(days=2), today + timedelta(days=2))
+    book(db, car, renter, today + timedelta(days=5), today + timedelta(days=8))
+    
+    crud.end_rental(db, rental.id)
+    
+    assert crud.get_car_by_id(db, car.id).status == RentalStatus.AVAILABLE
@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from database import crud
+from database.models import DailyCarFinancials, ExpenseType, RentalType
+
+
+def rollup(db):
+    return sorted(
+        (row.car_id, row.day, row.income, row.expenses)
+        for row in db.query(DailyCarFinancials)
+    )
+
+
+def test_rebuild_matches_incremental_rollup(db):
+    today = date.today()
+    for i in range(3):
+        car = crud.create_car(db, "Kia", f"Rio {i}", f"VIN{i:014d}", f"BB{i:03d}", 40.0)
+        renter = crud.create_renter(db, f"Renter {i}", f"+9955551{i:05d}")
+        rental = crud.create_rental(
+            db, car.id, renter.id, RentalType.SHORT_TERM,
+            today - timedelta(days=3), today + timedelta(days=3), 40.0
+        )
+        crud.create_payment(db, rental.id, 80.0 * (i + 1))
+        crud.create_payment(db, rental.id, 20.0)
+        crud.create_expense(db, car.id, ExpenseType.REPAIR, 15.0)
+    
+    incremental = rollup(db)
+    assert len(incremental) == 3
+    
+    assert crud.rebuild_daily_financials(db) == 3
+    assert rollup(db) == incremental
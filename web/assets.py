@@ -0,0 +1,96 @@
+import hashlib
+import os
+import re
+import stat
+from typing import Dict, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from database.photos import is_content_named
+
+# Far-future caching for static assets and uploads. Asset URLs carry a hash of
+# the file content (css/style.3f2a9c1b0d4e.css) and uploads are named after
+# theirs, so a changed file gets a new URL and browsers never revalidate one.
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+FINGERPRINT_LENGTH = 12
+_FINGERPRINTED = re.compile(rf"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{{{FINGERPRINT_LENGTH}}})(?P<ext>\.[A-Za-z0-9]+)$")
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content, hex"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashedStaticFiles(StaticFiles):
+    """Static files served at content-hashed URLs, with content-based ETags"""
+    
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        # full path -> (mtime, size, digest)
+        self._digests: Dict[str, Tuple[float, int, str]] = {}
+    
+    def _digest(self, full_path: str, stat_result: os.stat_result) -> str:
+        cached = self._digests.get(full_path)
+        if cached and cached[:2] == (stat_result.st_mtime, stat_result.st_size):
+            return cached[2]
+        digest = file_digest(full_path)
+        self._digests[full_path] = (stat_result.st_mtime, stat_result.st_size, digest)
+        return digest
+    
+    def fingerprint(self, path: str) -> str:
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise FileNotFoundError(path)
+        return self._digest(full_path, stat_result)[:FINGERPRINT_LENGTH]
+    
+    def url_path(self, path: str) -> str:
+        """css/style.css -> css/style.<hash>.css"""
+        stem, ext = os.path.splitext(path)
+        return f"{stem}.{self.fingerprint(path)}{ext}"
+    
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        immutable = False
+        match = _FINGERPRINTED.match(path)
+        if match:
+            # Resolved like any other request, so a crafted name cannot reach outside the directory
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, match["stem"] + match["ext"])
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                path = match["stem"] + match["ext"]
+                # An outdated hash still gets the current file, just not cached for good
+                digest = await anyio.to_thread.run_sync(self._digest, full_path, stat_result)
+                immutable = match["hash"] == digest[:FINGERPRINT_LENGTH]
+        
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = IMMUTABLE if immutable else REVALIDATE
+        return response
+    
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        # ETag from the content, not the mtime, so it survives redeploys
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, method=scope["method"])
+        response.headers["etag"] = f'"{self._digest(str(full_path), stat_result)}"'
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class UploadFiles(StaticFiles):
+    """Uploaded files: cached for good when named after their content, revalidated otherwise"""
+    
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = IMMUTABLE if is_content_named(path) else REVALIDATE
+        return response
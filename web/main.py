@@ -1,21 +1,35 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, status
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from typing import Optional
+from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
 import os
 
 import config
-from database.database import get_db, engine
+from database.database import engine
 from database.models import Base
-from web.routers import auth, cars, rental, reports
+from web.routers import auth, cars, rental, reports, export, imports
+from web.assets import HashedStaticFiles, UploadFiles
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Rental CRM", description="CRM система для автопроката")
+# Webhook mode with WEBHOOK_SERVER=fastapi: the bot shares this process and event loop
+BOT_IN_WEB_APP = config.BOT_MODE == "webhook" and config.WEBHOOK_SERVER == "fastapi"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not BOT_IN_WEB_APP:
+        yield
+        return
+    
+    from bot.main import embedded_bot
+    async with embedded_bot() as updates:
+        app.state.bot_updates = updates
+        yield
+
+
+app = FastAPI(title="Rental CRM", description="CRM система для автопроката", lifespan=lifespan)
 
 # Mount static files
 if not os.path.exists("web/static"):
@@ -23,16 +37,32 @@ if not os.path.exists("web/static"):
     os.makedirs("web/static/css")
     os.makedirs("web/static/js")
 
-app.mount("/static", StaticFiles(directory="web/static"), name="static")
+# Templates link assets through static_url(), so they are served from content-hashed URLs
+static_files = HashedStaticFiles(directory="web/static")
+app.mount("/static", static_files, name="static")
+
+# Car photos and their thumbnail / web-size variants
+os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", UploadFiles(directory=config.UPLOAD_DIR), name="uploads")
 
 # Templates
 templates = Jinja2Templates(directory="web/templates")
 
+
+def static_url(path: str) -> str:
+    """Fingerprinted URL of a file in web/static: static_url('css/style.css')"""
+    return f"/static/{static_files.url_path(path)}"
+
+
+templates.env.globals["static_url"] = static_url
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(cars.router, prefix="/api/cars", tags=["cars"])
 app.include_router(rental.router, prefix="/api/rental", tags=["rental"])
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
+app.include_router(imports.router, prefix="/api/import", tags=["import"])
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -65,6 +95,19 @@ async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 
+if BOT_IN_WEB_APP:
+    from bot.webhook import SECRET_HEADER
+    
+    @app.post(config.WEBHOOK_PATH, include_in_schema=False)
+    async def telegram_webhook(request: Request):
+        """Telegram bot updates"""
+        updates = request.app.state.bot_updates
+        if not updates.verify(request.headers.get(SECRET_HEADER)):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+        await updates.feed(await request.json())
+        return {}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
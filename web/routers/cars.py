@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
+from datetime import date
 
-from database.database import get_db
-from database import crud
+from database.database import get_async_db
+from database import async_crud
 from database.models import RentalStatus
+from database.photos import photo_url
+from web.pagination import encode_cursor, decode_cursor
 from web.routers.auth import get_current_user
 
 router = APIRouter()
@@ -20,15 +23,21 @@ class CarResponse(BaseModel):
     daily_rate: float
     status: str
     photo_path: Optional[str]
+    thumbnail_url: Optional[str]
     total_income: float
     total_expenses: float
     net_profit: float
     rental_count: int
-
+    
     class Config:
         from_attributes = True
 
 
+class CarPage(BaseModel):
+    items: List[CarResponse]
+    next_cursor: Optional[str]
+
+
 class CarCreate(BaseModel):
     brand: str
     model: str
@@ -38,43 +47,42 @@ class CarCreate(BaseModel):
     photo_path: Optional[str] = None
 
 
-@router.get("/", response_model=List[CarResponse])
+@router.get("/", response_model=CarPage)
 async def get_cars(
-    skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     status: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of cars with optional filtering"""
-    cars = crud.get_cars(db, skip=skip, limit=limit)
-    
-    # Filter by status if provided
+    """Get a page of cars with optional status filtering; pass next_cursor to get the next page"""
+    status_enum = None
     if status:
         try:
             status_enum = RentalStatus(status)
-            cars = [car for car in cars if car.status == status_enum]
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid status")
     
-    # Calculate additional data for each car
+    position = decode_cursor(cursor)
+    after_id = position.get("id") if position else None
+    if position is not None and not isinstance(after_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # One extra row tells whether there is a next page
+    cars = await async_crud.get_cars(db, limit=limit + 1, status=status_enum, after_id=after_id)
+    next_cursor = encode_cursor({"id": cars[limit - 1].id}) if len(cars) > limit else None
+    cars = cars[:limit]
+    
+    # Income, expenses and rental count for the page from the daily rollup
+    totals = await async_crud.get_car_totals(db, [car.id for car in cars])
+    
     cars_response = []
     for car in cars:
-        # Calculate total income from payments
-        total_income = sum(
-            payment.amount 
-            for rental in car.rentals 
-            for payment in rental.payments
-        )
-        
-        # Calculate total expenses
-        total_expenses = sum(expense.amount for expense in car.expenses)
-        
-        # Net profit
+        car_totals = totals[car.id]
+        total_income = car_totals["total_income"]
+        total_expenses = car_totals["total_expenses"]
         net_profit = total_income - total_expenses
-        
-        # Rental count
-        rental_count = len(car.rentals)
+        rental_count = car_totals["rental_count"]
         
         cars_response.append(CarResponse(
             id=car.id,
@@ -85,35 +93,77 @@ async def get_cars(
             daily_rate=car.daily_rate,
             status=car.status.value,
             photo_path=car.photo_path,
+            thumbnail_url=photo_url(car.photo_path, "thumb"),
             total_income=total_income,
             total_expenses=total_expenses,
             net_profit=net_profit,
             rental_count=rental_count
         ))
     
-    return cars_response
+    return CarPage(items=cars_response, next_cursor=next_cursor)
+
+
+class AvailableCar(BaseModel):
+    id: int
+    brand: str
+    model: str
+    license_plate: str
+    daily_rate: float
+
+
+class AvailabilityResponse(BaseModel):
+    start_date: str
+    end_date: str
+    cars: List[AvailableCar]
+
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+    start_date: date = Query(...),
+    end_date: Optional[date] = Query(None),
+    current_user: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get cars free for the whole period (end_date defaults to start_date)"""
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
+    
+    cars = await async_crud.get_available_cars(db, start_date, end_date)
+    
+    return AvailabilityResponse(
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        cars=[
+            AvailableCar(
+                id=car.id,
+                brand=car.brand,
+                model=car.model,
+                license_plate=car.license_plate,
+                daily_rate=car.daily_rate
+            )
+            for car in cars
+        ]
+    )
 
 
 @router.get("/{car_id}", response_model=CarResponse)
 async def get_car(
     car_id: int,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get specific car by ID"""
-    car = crud.get_car_by_id(db, car_id)
+    car = await async_crud.get_car_by_id(db, car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     
     # Calculate additional data
-    total_income = sum(
-        payment.amount 
-        for rental in car.rentals 
-        for payment in rental.payments
-    )
-    total_expenses = sum(expense.amount for expense in car.expenses)
+    car_totals = (await async_crud.get_car_totals(db, [car.id]))[car.id]
+    total_income = car_totals["total_income"]
+    total_expenses = car_totals["total_expenses"]
     net_profit = total_income - total_expenses
-    rental_count = len(car.rentals)
+    rental_count = car_totals["rental_count"]
     
     return CarResponse(
         id=car.id,
@@ -124,6 +174,7 @@ async def get_car(
         daily_rate=car.daily_rate,
         status=car.status.value,
         photo_path=car.photo_path,
+        thumbnail_url=photo_url(car.photo_path, "thumb"),
         total_income=total_income,
         total_expenses=total_expenses,
         net_profit=net_profit,
@@ -135,21 +186,20 @@ async def get_car(
 async def create_car(
     car_data: CarCreate,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new car"""
     # Check if VIN already exists
-    existing_car = db.query(crud.Car).filter(crud.Car.vin == car_data.vin).first()
+    existing_car = await async_crud.get_car_by_vin(db, car_data.vin)
     if existing_car:
         raise HTTPException(status_code=400, detail="Car with this VIN already exists")
     
     # Check if license plate already exists
-    existing_plate = db.query(crud.Car).filter(crud.Car.license_plate == car_data.license_plate).first()
+    existing_plate = await async_crud.get_car_by_license_plate(db, car_data.license_plate)
     if existing_plate:
         raise HTTPException(status_code=400, detail="Car with this license plate already exists")
     
-    car = crud.create_car(
-        db=db,
+    car = await async_crud.create_car(db=db,
         brand=car_data.brand,
         model=car_data.model,
         vin=car_data.vin,
@@ -167,6 +217,7 @@ async def create_car(
         daily_rate=car.daily_rate,
         status=car.status.value,
         photo_path=car.photo_path,
+        thumbnail_url=photo_url(car.photo_path, "thumb"),
         total_income=0.0,
         total_expenses=0.0,
         net_profit=0.0,
@@ -178,14 +229,14 @@ async def create_car(
 async def get_car_history(
     car_id: int,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get rental history for a specific car"""
-    car = crud.get_car_by_id(db, car_id)
+    car = await async_crud.get_car_by_id(db, car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     
-    rentals = crud.get_car_rental_history(db, car_id)
+    rentals = await async_crud.get_car_rental_history(db, car_id, profile="rental_parties")
     
     history = []
     for rental in rentals:
@@ -200,8 +251,8 @@ async def get_car_history(
             "total_amount": rental.total_amount,
             "paid_amount": rental.paid_amount,
             "is_active": rental.is_active,
-            "is_overdue": rental.is_overdue,
-            "overdue_days": rental.overdue_days,
+            "is_overdue": rental.is_currently_overdue,
+            "overdue_days": rental.current_overdue_days,
             "created_at": rental.created_at.isoformat()
         })
     
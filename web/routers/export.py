@@ -0,0 +1,113 @@
+import csv
+import enum
+import io
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+
+from database.database import AsyncSessionLocal
+from database import crud
+from web.routers.auth import get_current_user
+from web.xlsx import stream_xlsx
+
+router = APIRouter()
+
+# Rows fetched per round trip; memory use is bounded by this, not by table size
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+async def _batches(stmt: Select) -> AsyncIterator[List[list]]:
+    # The session lives as long as the response body, not the request handler
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield [[_value(value) for value in row] for row in partition]
+
+
+async def _stream_csv(header: List[str], batches: AsyncIterator[List[list]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    # BOM so Excel opens UTF-8 (Cyrillic) correctly
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    async for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _export(name: str, fmt: str, build_select: Callable[..., Select], car_id: Optional[int],
+            date_from: Optional[date], date_to: Optional[date]) -> StreamingResponse:
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported format. Use csv or xlsx")
+    
+    stmt = build_select(car_id=car_id, date_from=date_from, date_to=date_to)
+    header = [column.name for column in stmt.selected_columns]
+    
+    if fmt == "csv":
+        body = _stream_csv(header, _batches(stmt))
+    else:
+        body = stream_xlsx(header, _batches(stmt), sheet_name=name)
+    
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    )
+
+
+@router.get("/rentals.{fmt}")
+async def export_rentals(
+    fmt: str,
+    car_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    current_user: str = Depends(get_current_user)
+):
+    """Export rentals overlapping the period as CSV or XLSX"""
+    return _export("rentals", fmt, crud.rentals_export_select, car_id, date_from, date_to)
+
+
+@router.get("/payments.{fmt}")
+async def export_payments(
+    fmt: str,
+    car_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    current_user: str = Depends(get_current_user)
+):
+    """Export payments for the period as CSV or XLSX"""
+    return _export("payments", fmt, crud.payments_export_select, car_id, date_from, date_to)
+
+
+@router.get("/expenses.{fmt}")
+async def export_expenses(
+    fmt: str,
+    car_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    current_user: str = Depends(get_current_user)
+):
+    """Export expenses for the period as CSV or XLSX"""
+    return _export("expenses", fmt, crud.expenses_export_select, car_id, date_from, date_to)
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from database.database import get_async_db
+from database import bulk_import
+from web.routers.auth import get_current_user
+
+router = APIRouter()
+
+
+@router.post("/")
+async def import_file(
+    file: UploadFile = File(...),
+    kind: Optional[str] = Form(None),
+    current_user: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Bulk import cars, renters or payments from a CSV or JSON file; returns a report per kind"""
+    try:
+        content = (await file.read()).decode("utf-8")
+        records = bulk_import.load_records(content, file.filename or "", kind)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await db.run_sync(bulk_import.import_records, records)
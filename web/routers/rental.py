@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
 
-from database.database import get_db
-from database import crud
-from database.models import RentalType
+from database.database import get_async_db
+from database import async_crud
+from database.crud import BookingConflictError
+from database.models import RentalType, RentalStatus
+from web.pagination import encode_cursor, decode_cursor
 from web.routers.auth import get_current_user
 
 router = APIRouter()
@@ -20,7 +22,7 @@ class RenterResponse(BaseModel):
     passport: Optional[str]
     notes: Optional[str]
     active_rentals: int
-
+    
     class Config:
         from_attributes = True
 
@@ -43,11 +45,51 @@ class RentalResponse(BaseModel):
     overdue_days: int
     contract_notes: Optional[str]
     created_at: str
-
+    
     class Config:
         from_attributes = True
 
 
+class RentalPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+
+
+# RentalResponse fields by name, so list views can ask for a subset (?fields=)
+RENTAL_FIELDS = {
+    "id": lambda rental: rental.id,
+    "car_id": lambda rental: rental.car_id,
+    "car_info": lambda rental: f"{rental.car.brand} {rental.car.model} ({rental.car.license_plate})",
+    "renter_id": lambda rental: rental.renter_id,
+    "renter_info": lambda rental: f"{rental.renter.name} ({rental.renter.phone})",
+    "rental_type": lambda rental: rental.rental_type.value,
+    "start_date": lambda rental: rental.start_date.isoformat(),
+    "end_date": lambda rental: rental.end_date.isoformat(),
+    "daily_rate": lambda rental: rental.daily_rate,
+    "total_amount": lambda rental: rental.total_amount,
+    "paid_amount": lambda rental: rental.paid_amount,
+    "deposit": lambda rental: rental.deposit,
+    "is_active": lambda rental: rental.is_active,
+    "is_overdue": lambda rental: rental.is_currently_overdue,
+    "overdue_days": lambda rental: rental.current_overdue_days,
+    "contract_notes": lambda rental: rental.contract_notes,
+    "created_at": lambda rental: rental.created_at.isoformat(),
+}
+
+# Fields that need the rental's car and renter loaded
+PARTY_FIELDS = {"car_info", "renter_info"}
+
+RENTAL_STATUSES = ("active", "ended", "overdue")
+
+
+def _rental_fields(rental, fields) -> Dict[str, Any]:
+    return {name: RENTAL_FIELDS[name](rental) for name in fields}
+
+
+def _rental_response(rental) -> RentalResponse:
+    return RentalResponse(**_rental_fields(rental, RENTAL_FIELDS))
+
+
 class RenterCreate(BaseModel):
     name: str
     phone: str
@@ -69,10 +111,10 @@ class RentalCreate(BaseModel):
 @router.get("/renters", response_model=List[RenterResponse])
 async def get_renters(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all renters"""
-    renters = crud.get_renters(db)
+    renters = await async_crud.get_renters(db, profile="renter_rentals")
     
     renters_response = []
     for renter in renters:
@@ -95,16 +137,15 @@ async def get_renters(
 async def create_renter(
     renter_data: RenterCreate,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new renter"""
     # Check if phone already exists
-    existing_renter = crud.get_renter_by_phone(db, renter_data.phone)
+    existing_renter = await async_crud.get_renter_by_phone(db, renter_data.phone)
     if existing_renter:
         raise HTTPException(status_code=400, detail="Renter with this phone already exists")
     
-    renter = crud.create_renter(
-        db=db,
+    renter = await async_crud.create_renter(db=db,
         name=renter_data.name,
         phone=renter_data.phone,
         email=renter_data.email,
@@ -123,71 +164,88 @@ async def create_renter(
     )
 
 
-@router.get("/rentals", response_model=List[RentalResponse])
+@router.get("/rentals", response_model=RentalPage)
 async def get_rentals(
     active_only: bool = Query(False),
     overdue_only: bool = Query(False),
+    status: Optional[str] = Query(None),
+    car_id: Optional[int] = Query(None),
+    renter_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    fields: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get rentals with optional filtering"""
-    # Check for overdue rentals first
-    crud.check_overdue_rentals(db)
+    """Get a page of rentals with optional filtering; pass next_cursor to get the next page"""
+    # active_only / overdue_only are kept as shortcuts for status
+    if status is None:
+        if overdue_only:
+            status = "overdue"
+        elif active_only:
+            status = "active"
+    if status is not None and status not in RENTAL_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
     
-    if active_only:
-        rentals = crud.get_active_rentals(db)
-    else:
-        # Get all rentals
-        rentals = db.query(crud.Rental).order_by(crud.Rental.created_at.desc()).all()
+    # Comma-separated subset of RentalResponse fields
+    selected = list(RENTAL_FIELDS)
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in RENTAL_FIELDS]
+        if unknown or not selected:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
     
-    if overdue_only:
-        rentals = [r for r in rentals if r.is_overdue]
+    before = None
+    position = decode_cursor(cursor)
+    if position is not None:
+        try:
+            before = (datetime.fromisoformat(position["created_at"]), int(position["id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    rentals_response = []
-    for rental in rentals:
-        car_info = f"{rental.car.brand} {rental.car.model} ({rental.car.license_plate})"
-        renter_info = f"{rental.renter.name} ({rental.renter.phone})"
-        
-        rentals_response.append(RentalResponse(
-            id=rental.id,
-            car_id=rental.car_id,
-            car_info=car_info,
-            renter_id=rental.renter_id,
-            renter_info=renter_info,
-            rental_type=rental.rental_type.value,
-            start_date=rental.start_date.isoformat(),
-            end_date=rental.end_date.isoformat(),
-            daily_rate=rental.daily_rate,
-            total_amount=rental.total_amount,
-            paid_amount=rental.paid_amount,
-            deposit=rental.deposit,
-            is_active=rental.is_active,
-            is_overdue=rental.is_overdue,
-            overdue_days=rental.overdue_days,
-            contract_notes=rental.contract_notes,
-            created_at=rental.created_at.isoformat()
-        ))
+    # One extra row tells whether there is a next page
+    rentals = await async_crud.get_rentals(
+        db,
+        profile="rental_parties" if PARTY_FIELDS.intersection(selected) else None,
+        car_id=car_id,
+        renter_id=renter_id,
+        status=status,
+        date_from=date_from,
+        date_to=date_to,
+        before=before,
+        limit=limit + 1
+    )
+    
+    next_cursor = None
+    if len(rentals) > limit:
+        last = rentals[limit - 1]
+        next_cursor = encode_cursor({"created_at": last.created_at.isoformat(), "id": last.id})
     
-    return rentals_response
+    return RentalPage(
+        items=[_rental_fields(rental, selected) for rental in rentals[:limit]],
+        next_cursor=next_cursor
+    )
 
 
 @router.post("/rentals", response_model=RentalResponse)
 async def create_rental(
     rental_data: RentalCreate,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new rental"""
-    # Validate car exists and is available
-    car = crud.get_car_by_id(db, rental_data.car_id)
+    # Validate car exists and is not in maintenance; date clashes are checked on insert
+    car = await async_crud.get_car_by_id(db, rental_data.car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     
-    if car.status != crud.RentalStatus.AVAILABLE:
+    if car.status == RentalStatus.MAINTENANCE:
         raise HTTPException(status_code=400, detail="Car is not available")
     
     # Validate renter exists
-    renter = db.query(crud.Renter).filter(crud.Renter.id == rental_data.renter_id).first()
+    renter = await async_crud.get_renter_by_id(db, rental_data.renter_id)
     if not renter:
         raise HTTPException(status_code=404, detail="Renter not found")
     
@@ -207,79 +265,40 @@ async def create_rental(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid rental type")
     
-    rental = crud.create_rental(
-        db=db,
-        car_id=rental_data.car_id,
-        renter_id=rental_data.renter_id,
-        rental_type=rental_type,
-        start_date=start_date,
-        end_date=end_date,
-        daily_rate=car.daily_rate,
-        deposit=rental_data.deposit,
-        contract_notes=rental_data.contract_notes
-    )
-    
-    car_info = f"{rental.car.brand} {rental.car.model} ({rental.car.license_plate})"
-    renter_info = f"{rental.renter.name} ({rental.renter.phone})"
+    try:
+        rental = await async_crud.create_rental(db=db,
+            car_id=rental_data.car_id,
+            renter_id=rental_data.renter_id,
+            rental_type=rental_type,
+            start_date=start_date,
+            end_date=end_date,
+            daily_rate=car.daily_rate,
+            deposit=rental_data.deposit,
+            contract_notes=rental_data.contract_notes
+        )
+    except BookingConflictError:
+        raise HTTPException(status_code=409, detail="Car is already booked for these dates")
+    rental = await async_crud.get_rental_by_id(db, rental.id, profile="rental_parties")
     
-    return RentalResponse(
-        id=rental.id,
-        car_id=rental.car_id,
-        car_info=car_info,
-        renter_id=rental.renter_id,
-        renter_info=renter_info,
-        rental_type=rental.rental_type.value,
-        start_date=rental.start_date.isoformat(),
-        end_date=rental.end_date.isoformat(),
-        daily_rate=rental.daily_rate,
-        total_amount=rental.total_amount,
-        paid_amount=rental.paid_amount,
-        deposit=rental.deposit,
-        is_active=rental.is_active,
-        is_overdue=rental.is_overdue,
-        overdue_days=rental.overdue_days,
-        contract_notes=rental.contract_notes,
-        created_at=rental.created_at.isoformat()
-    )
+    return _rental_response(rental)
 
 
 @router.get("/rentals/{rental_id}")
 async def get_rental(
     rental_id: int,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get rental details with payments and fines"""
-    rental = crud.get_rental_by_id(db, rental_id)
+    rental = await async_crud.get_rental_by_id(db, rental_id, profile="rental_parties")
     if not rental:
         raise HTTPException(status_code=404, detail="Rental not found")
     
-    payments = crud.get_rental_payments(db, rental_id)
-    fines = crud.get_rental_fines(db, rental_id)
-    
-    car_info = f"{rental.car.brand} {rental.car.model} ({rental.car.license_plate})"
-    renter_info = f"{rental.renter.name} ({rental.renter.phone})"
+    payments = await async_crud.get_rental_payments(db, rental_id)
+    fines = await async_crud.get_rental_fines(db, rental_id)
     
     return {
-        "rental": RentalResponse(
-            id=rental.id,
-            car_id=rental.car_id,
-            car_info=car_info,
-            renter_id=rental.renter_id,
-            renter_info=renter_info,
-            rental_type=rental.rental_type.value,
-            start_date=rental.start_date.isoformat(),
-            end_date=rental.end_date.isoformat(),
-            daily_rate=rental.daily_rate,
-            total_amount=rental.total_amount,
-            paid_amount=rental.paid_amount,
-            deposit=rental.deposit,
-            is_active=rental.is_active,
-            is_overdue=rental.is_overdue,
-            overdue_days=rental.overdue_days,
-            contract_notes=rental.contract_notes,
-            created_at=rental.created_at.isoformat()
-        ),
+        "rental": _rental_response(rental),
         "payments": [
             {
                 "id": payment.id,
@@ -308,17 +327,17 @@ async def add_payment(
     amount: float,
     notes: Optional[str] = None,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add payment to rental"""
-    rental = crud.get_rental_by_id(db, rental_id)
+    rental = await async_crud.get_rental_by_id(db, rental_id)
     if not rental:
         raise HTTPException(status_code=404, detail="Rental not found")
     
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Payment amount must be positive")
     
-    payment = crud.create_payment(db, rental_id, amount, notes)
+    payment = await async_crud.create_payment(db, rental_id, amount, notes)
     
     return {
         "id": payment.id,
@@ -334,10 +353,10 @@ async def add_fine(
     amount: float,
     reason: str,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add fine to rental"""
-    rental = crud.get_rental_by_id(db, rental_id)
+    rental = await async_crud.get_rental_by_id(db, rental_id)
     if not rental:
         raise HTTPException(status_code=404, detail="Rental not found")
     
@@ -347,7 +366,7 @@ async def add_fine(
     if not reason.strip():
         raise HTTPException(status_code=400, detail="Fine reason is required")
     
-    fine = crud.create_fine(db, rental_id, amount, reason)
+    fine = await async_crud.create_fine(db, rental_id, amount, reason)
     
     return {
         "id": fine.id,
@@ -362,16 +381,16 @@ async def add_fine(
 async def end_rental(
     rental_id: int,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """End rental and free up the car"""
-    rental = crud.get_rental_by_id(db, rental_id)
+    rental = await async_crud.get_rental_by_id(db, rental_id)
     if not rental:
         raise HTTPException(status_code=404, detail="Rental not found")
     
     if not rental.is_active:
         raise HTTPException(status_code=400, detail="Rental is already ended")
     
-    crud.end_rental(db, rental_id)
+    await async_crud.end_rental(db, rental_id)
     
     return {"message": "Rental ended successfully"}
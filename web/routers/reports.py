@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import Optional
 
-from database.database import get_db
-from database import crud
+from database.database import get_async_db
+from database import async_crud, crud
+from database.report_cache import report_cache
 from web.routers.auth import get_current_user
 
 router = APIRouter()
@@ -13,30 +14,22 @@ router = APIRouter()
 @router.get("/profitability")
 async def get_cars_profitability(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get profitability report for all cars"""
-    cars = crud.get_cars(db)
+    return await report_cache.get_or_compute(("profitability",), lambda: _profitability_report(db))
+
+
+async def _profitability_report(db: AsyncSession):
+    cars_profitability = await async_crud.get_fleet_profitability(db)
     
-    if not cars:
+    if not cars_profitability:
         return {"cars": [], "totals": {"total_income": 0, "total_expenses": 0, "net_profit": 0}}
     
-    cars_profitability = []
-    total_income = 0
-    total_expenses = 0
-    
-    for car in cars:
-        profitability = crud.get_car_profitability(db, car.id)
-        if profitability:
-            cars_profitability.append(profitability)
-            total_income += profitability['total_income']
-            total_expenses += profitability['total_expenses']
-    
+    total_income = sum(p['total_income'] for p in cars_profitability)
+    total_expenses = sum(p['total_expenses'] for p in cars_profitability)
     net_profit = total_income - total_expenses
     
-    # Sort by net profit descending
-    cars_profitability.sort(key=lambda x: x['net_profit'], reverse=True)
-    
     return {
         "cars": cars_profitability,
         "totals": {
@@ -51,48 +44,38 @@ async def get_cars_profitability(
 async def get_financial_report(
     months: int = Query(12, ge=1, le=24),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get financial report for the last N months"""
-    current_date = datetime.now()
+    today = date.today()
+    return await report_cache.get_or_compute(("financial", today, months), lambda: _financial_report(db, today, months))
+
+
+async def _financial_report(db: AsyncSession, today: date, months: int):
+    series = await async_crud.get_monthly_series(db, crud.shift_month(today, -(months - 1)), today)
+    
+    month_names = [
+        "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+        "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
+    ]
     
     monthly_data = []
     total_income = 0
     total_expenses = 0
     
-    for i in range(months):
-        # Calculate date for i months ago
-        if current_date.month - i <= 0:
-            month = current_date.month - i + 12
-            year = current_date.year - 1
-        else:
-            month = current_date.month - i
-            year = current_date.year
-        
-        month_income = crud.get_monthly_income(db, year, month)
-        month_expenses = crud.get_monthly_expenses(db, year, month)
-        month_profit = month_income - month_expenses
-        
-        total_income += month_income
-        total_expenses += month_expenses
-        
-        month_names = [
-            "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
-            "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
-        ]
+    for item in series:
+        total_income += item['income']
+        total_expenses += item['expenses']
         
         monthly_data.append({
-            "year": year,
-            "month": month,
-            "month_name": month_names[month - 1],
-            "income": month_income,
-            "expenses": month_expenses,
-            "profit": month_profit
+            "year": item['year'],
+            "month": item['month'],
+            "month_name": month_names[item['month'] - 1],
+            "income": item['income'],
+            "expenses": item['expenses'],
+            "profit": item['income'] - item['expenses']
         })
     
-    # Reverse to show oldest first
-    monthly_data.reverse()
-    
     return {
         "monthly_data": monthly_data,
         "totals": {
@@ -107,28 +90,32 @@ async def get_financial_report(
 @router.get("/dashboard")
 async def get_dashboard_data(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get dashboard summary data"""
+    today = date.today()
+    return await report_cache.get_or_compute(("dashboard", today), lambda: _dashboard_data(db, today))
+
+
+async def _dashboard_data(db: AsyncSession, today: date):
     # Cars statistics
-    cars = crud.get_cars(db)
-    available_cars = crud.get_available_cars(db)
+    fleet_profitability = await async_crud.get_fleet_profitability(db)
+    available_cars = await async_crud.get_available_cars(db)
     
     # Rentals statistics
-    active_rentals = crud.get_active_rentals(db)
-    crud.check_overdue_rentals(db)  # Update overdue status
-    overdue_rentals = [r for r in active_rentals if r.is_overdue]
-    
-    # Financial data for current month
-    current_date = datetime.now()
-    current_month_income = crud.get_monthly_income(db, current_date.year, current_date.month)
-    current_month_expenses = crud.get_monthly_expenses(db, current_date.year, current_date.month)
+    active_rentals = await async_crud.get_active_rentals(db)
+    overdue_rentals = [r for r in active_rentals if r.is_currently_overdue]
+    
+    # Financial data for current and previous month
+    prev_month, current_month = await async_crud.get_monthly_series(db, crud.shift_month(today, -1), today)
+    
+    current_month_income = current_month['income']
+    current_month_expenses = current_month['expenses']
     current_month_profit = current_month_income - current_month_expenses
     
     # Previous month for comparison
-    prev_month_date = current_date.replace(day=1) - timedelta(days=1)
-    prev_month_income = crud.get_monthly_income(db, prev_month_date.year, prev_month_date.month)
-    prev_month_expenses = crud.get_monthly_expenses(db, prev_month_date.year, prev_month_date.month)
+    prev_month_income = prev_month['income']
+    prev_month_expenses = prev_month['expenses']
     prev_month_profit = prev_month_income - prev_month_expenses
     
     # Calculate changes
@@ -136,21 +123,14 @@ async def get_dashboard_data(
     expense_change = ((current_month_expenses - prev_month_expenses) / prev_month_expenses * 100) if prev_month_expenses > 0 else 0
     profit_change = ((current_month_profit - prev_month_profit) / prev_month_profit * 100) if prev_month_profit != 0 else 0
     
-    # Top performing cars
-    cars_profitability = []
-    for car in cars:
-        profitability = crud.get_car_profitability(db, car.id)
-        if profitability and profitability['net_profit'] > 0:
-            cars_profitability.append(profitability)
-    
-    cars_profitability.sort(key=lambda x: x['net_profit'], reverse=True)
-    top_cars = cars_profitability[:5]  # Top 5 cars
+    # Top performing cars (fleet profitability is already sorted by net profit)
+    top_cars = [p for p in fleet_profitability if p['net_profit'] > 0][:5]  # Top 5 cars
     
     return {
         "fleet_stats": {
-            "total_cars": len(cars),
+            "total_cars": len(fleet_profitability),
             "available_cars": len(available_cars),
-            "rented_cars": len(cars) - len(available_cars)
+            "rented_cars": len(fleet_profitability) - len(available_cars)
         },
         "rental_stats": {
             "active_rentals": len(active_rentals),
@@ -172,50 +152,36 @@ async def get_dashboard_data(
 async def get_chart_data(
     months: int = Query(6, ge=3, le=12),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get data for charts"""
-    current_date = datetime.now()
+    today = date.today()
+    return await report_cache.get_or_compute(("chart-data", today, months), lambda: _chart_data(db, today, months))
+
+
+async def _chart_data(db: AsyncSession, today: date, months: int):
+    month_names = [
+        "Янв", "Фев", "Мар", "Апр", "Май", "Июн",
+        "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"
+    ]
     
     # Monthly income/expense chart data
-    chart_data = []
-    
-    for i in range(months):
-        # Calculate date for i months ago
-        if current_date.month - i <= 0:
-            month = current_date.month - i + 12
-            year = current_date.year - 1
-        else:
-            month = current_date.month - i
-            year = current_date.year
-        
-        month_income = crud.get_monthly_income(db, year, month)
-        month_expenses = crud.get_monthly_expenses(db, year, month)
-        
-        month_names = [
-            "Янв", "Фев", "Мар", "Апр", "Май", "Июн",
-            "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"
-        ]
-        
-        chart_data.append({
-            "month": f"{month_names[month - 1]} {year}",
-            "income": month_income,
-            "expenses": month_expenses,
-            "profit": month_income - month_expenses
-        })
-    
-    # Reverse to show chronological order
-    chart_data.reverse()
+    chart_data = [
+        {
+            "month": f"{month_names[item['month'] - 1]} {item['year']}",
+            "income": item['income'],
+            "expenses": item['expenses'],
+            "profit": item['income'] - item['expenses']
+        }
+        for item in await async_crud.get_monthly_series(db, crud.shift_month(today, -(months - 1)), today)
+    ]
     
     # Car profitability pie chart data
-    cars_data = []
-    for car in crud.get_cars(db):
-        profitability = crud.get_car_profitability(db, car.id)
-        if profitability and profitability['total_income'] > 0:
-            cars_data.append({
-                "name": f"{car.brand} {car.model}",
-                "value": profitability['total_income']
-            })
+    cars_data = [
+        {"name": p['car_name'], "value": p['total_income']}
+        for p in await async_crud.get_fleet_profitability(db)
+        if p['total_income'] > 0
+    ]
     
     cars_data.sort(key=lambda x: x['value'], reverse=True)
     
@@ -223,3 +189,40 @@ async def get_chart_data(
         "monthly_chart": chart_data,
         "cars_income_chart": cars_data[:10]  # Top 10 cars by income
     }
+
+
+# Longest window /utilization accepts (ten years)
+MAX_UTILIZATION_DAYS = 3660
+
+
+@router.get("/utilization")
+async def get_utilization_report(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    bucket: Optional[str] = Query("month"),
+    current_user: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get rented days over calendar days per car and for the fleet (last 12 months by default)"""
+    end_date = end_date or date.today()
+    start_date = start_date or crud.shift_month(end_date, -11)
+    bucket = bucket or None
+    
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
+    if (end_date - start_date).days >= MAX_UTILIZATION_DAYS:
+        raise HTTPException(status_code=400, detail="Period is too long")
+    if bucket is not None and bucket not in crud.UTILIZATION_BUCKETS:
+        raise HTTPException(status_code=400, detail="Invalid bucket. Use week or month")
+    
+    # Overdue rentals count up to today, so the day is part of the key
+    return await report_cache.get_or_compute(
+        ("utilization", date.today(), start_date, end_date, bucket),
+        lambda: async_crud.get_utilization(db, start_date, end_date, bucket)
+    )
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: str = Depends(get_current_user)):
+    """Report cache hit/miss counters for this process"""
+    return report_cache.stats()